@@ -62,15 +62,17 @@ def delete_detection(req: https_fn.Request) -> https_fn.Response:
         doc_data = doc.to_dict()
         storage_path = doc_data.get("storagePath")
 
-        # 2. Storage에서 이미지 파일을 삭제합니다.
+        # 2. Storage에서 이미지 파일(원본과 thumbPath, previewPath 파생본)을 삭제합니다.
         if storage_path:
-            print(f"  - Deleting image from Storage: {storage_path}")
-            blob = bucket.blob(storage_path)
-            if blob.exists():
-                blob.delete()
-                print(f"  - Image deleted successfully.")
-            else:
-                print(f"  - Image not found in Storage, skipping.")
+            paths = [storage_path] + [doc_data[key] for key in ("previewPath", "thumbPath") if doc_data.get(key)]
+            for path in paths:
+                print(f"  - Deleting image from Storage: {path}")
+                blob = bucket.blob(path)
+                if blob.exists():
+                    blob.delete()
+                    print(f"  - Image deleted successfully.")
+                else:
+                    print(f"  - Image not found in Storage, skipping.")
         else:
             print("  - No 'storagePath' found in document, skipping image deletion.")
 
@@ -0,0 +1,163 @@
+# 적응형 프레임 처리 간격(adaptive_rate)의 절약 효과 측정 스크립트
+#
+# 같은 영상(기본: 하루 24시간짜리 합성 영상)을 adaptive_rate를 끄고/켜고 두 번 재생(replay_benchmark)하여
+# - 처리한 프레임 수, 모드별(active/idle/dark) 시간
+# - CPU 사용 시간과, 실제 운영(영상 시간 = 실제 시간)으로 환산한 평균 CPU 사용률
+# - 재생하는 동안의 CPU 온도 (/sys/class/thermal, 없으면 생략)
+# - CPU 사용률로 추정한 평균 전력과 하루 전력량 (idle_watts + (max_watts - idle_watts) * 사용률)
+# 을 비교합니다. 재생은 실제 시간보다 빠르게 진행되므로 온도는 실제 운영보다 높게 나오고,
+# 전력은 측정값이 아니라 보드 사양(기본값: Raspberry Pi 4B 대기 2.7W / 최대 6.4W)으로 추정한 값입니다.
+#
+# 사용 예:
+#   합성 영상으로 하루 재생 (640x360, 5 FPS, 15분마다 새가 지나감):
+#   python scripts/adaptive_rate_report.py --hours 24 --fps 5 --output adaptive_rate.json
+#
+#   실제 녹화 영상:
+#   python scripts/adaptive_rate_report.py --video day.mp4
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import replay_benchmark  # noqa: E402
+
+THERMAL_PATH = "/sys/class/thermal/thermal_zone0/temp"
+
+
+class TemperatureSampler:
+    """재생하는 동안 interval_s마다 CPU 온도(섭씨)를 기록"""
+
+    def __init__(self, interval_s=1.0):
+        self.interval_s = interval_s
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with open(THERMAL_PATH, encoding="utf-8") as f:
+                    self.samples.append(int(f.read().strip()) / 1000.0)
+            except (OSError, ValueError):
+                return  # 온도 센서가 없는 환경
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        if not self.samples:
+            return None
+        return {"mean_c": round(sum(self.samples) / len(self.samples), 1), "max_c": round(max(self.samples), 1)}
+
+
+def media_duration(args):
+    if not args.video:
+        return args.hours * 3600.0
+    cap = cv2.VideoCapture(args.video)
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+    cap.release()
+    return duration
+
+
+def replay_overrides(args):
+    overrides = list(args.set or [])
+    if not args.video:
+        overrides += [
+            "source.type=synthetic",
+            f"source.fps={args.fps}",
+            f"source.num_frames={int(args.hours * 3600 * args.fps)}",
+            "source.day_length_s=86400",
+            f"source.visit_interval_s={args.visit_interval_s}",
+            f"camera.frame_width={args.width}",
+            f"camera.frame_height={args.height}",
+        ]
+    return overrides
+
+
+def run(args, enabled, duration):
+    overrides = replay_overrides(args) + [f"adaptive_rate.enabled={str(enabled).lower()}"]
+    with TemperatureSampler() as sampler:
+        result = replay_benchmark.run_replay(args.video or "synthetic", args.model, args.config, overrides)
+
+    cpu_s = result["cpu_percent"] * result["wall_s"] / 100.0
+    # 실제 운영에서는 영상 시간만큼 걸리므로, 같은 CPU 시간을 영상 시간 동안 나눠 쓰는 것으로 환산
+    load = cpu_s / duration if duration else 0.0
+    utilization = min(load / (os.cpu_count() or 1), 1.0)
+    watts = args.idle_watts + (args.max_watts - args.idle_watts) * utilization
+    return {
+        "adaptive_rate": enabled,
+        "processed_frames": result["frames"],
+        "scheduler_skipped": result.get("scheduler_skipped", 0),
+        "mode_seconds": (result.get("scheduler") or {}).get("mode_seconds"),
+        "analyzed_frames": result["analyzed_frames"],
+        "uploads": result["uploads"],
+        "cpu_s": round(cpu_s, 1),
+        "replay_wall_s": result["wall_s"],
+        "realtime_cpu_percent": round(load * 100.0, 2),  # 코어 하나 기준
+        "temperature": sampler.summary(),
+        "estimated_watts": round(watts, 3),
+        "estimated_wh_per_day": round(watts * 24, 2),
+        "stages": result["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="adaptive_rate 끄고/켜고 CPU, 온도, 전력 비교")
+    parser.add_argument("--video", help="재생할 영상 (없으면 하루짜리 합성 영상)")
+    parser.add_argument("--hours", type=float, default=24.0, help="합성 영상 길이 (자정에서 시작)")
+    parser.add_argument("--fps", type=float, default=5.0, help="합성 영상 FPS (idle_fps보다 커야 idle 효과가 보임)")
+    parser.add_argument("--width", type=int, default=640, help="합성 영상 가로 크기")
+    parser.add_argument("--height", type=int, default=360, help="합성 영상 세로 크기")
+    parser.add_argument("--visit-interval-s", type=float, default=900.0, help="합성 영상에서 새가 지나가는 간격")
+    parser.add_argument("--model", default=os.path.join(replay_benchmark.PROJECT_ROOT, "models", "bird_detect_320.pt"))
+    parser.add_argument("--config", default=replay_benchmark.DEFAULT_CONFIG, help="기본 설정 파일")
+    parser.add_argument("--set", action="append", help="설정 덮어쓰기 (예: adaptive_rate.idle_fps=1)")
+    parser.add_argument("--idle-watts", type=float, default=2.7, help="보드 대기 전력 (W)")
+    parser.add_argument("--max-watts", type=float, default=6.4, help="보드 최대 부하 전력 (W)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    duration = media_duration(args)
+    results = [run(args, enabled, duration) for enabled in (False, True)]
+    baseline, adaptive = results
+
+    print(f"\n영상 길이 {duration / 3600:.1f}시간, CPU {os.cpu_count()}코어")
+    print(f"{'adaptive':<9} {'processed':>10} {'analyzed':>9} {'uploads':>8} {'cpu(s)':>9} "
+          f"{'cpu%(rt)':>9} {'temp(C)':>8} {'W(est)':>7} {'Wh/day':>7}")
+    for r in results:
+        temp = r["temperature"]["mean_c"] if r["temperature"] else "-"
+        print(f"{str(r['adaptive_rate']):<9} {r['processed_frames']:>10} {r['analyzed_frames']:>9} {r['uploads']:>8} "
+              f"{r['cpu_s']:>9} {r['realtime_cpu_percent']:>9} {temp:>8} {r['estimated_watts']:>7} "
+              f"{r['estimated_wh_per_day']:>7}")
+    if adaptive["mode_seconds"]:
+        print(f"모드별 시간(초): {adaptive['mode_seconds']}")
+    savings = {
+        "processed_frames_percent": round(100.0 * (1 - adaptive["processed_frames"] / baseline["processed_frames"]), 1)
+        if baseline["processed_frames"] else 0.0,
+        "cpu_percent": round(100.0 * (1 - adaptive["cpu_s"] / baseline["cpu_s"]), 1) if baseline["cpu_s"] else 0.0,
+        "wh_per_day": round(baseline["estimated_wh_per_day"] - adaptive["estimated_wh_per_day"], 2),
+    }
+    print(f"절약: 처리 프레임 {savings['processed_frames_percent']}%, CPU 시간 {savings['cpu_percent']}%, "
+          f"추정 전력량 {savings['wh_per_day']} Wh/일")
+
+    if args.output:
+        report = {"environment": replay_benchmark.environment_info(), "video": args.video or "synthetic",
+                  "media_s": duration, "runs": results, "savings": savings}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# 추론 backend(onnx / openvino)를 PyTorch(ultralytics .pt) 기준 결과와 비교하는 스크립트
+#
+# - 같은 이미지들에 대해 backend별 1장당 추론 시간(p50/p90)을 측정
+# - PyTorch 결과를 정답으로 보고, 같은 클래스 + IoU >= 0.5로 짝지어 일치율(precision/recall)과
+#   confidence 차이를 계산
+# - onnx/openvino 모델은 inference.create_engine()이 최초 1회 export 후 캐시를 재사용
+#
+# 사용 예:
+#   python scripts/engine_parity.py --model models/bird_detect_320.pt --images images/ --backends onnx openvino
+#   python scripts/engine_parity.py --model models/bird_detect_320.pt --video footage.mp4 --frames 100
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+import inference  # noqa: E402
+import perf_stats  # noqa: E402
+from frame_source import IMAGE_EXTENSIONS  # noqa: E402
+
+
+def load_images(args):
+    images = []
+    if args.images:
+        for name in sorted(os.listdir(args.images)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(args.images, name))
+                if image is not None:
+                    images.append(image)
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or args.frames
+        step = max(total // args.frames, 1)  # 영상 전체에서 고르게 추출
+        index = 0
+        while len(images) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % step == 0:
+                images.append(frame)
+            index += 1
+        cap.release()
+    return images
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(ix2 - ix1, 0) * max(iy2 - iy1, 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """같은 클래스끼리 IoU가 높은 순으로 1:1 매칭. (매칭 쌍 목록) 반환"""
+    pairs = sorted(
+        ((iou(r.box, c.box), ri, ci) for ri, r in enumerate(reference) for ci, c in enumerate(candidate)
+         if r.class_name == c.class_name),
+        reverse=True,
+    )
+    used_r, used_c, matches = set(), set(), []
+    for score, ri, ci in pairs:
+        if score < iou_threshold:
+            break
+        if ri in used_r or ci in used_c:
+            continue
+        used_r.add(ri)
+        used_c.add(ci)
+        matches.append((reference[ri], candidate[ci], score))
+    return matches
+
+
+def run_engine(engine, images, conf, warmup):
+    for image in images[:warmup]:
+        engine.predict([image], conf)
+    latencies, outputs = [], []
+    for image in images:
+        start = time.perf_counter()
+        outputs.append(engine.predict([image], conf)[0])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return outputs, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="추론 backend 지연 시간 / 정확도 비교 (PyTorch 기준)")
+    parser.add_argument("--model", required=True, help="기준 .pt 모델")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "openvino"], choices=inference.BACKENDS[1:])
+    parser.add_argument("--images", help="이미지 폴더")
+    parser.add_argument("--video", help="영상 파일 (--frames장을 고르게 추출)")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--imgsz", type=int, default=320)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    images = load_images(args)
+    if not images:
+        print("[ERROR] 비교할 이미지가 없습니다. --images 또는 --video를 지정하세요.")
+        sys.exit(1)
+    print(f"[INFO] 이미지 {len(images)}장으로 비교합니다.")
+
+    reference_engine = inference.create_engine(args.model, "torch", args.imgsz)
+    reference, reference_latency = run_engine(reference_engine, images, args.conf, args.warmup)
+    report = {"model": os.path.basename(args.model), "imgsz": args.imgsz, "images": len(images), "backends": {}}
+    report["backends"]["torch"] = {
+        "p50_ms": round(perf_stats.percentile(reference_latency, 50), 2),
+        "p90_ms": round(perf_stats.percentile(reference_latency, 90), 2),
+        "detections": sum(len(d) for d in reference),
+    }
+
+    for backend in args.backends:
+        try:
+            engine = inference.create_engine(args.model, backend, args.imgsz)
+        except Exception as e:
+            print(f"[WARN] {backend} 엔진을 만들 수 없어 건너뜁니다: {e}")
+            continue
+        outputs, latency = run_engine(engine, images, args.conf, args.warmup)
+
+        matched = ref_total = cand_total = 0
+        conf_diffs, ious = [], []
+        for ref, cand in zip(reference, outputs):
+            matches = match_detections(ref, cand)
+            matched += len(matches)
+            ref_total += len(ref)
+            cand_total += len(cand)
+            conf_diffs += [abs(r.confidence - c.confidence) for r, c, _ in matches]
+            ious += [score for _, _, score in matches]
+
+        report["backends"][backend] = {
+            "p50_ms": round(perf_stats.percentile(latency, 50), 2),
+            "p90_ms": round(perf_stats.percentile(latency, 90), 2),
+            "detections": cand_total,
+            "recall_vs_torch": round(matched / ref_total, 4) if ref_total else 1.0,
+            "precision_vs_torch": round(matched / cand_total, 4) if cand_total else 1.0,
+            "mean_conf_diff": round(sum(conf_diffs) / len(conf_diffs), 4) if conf_diffs else 0.0,
+            "mean_iou": round(sum(ious) / len(ious), 4) if ious else 1.0,
+        }
+
+    print(f"\n{'backend':<10} {'p50(ms)':>8} {'p90(ms)':>8} {'dets':>6} {'recall':>7} {'prec':>7} {'Δconf':>7} {'IoU':>6}")
+    for backend, r in report["backends"].items():
+        print(f"{backend:<10} {r['p50_ms']:>8} {r['p90_ms']:>8} {r['detections']:>6} "
+              f"{r.get('recall_vs_torch', '-'):>7} {r.get('precision_vs_torch', '-'):>7} "
+              f"{r.get('mean_conf_diff', '-'):>7} {r.get('mean_iou', '-'):>6}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
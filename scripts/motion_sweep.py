@@ -0,0 +1,248 @@
+# 움직임 감지 파라미터(history, threshold, min_area) 탐색 스크립트
+#
+# 새가 보이는 구간을 표시한(라벨) 영상들을 MotionDetector.detect()로 재생하면서 파라미터 조합마다
+# - 움직임 판정의 precision / recall (프레임 단위, 정답: 새가 보이는 구간)
+# - 새 방문(라벨 구간) 중 YOLO 분석을 한 번 이상 한 비율 (visit recall)
+# - YOLO 분석 횟수 (움직임 감지 후 capture_interval 간격으로 분석 큐에 넣는 main.py 규칙 그대로)
+# - 프레임당 움직임 감지 CPU 시간
+# 을 계산하고, 다른 조합보다 모든 지표에서 나쁘지 않은 조합(Pareto frontier)을 골라 보여 줍니다.
+# - (영상, history, threshold) 조합마다 프로세스 하나로 나눠 모든 코어에서 실행합니다.
+# - min_area는 배경 차분 결과를 바꾸지 않으므로, 한 번 재생하며 프레임마다 가장 큰 움직임 덩어리 면적을
+#   기록해 두고 min_area별 판정은 그 면적으로 계산합니다. (min_area별 CPU 시간은 같은 값)
+# - 추적(tracking), 쿨다운, 감시 영역은 적용하지 않습니다.
+#
+# 라벨 파일 (YAML, 영상 경로는 라벨 파일 기준 상대 경로):
+#   clips:
+#     - video: footage/feeder_morning.mp4
+#       birds: [[12.0, 18.5], [40.2, 44.0]]   # 새가 화면에 있는 구간 (초)
+#
+# 사용 예:
+#   python scripts/motion_sweep.py --labels labels.yaml --history 200 500 1000 \
+#       --threshold 16 25 50 --min-area 200 500 1000 --output sweep.json
+#
+#   라벨 영상 없이 합성 영상(정답을 알고 있음)으로:
+#   python scripts/motion_sweep.py --synthetic 4
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_CONFIG = os.path.join(PROJECT_ROOT, "config", "app_config.yaml")
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+import frame_source  # noqa: E402
+import motion  # noqa: E402
+
+
+def load_clips(labels_path):
+    """라벨 파일의 영상 목록 [{"name", "video", "birds"}]"""
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        labels = yaml.safe_load(f)
+    base = os.path.dirname(os.path.abspath(labels_path))
+    clips = []
+    for item in labels.get('clips') or []:
+        video = os.path.join(base, item['video'])
+        clips.append({"name": os.path.basename(video), "video": video,
+                      "birds": [tuple(map(float, interval)) for interval in item.get('birds') or []]})
+    return clips
+
+
+def synthetic_clips(count, seconds, fps, width, height):
+    """합성 영상 설정 (seed와 새가 지나가는 간격을 바꿔 가며). 정답은 SyntheticSource.bird_visible()"""
+    return [{"name": f"synthetic-{i}", "synthetic": {"width": width, "height": height, "fps": fps,
+                                                     "num_frames": int(seconds * fps) + 1, "seed": i,
+                                                     "visit_interval_s": 10.0 + 5.0 * i, "visit_duration_s": 4.0}}
+            for i in range(count)]
+
+
+def open_clip(clip):
+    """(프레임 소스, 프레임 번호/시각 -> 새가 보이는지)"""
+    if "synthetic" in clip:
+        source = frame_source.SyntheticSource(**clip["synthetic"])
+        return source, lambda index, frame_time: source.bird_visible(index)
+    source = frame_source.VideoFileSource(clip["video"]).open()
+    birds = clip["birds"]
+    return source, lambda index, frame_time: any(start <= frame_time <= end for start, end in birds)
+
+
+def replay_clip(task):
+    """
+    (작업 프로세스) 영상 하나를 (history, threshold)로 재생하여 프레임별 [시각, 가장 큰 움직임 면적, 정답]과
+    detect() CPU 시간을 반환. min_area=0으로 감지하므로 어떤 min_area의 판정도 가장 큰 면적으로 계산할 수 있음
+    """
+    clip, resize_w, resize_h, history, threshold = task
+    cv2.setNumThreads(1)  # 프로세스마다 코어 하나 (CPU 시간을 조합끼리 비교할 수 있도록)
+    source, is_bird = open_clip(clip)
+    detector = motion.MotionDetector(resize_w, resize_h, history, threshold, min_area=0)
+    frames = []
+    cpu_s = 0.0
+    buffer = None
+    while True:
+        ret, frame = source.read(buffer)
+        if not ret:
+            break
+        buffer = frame
+        start = time.process_time()
+        _, _, blobs = detector.detect(frame)
+        cpu_s += time.process_time() - start
+        largest = int(blobs.areas[0]) if len(blobs.areas) else 0
+        frames.append((source.frame_time, largest, is_bird(source.frame_index, source.frame_time)))
+    source.release()
+    return {"clip": clip["name"], "history": history, "threshold": threshold, "cpu_s": cpu_s,
+            "frames": np.array(frames, dtype=np.float64).reshape(-1, 3)}
+
+
+def yolo_invocations(frame_times, detected, capture_interval):
+    """main.py와 같은 규칙: 움직임이 있고 마지막으로 넣은 지 capture_interval이 지났으면 분석 큐에 넣음"""
+    last = 0.0
+    calls = []
+    for frame_time, moving in zip(frame_times, detected):
+        if moving and frame_time - last > capture_interval:
+            last = frame_time
+            calls.append(frame_time)
+    return calls
+
+
+def bird_visits(frame_times, truth):
+    """정답이 연속으로 참인 구간 [(시작, 끝)]"""
+    visits = []
+    start = None
+    for frame_time, bird in zip(frame_times, truth):
+        if bird and start is None:
+            start = frame_time
+        elif not bird and start is not None:
+            visits.append((start, previous))
+            start = None
+        previous = frame_time
+    if start is not None:
+        visits.append((start, previous))
+    return visits
+
+
+def evaluate(replays, min_area, capture_interval):
+    """(history, threshold) 하나의 영상별 재생 결과를 min_area로 판정해 합친 지표"""
+    tp = fp = fn = frames = calls = visits = visits_found = 0
+    cpu_s = 0.0
+    for replay in replays:
+        data = replay["frames"]
+        frame_times, largest, truth = data[:, 0], data[:, 1], data[:, 2] > 0
+        detected = largest > min_area
+        tp += int(np.sum(detected & truth))
+        fp += int(np.sum(detected & ~truth))
+        fn += int(np.sum(~detected & truth))
+        frames += len(data)
+        cpu_s += replay["cpu_s"]
+        call_times = yolo_invocations(frame_times, detected, capture_interval)
+        calls += len(call_times)
+        for start, end in bird_visits(frame_times, truth):
+            visits += 1
+            visits_found += any(start <= t <= end for t in call_times)
+    return {
+        "precision": round(tp / (tp + fp), 4) if tp + fp else 0.0,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else 0.0,
+        "visit_recall": round(visits_found / visits, 4) if visits else 0.0,
+        "yolo_calls": calls,
+        "cpu_ms_per_frame": round(cpu_s / frames * 1000.0, 3) if frames else 0.0,
+        "frames": frames,
+    }
+
+
+# Pareto frontier 비교 지표: (이름, 클수록 좋은지)
+OBJECTIVES = [("recall", True), ("precision", True), ("yolo_calls", False), ("cpu_ms_per_frame", False)]
+
+
+def dominates(a, b):
+    """a가 모든 지표에서 b보다 나쁘지 않고 하나 이상에서 더 좋으면 True"""
+    better = False
+    for name, higher in OBJECTIVES:
+        x, y = (a[name], b[name]) if higher else (b[name], a[name])
+        if x < y:
+            return False
+        better = better or x > y
+    return better
+
+
+def pareto_frontier(results):
+    return [r for r in results if not any(dominates(other, r) for other in results if other is not r)]
+
+
+def main():
+    with open(DEFAULT_CONFIG, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    bg = config['background_subtraction']
+    parser = argparse.ArgumentParser(description="라벨 영상으로 움직임 감지 파라미터 조합 비교 (Pareto frontier)")
+    parser.add_argument("--labels", help="라벨 파일 (YAML, clips: [{video, birds}])")
+    parser.add_argument("--synthetic", type=int, default=0, help="라벨 파일 대신 합성 영상 N개 사용")
+    parser.add_argument("--synthetic-seconds", type=float, default=60.0, help="합성 영상 길이 (초)")
+    parser.add_argument("--history", nargs="+", type=int, default=sorted({200, bg['history'], 1000}))
+    parser.add_argument("--threshold", nargs="+", type=float, default=sorted({16.0, 25.0, float(bg['threshold'])}))
+    parser.add_argument("--min-area", nargs="+", type=int,
+                        default=sorted({200, config['detection']['min_area'], 1000}))
+    parser.add_argument("--capture-interval", type=float, default=config['detection']['capture_interval'],
+                        help="YOLO 분석 횟수 계산에 쓰는 분석 간격 (초)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="동시에 실행할 프로세스 수")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    if args.labels:
+        clips = load_clips(args.labels)
+    elif args.synthetic:
+        clips = synthetic_clips(args.synthetic, args.synthetic_seconds, 10.0,
+                                config['camera']['resize_width'], config['camera']['resize_height'])
+    else:
+        parser.error("--labels 또는 --synthetic이 필요합니다.")
+    resize_w, resize_h = config['camera']['resize_width'], config['camera']['resize_height']
+    tasks = [(clip, resize_w, resize_h, history, threshold)
+             for history, threshold in itertools.product(args.history, args.threshold) for clip in clips]
+    print(f"[INFO] 영상 {len(clips)}개 x 배경 차분 조합 {len(args.history) * len(args.threshold)}개 "
+          f"({len(tasks)}회 재생, 프로세스 {args.jobs}개), min_area {args.min_area}")
+
+    start = time.perf_counter()
+    replays = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for replay in pool.map(replay_clip, tasks):
+            replays.setdefault((replay["history"], replay["threshold"]), []).append(replay)
+    print(f"[INFO] 재생 완료 ({time.perf_counter() - start:.1f}초)")
+
+    current = (bg['history'], float(bg['threshold']), config['detection']['min_area'])
+    results = []
+    for (history, threshold), clip_replays in sorted(replays.items()):
+        for min_area in args.min_area:
+            result = {"history": history, "threshold": threshold, "min_area": min_area}
+            result.update(evaluate(clip_replays, min_area, args.capture_interval))
+            result["current"] = (history, threshold, min_area) == current
+            results.append(result)
+    frontier = pareto_frontier(results)
+    for result in results:
+        result["pareto"] = any(result is r for r in frontier)
+
+    print(f"\n{'history':>7} {'thresh':>6} {'min_area':>8} {'precision':>9} {'recall':>7} {'visits':>7} "
+          f"{'yolo':>6} {'cpu ms':>7}")
+    for r in sorted(frontier, key=lambda r: (-r["recall"], r["yolo_calls"])):
+        mark = "  <- 현재 설정" if r["current"] else ""
+        print(f"{r['history']:>7} {r['threshold']:>6g} {r['min_area']:>8} {r['precision']:>9.3f} {r['recall']:>7.3f} "
+              f"{r['visit_recall']:>7.3f} {r['yolo_calls']:>6} {r['cpu_ms_per_frame']:>7.3f}{mark}")
+    print(f"(Pareto frontier {len(frontier)}개 / 전체 {len(results)}개 조합, visits: 분석한 새 방문 비율)")
+    now = next((r for r in results if r["current"]), None)
+    if now and not now["pareto"]:
+        print(f"[INFO] 현재 설정 {current}은 frontier에 없음: precision {now['precision']}, recall {now['recall']}, "
+              f"YOLO {now['yolo_calls']}회, {now['cpu_ms_per_frame']} ms/frame")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"clips": [clip["name"] for clip in clips], "capture_interval": args.capture_interval,
+                       "objectives": [name for name, _ in OBJECTIVES], "results": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"[INFO] 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# 업로드 outbox 비정상 종료 복구 확인 스크립트
+#
+# 자식 프로세스가 outbox에 탐지 결과를 기록하고 로컬 업로드(local_firebase)로 내보내는 도중에
+# 임의의 시점에 SIGKILL로 강제 종료합니다. 이를 여러 번 반복한 뒤 마지막으로 남은 항목을 모두 보내고,
+# - 기록이 끝났다고 확인된 탐지 결과가 하나도 빠지지 않았는지 (유실 없음)
+# - 같은 탐지 결과가 두 번 저장되지 않았는지 (중복 없음)
+# - outbox와 spool 폴더가 비었는지
+# 를 확인합니다.
+#
+# 사용 예:
+#   python scripts/outbox_recovery_check.py --rounds 20 --per-round 30
+
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+import local_firebase  # noqa: E402
+import outbox  # noqa: E402
+from upload_pool import UploadPool  # noqa: E402
+
+
+def run_child(args):
+    """(자식 프로세스) 새 탐지 결과를 기록하면서 outbox를 비움. 부모가 임의의 시점에 강제 종료함"""
+    local_firebase.configure(os.path.join(args.work_dir, "remote"), latency_ms=args.latency_ms,
+                             failure_rate=args.failure_rate)
+    local_firebase.initialize_firebase()
+    box = outbox.UploadOutbox(os.path.join(args.work_dir, "outbox"), max_bytes=1024 * 1024 * 1024)
+    pool = UploadPool(local_firebase.upload_detection_data, num_workers=2, max_retries=0).start()
+    flusher = outbox.OutboxFlusher(box, pool, batch_size=4)
+
+    image = np.random.default_rng(args.start).integers(0, 255, 2048, dtype=np.uint8).tobytes()
+    with open(os.path.join(args.work_dir, "produced.log"), "a", encoding="utf-8") as log:
+        for index in range(args.start, args.start + args.count):
+            # source_device에 일련번호를 넣어 원격 저장소에서 탐지 결과를 구분
+            box.put(image, "Crow", 0.9, f"check-{index}")
+            log.write(f"{index}\n")  # put()이 끝난 항목만 "기록 완료"로 봄
+            log.flush()
+            os.fsync(log.fileno())
+            flusher.flush_once()
+
+    while box.count():
+        flusher.flush_once()
+    pool.stop()
+    box.close()
+
+
+def spawn_child(args, start, count, failure_rate):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--work-dir", args.work_dir,
+           "--start", str(start), "--count", str(count),
+           "--latency-ms", str(args.latency_ms), "--failure-rate", str(failure_rate)]
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+
+
+def verify(work_dir):
+    with open(os.path.join(work_dir, "produced.log"), encoding="utf-8") as f:
+        produced = {f"check-{line.strip()}" for line in f if line.strip()}
+    documents_dir = os.path.join(work_dir, "remote", "documents")
+    devices = []
+    for name in os.listdir(documents_dir):
+        with open(os.path.join(documents_dir, name), encoding="utf-8") as f:
+            devices.append(json.load(f)["sourceDevice"])
+    box = outbox.UploadOutbox(os.path.join(work_dir, "outbox"))
+    remaining = box.count()
+    spool_files = os.listdir(box.spool_dir)
+    box.close()
+
+    missing = produced - set(devices)
+    duplicated = len(devices) - len(set(devices))
+    return {
+        "produced": len(produced),
+        "uploaded_documents": len(devices),
+        "missing": sorted(missing),
+        "duplicated": duplicated,
+        "outbox_remaining": remaining,
+        "spool_files": len(spool_files),
+        "ok": not missing and duplicated == 0 and remaining == 0 and not spool_files,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="업로드 outbox 강제 종료 복구 확인")
+    parser.add_argument("--rounds", type=int, default=20, help="강제 종료 반복 횟수")
+    parser.add_argument("--per-round", type=int, default=30, help="회차마다 새로 기록할 탐지 결과 수")
+    parser.add_argument("--latency-ms", type=int, default=80, help="가상 업로드 지연 시간")
+    parser.add_argument("--failure-rate", type=float, default=0.3, help="강제 종료 회차의 가상 업로드 실패 비율")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="작업 폴더 (기본: 임시 폴더)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--count", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    args.work_dir = args.work_dir or tempfile.mkdtemp(prefix="outbox_check_")
+    rng = random.Random(args.seed)
+    print(f"[INFO] 작업 폴더: {args.work_dir}")
+
+    for round_index in range(args.rounds):
+        child = spawn_child(args, round_index * args.per_round, args.per_round, args.failure_rate)
+        time.sleep(rng.uniform(0.3, 1.5))  # 모듈 import 이후 기록/업로드 도중의 임의 시점
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+        print(f"[INFO] {round_index + 1}/{args.rounds}회차 강제 종료")
+
+    # 마지막 실행: 새 기록 없이 남은 항목을 모두 보냄 (실패 없음)
+    child = spawn_child(args, args.rounds * args.per_round, 0, 0.0)
+    child.wait()
+
+    result = verify(args.work_dir)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
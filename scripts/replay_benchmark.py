@@ -0,0 +1,286 @@
+# 녹화된 영상으로 src/main.py 파이프라인 전체를 재생하여 성능을 측정하는 벤치마크
+#
+# - 실제 main.py의 main()을 그대로 실행하되, 프레임 소스는 영상 파일(실시간 속도 X, 프레임 드롭 X),
+#   업로드는 로컬 대체 모듈(local_firebase)을 사용하므로 같은 영상/설정이면 항상 같은 결과가 나옴
+# - 모델마다 별도 프로세스로 실행하여 최대 메모리(RSS)가 서로 섞이지 않도록 함
+# - 결과는 JSON으로 저장하고, --update-table을 주면 performance.md 표의
+#   Inference Time / CPU Usage / Memory 열을 다시 채움
+#
+# 사용 예:
+#   python scripts/replay_benchmark.py --video footage.mp4 \
+#       --models models/bird_detect_320.pt models/bird_detect_416.pt models/bird_detect_640.pt \
+#       --output bench.json --update-table
+#
+#   배치 크기에 따른 분석 처리량(frames/s) 비교:
+#   python scripts/replay_benchmark.py --video footage.mp4 --batch-sizes 1 2 4 8
+#
+#   카메라 수에 따른 메모리/처리량 비교 (같은 영상을 카메라 N대가 동시에 재생, 모델은 하나를 함께 씀):
+#   python scripts/replay_benchmark.py --video footage.mp4 --cameras 1 2 4
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_CONFIG = os.path.join(PROJECT_ROOT, "config", "app_config.yaml")
+PERFORMANCE_MD = os.path.join(PROJECT_ROOT, "performance.md")
+
+STAGE_ORDER = ["read", "motion", "resize", "mog2", "components", "queue_wait", "predict", "imencode", "upload"]
+
+
+def build_replay_config(base_config_path, video_path, model_path, upload_dir, overrides=None, num_cameras=None):
+    """기본 설정을 바탕으로 재생용 설정(dict)을 만듭니다. num_cameras를 주면 같은 영상을 카메라 여러 대로 재생"""
+    with open(base_config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    config['source'] = {
+        'type': 'video',
+        'path': os.path.abspath(video_path),
+        'realtime': False,
+        'loop': False,
+        'latest_frame_only': False,
+    }
+    config['yolo']['model_path'] = os.path.abspath(model_path)
+    config['upload'] = {'backend': 'local', 'local_dir': upload_dir, 'local_latency_ms': 0}
+    config['outbox'] = dict(config.get('outbox', {}), dir=os.path.join(upload_dir, "outbox"))
+    config['clips'] = dict(config.get('clips', {}), dir=os.path.join(upload_dir, "clips"))
+    # 이전 실행에서 저장한 배경을 복원하지 않도록 (재생마다 같은 결과)
+    config['background_subtraction']['snapshot'] = dict(config['background_subtraction'].get('snapshot', {}),
+                                                        dir=os.path.join(upload_dir, "background"))
+    config['metrics'] = dict(config.get('metrics', {}), port=0)  # 실행 중인 파이프라인과 포트가 겹치지 않도록
+    config['cameras'] = [{'name': f"cam{i}", 'source': dict(config['source'])} for i in range(num_cameras or 0)]
+
+    # "section.key=value" 형태의 덮어쓰기 (예: yolo.confidence_threshold=0.4)
+    for item in overrides or []:
+        key, value = item.split("=", 1)
+        section = config
+        parts = key.split(".")
+        for part in parts[:-1]:
+            section = section.setdefault(part, {})
+        section[parts[-1]] = yaml.safe_load(value)
+    return config
+
+
+def run_child(args):
+    """(자식 프로세스) main.py를 import하여 재생 후 측정 결과를 JSON 파일로 저장"""
+    import resource
+
+    upload_dir = tempfile.mkdtemp(prefix="bird_replay_")
+    config = build_replay_config(args.config, args.video, args.model, upload_dir, args.set, args.num_cameras)
+    config_path = os.path.join(upload_dir, "replay_config.yaml")
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    os.environ["BIRD_CONFIG_PATH"] = config_path
+
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+    import main as pipeline  # 설정 로드는 import 시점, 모델 로딩은 백그라운드 스레드
+    import cascade
+    import result_cache
+
+    pipeline.stage_timer.enable()
+    # 처리량은 모델 로딩 / warm-up을 빼고 비교하도록 모델이 준비된 뒤부터 측정 (시작 시간은 "startup"에 따로 기록)
+    pipeline.start_engine_loader()
+    pipeline.engine_ready.wait()
+    start_times = os.times()
+    start_wall = time.perf_counter()
+    pipeline.main()
+    wall = time.perf_counter() - start_wall
+    end_times = os.times()
+
+    # 분석 프로세스(analysis.workers > 0)의 CPU 시간도 포함 (종료된 자식 프로세스만 집계됨)
+    cpu_seconds = sum(end - start for start, end in zip(start_times[:4], end_times[:4]))
+    stages = pipeline.stage_timer.summary()
+    counts = pipeline.stage_timer.counts()
+    frames = stages.get("resize", {}).get("count", 0)  # 마지막 실패한 read는 제외
+    analyzed = counts.get("analyzed_frames", 0)
+    predict_calls = stages.get("predict", {}).get("count", 0)
+    predict_total_ms = stages.get("predict", {}).get("total_ms", 0.0)
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Linux: KB 단위
+    peak_child_rss_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss  # 가장 큰 자식 프로세스 하나
+
+    result = {
+        "model": os.path.basename(args.model),
+        "model_path": os.path.abspath(args.model),
+        "video": os.path.abspath(args.video),
+        "overrides": args.set or [],
+        "frames": frames,
+        "wall_s": round(wall, 3),
+        "fps": round(frames / wall, 2) if wall > 0 else 0.0,
+        "cpu_percent": round(cpu_seconds / wall * 100.0, 1) if wall > 0 else 0.0,
+        "peak_rss_mb": round(peak_rss_kb / 1024.0, 1),
+        "peak_child_rss_mb": round(peak_child_rss_kb / 1024.0, 1),
+        "analyzed_frames": analyzed,
+        "predict_calls": predict_calls,
+        "tracker_skipped": counts.get("tracker_skipped", 0),
+        "scheduler_skipped": counts.get("scheduler_skipped", 0),
+        "zone_skipped": counts.get("zone_skipped", 0),
+        "cameras": len(pipeline.cameras),
+        "camera_stats": pipeline.camera_stats(),
+        "scheduler": pipeline.cameras[0].scheduler.summary() if pipeline.cameras[0].scheduler else None,
+        "mean_batch": round(analyzed / predict_calls, 2) if predict_calls else 0.0,
+        # 순수 분석 처리량: 분석한 프레임 수 / predict에 쓴 총 시간
+        "inference_fps": round(analyzed / (predict_total_ms / 1000.0), 2) if predict_total_ms else 0.0,
+        "inference_ms_per_frame": round(predict_total_ms / analyzed, 3) if analyzed else 0.0,
+        "uploads": counts.get("uploads", 0),
+        "upload_stats": pipeline.upload_pool.stats() if pipeline.upload_pool else None,
+        "outbox_uploads": counts.get("outbox_uploads", 0),
+        "upload_round_trips": pipeline.firebase_manager.upload_stats(),
+        "cascade": cascade.summarize_stats(pipeline.cascade_stats()) if pipeline.cascade_stats() else None,
+        "result_cache": result_cache.summarize_stats(pipeline.cache_stats()) if pipeline.cache_stats() else None,
+        "clips": pipeline.cameras[0].clip_writer.summary() if pipeline.cameras[0].clip_writer else None,
+        "startup": pipeline.startup.summary(),
+        "stages": {stage: stages[stage] for stage in STAGE_ORDER + sorted(stages) if stage in stages},
+    }
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def run_replay(video, model, config_path, overrides=None, num_cameras=None):
+    """모델 하나에 대해 자식 프로세스로 재생을 실행하고 결과(dict)를 반환"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        result_path = tmp.name
+    cmd = [sys.executable, os.path.abspath(__file__), "--child",
+           "--video", video, "--model", model, "--config", config_path, "--result", result_path]
+    for item in overrides or []:
+        cmd += ["--set", item]
+    if num_cameras:
+        cmd += ["--num-cameras", str(num_cameras)]
+    subprocess.run(cmd, check=True)
+    with open(result_path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    os.remove(result_path)
+    return result
+
+
+def environment_info():
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def print_result(result):
+    print(f"\n=== {result['model']} {' '.join(result['overrides'])}")
+    print(f"프레임 {result['frames']}개, {result['wall_s']}초, {result['fps']} FPS, "
+          f"CPU {result['cpu_percent']}%, 최대 메모리 {result['peak_rss_mb']} MB, "
+          f"분석 {result['analyzed_frames']}프레임 ({result['predict_calls']}회 호출, 평균 배치 {result['mean_batch']}), "
+          f"분석 처리량 {result['inference_fps']} frames/s, 업로드 {result['uploads']}회")
+    print(f"{'stage':<16} {'count':>7} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for stage, s in result['stages'].items():
+        print(f"{stage:<16} {s['count']:>7} {s['mean_ms']:>9.2f} {s['p50_ms']:>9.2f} "
+              f"{s['p90_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    for tier, s in (result.get('cascade') or {}).items():
+        print(f"cascade {tier}: 이미지 {s['images']}장, escalation {s['escalation_rate'] * 100:.1f}%, "
+              f"평균 {s['mean_ms_per_image']}ms/장")
+    if result.get('result_cache'):
+        s = result['result_cache']
+        print(f"result cache: 적중 {s['hits']}회, 실패 {s['misses']}회 (적중률 {s['hit_rate'] * 100:.1f}%)")
+
+
+def update_performance_table(md_path, results, env):
+    """performance.md 표에서 측정한 모델 행의 Inference Time / CPU Usage / Memory / Notes 열을 갱신"""
+    with open(md_path, 'r', encoding='utf-8') as f:
+        lines = f.read().split("\n")
+
+    header_idx = next(i for i, line in enumerate(lines) if line.startswith("| Model Name"))
+    headers = [h.strip() for h in lines[header_idx].strip().strip("|").split("|")]
+    col = {name: headers.index(name) for name in headers}
+    by_model = {r['model']: r for r in results}
+    note = f"replay {env['machine']} {env['cpu_count']}코어"
+
+    for i in range(header_idx + 2, len(lines)):
+        if not lines[i].startswith("|"):
+            break
+        cells = [c.strip() for c in lines[i].strip().strip("|").split("|")]
+        model_name = cells[col["Model Name"]].strip("`")
+        result = by_model.get(model_name)
+        if result is None:
+            continue
+        if result['analyzed_frames']:
+            cells[col["Inference Time (ms)"]] = f"{result['inference_ms_per_frame']:.1f}"
+        cells[col["CPU Usage (%)"]] = f"{result['cpu_percent']:.1f}"
+        cells[col["Memory (MB)"]] = f"{result['peak_rss_mb']:.0f}"
+        cells[col["Notes"]] = note
+        lines[i] = "| " + " | ".join(cells) + " |"
+
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    print(f"[INFO] {md_path} 표 갱신 완료")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="녹화 영상 재생 기반 파이프라인 벤치마크")
+    parser.add_argument("--video", required=True, help="재생할 영상 파일")
+    parser.add_argument("--models", nargs="+", help="측정할 모델 파일들 (.pt)")
+    parser.add_argument("--model", help=argparse.SUPPRESS)
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="기본 설정 파일")
+    parser.add_argument("--set", action="append", help="설정 덮어쓰기 (예: detection.min_area=800)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int,
+                        help="배치 크기별 분석 처리량 비교 (capture_interval=0으로 분석 큐를 가득 채워 측정)")
+    parser.add_argument("--cameras", nargs="+", type=int,
+                        help="카메라 수별 메모리/처리량 비교 (같은 영상을 카메라 N대가 동시에 재생)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--update-table", action="store_true", help="performance.md 표 갱신")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--num-cameras", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    models = args.models or [os.path.join(PROJECT_ROOT, "models", "bird_detect_320.pt")]
+    env = environment_info()
+    results = []
+    for model in models:
+        if args.batch_sizes:
+            for batch_size in args.batch_sizes:
+                overrides = (args.set or []) + [f"yolo.batch_size={batch_size}", "detection.capture_interval=0"]
+                result = run_replay(args.video, model, args.config, overrides)
+                result['batch_size'] = batch_size
+                print_result(result)
+                results.append(result)
+        elif args.cameras:
+            for num_cameras in args.cameras:
+                result = run_replay(args.video, model, args.config, args.set, num_cameras)
+                print_result(result)
+                results.append(result)
+        else:
+            result = run_replay(args.video, model, args.config, args.set)
+            print_result(result)
+            results.append(result)
+
+    if args.batch_sizes:
+        print(f"\n{'model':<24} {'batch':>5} {'mean batch':>10} {'frames/s':>9} {'ms/frame':>9}")
+        for r in results:
+            print(f"{r['model']:<24} {r['batch_size']:>5} {r['mean_batch']:>10} "
+                  f"{r['inference_fps']:>9} {r['inference_ms_per_frame']:>9}")
+
+    if args.cameras:
+        print(f"\n{'model':<24} {'cameras':>7} {'peak MB':>8} {'frames/s':>9} {'analyzed per camera':>20}")
+        for r in results:
+            analyzed = [stats['analyzed'] for stats in r['camera_stats'].values()]
+            print(f"{r['model']:<24} {r['cameras']:>7} {r['peak_rss_mb']:>8} {r['fps']:>9} {str(analyzed):>20}")
+
+    report = {"environment": env, "video": os.path.abspath(args.video), "runs": results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] 결과 저장: {args.output}")
+    if args.update_table:
+        update_performance_table(PERFORMANCE_MD, results, env)
+
+
+if __name__ == "__main__":
+    main()
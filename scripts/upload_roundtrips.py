@@ -0,0 +1,104 @@
+# 업로드 요청 왕복 횟수 비교 스크립트 (로컬 대체 모듈 local_firebase 사용)
+#
+# 같은 탐지 결과 N개를 업로드 풀(upload_pool)로 보내면서 방식별로
+# 탐지 1건당 요청 왕복 횟수, 전체 소요 시간, 1건당 업로드 지연(p50/p90)을 비교합니다.
+# - legacy : 업로드 후 make_public() 요청을 따로 보내고, 메타데이터는 문서마다 저장 (예전 방식)
+# - acl    : 업로드 요청에 공개 ACL 포함, 메타데이터는 문서마다 저장
+# - batched: 업로드 요청에 공개 ACL 포함, 메타데이터는 WriteBatch로 모아서 저장
+# 시나리오
+# - backlog: outbox에 쌓인 N개를 한꺼번에 보내는 경우 (오프라인 후 복구)
+# - live   : 탐지될 때마다 하나씩 보내는 경우
+#
+# 사용 예:
+#   python scripts/upload_roundtrips.py --uploads 100 --latency-ms 80 --workers 4
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+import local_firebase  # noqa: E402
+import perf_stats  # noqa: E402
+from upload_pool import UploadPool, UploadJob  # noqa: E402
+
+MODES = {
+    "legacy": {"separate_acl": True, "batch_size": 1},
+    "acl": {"separate_acl": False, "batch_size": 1},
+    "batched": {"separate_acl": False, "batch_size": 20},
+}
+
+
+def run(mode, scenario, args):
+    module = importlib.reload(local_firebase)  # 모듈 전역 통계 초기화
+    options = MODES[mode]
+    module.configure(tempfile.mkdtemp(prefix="upload_rt_"), latency_ms=args.latency_ms,
+                     separate_acl=options["separate_acl"])
+    module.initialize_firebase(options["batch_size"], args.window_ms)
+    pool = UploadPool(module.upload_detection_data, num_workers=args.workers, queue_size=args.uploads).start()
+
+    image = np.random.default_rng(0).integers(0, 255, 40 * 1024, dtype=np.uint8)  # 40KB 정도의 JPEG 대신
+    latencies = []
+    done = threading.Semaphore(0)
+
+    def on_complete(job, result):
+        latencies.append((time.perf_counter() - job.context) * 1000.0)
+        done.release()
+
+    start = time.perf_counter()
+    for _ in range(args.uploads):
+        pool.submit(UploadJob((image, "Crow", 0.9), on_complete=on_complete, context=time.perf_counter()))
+        if scenario == "live":
+            done.acquire()
+    if scenario == "backlog":
+        for _ in range(args.uploads):
+            done.acquire()
+    wall = time.perf_counter() - start
+
+    pool.stop()
+    module.shutdown()
+    stats = module.upload_stats()
+    latencies.sort()
+    return {
+        "mode": mode,
+        "scenario": scenario,
+        "round_trips_per_upload": stats["round_trips_per_upload"],
+        "firestore_commits": stats["firestore_commit"],
+        "wall_s": round(wall, 3),
+        "p50_ms": round(perf_stats.percentile(latencies, 50), 1),
+        "p90_ms": round(perf_stats.percentile(latencies, 90), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="업로드 방식별 요청 왕복 횟수 비교")
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--latency-ms", type=int, default=80, help="요청 한 번의 가상 왕복 시간")
+    parser.add_argument("--workers", type=int, default=4, help="업로드 스레드 수")
+    parser.add_argument("--window-ms", type=int, default=200, help="WriteBatch 대기 시간")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    results = [run(mode, scenario, args) for scenario in ("backlog", "live") for mode in MODES]
+
+    print(f"\n{'scenario':<9} {'mode':<8} {'RT/upload':>9} {'commits':>8} {'wall(s)':>8} {'p50(ms)':>8} {'p90(ms)':>8}")
+    for r in results:
+        print(f"{r['scenario']:<9} {r['mode']:<8} {r['round_trips_per_upload']:>9} {r['firestore_commits']:>8} "
+              f"{r['wall_s']:>8} {r['p50_ms']:>8} {r['p90_ms']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
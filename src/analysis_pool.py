@@ -0,0 +1,306 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+from shared_frames import SharedFrameRing
+
+# =====================================================================================
+# 멀티 프로세스 분석 풀
+# 프레임은 공유 메모리 링(SharedFrameRing)에 한 번만 복사하고, 작업 큐에는 슬롯 번호만 넣습니다.
+# 각 분석 프로세스는 시작할 때 모델을 한 번 로딩하고, 큐에서 작업을 배치로 꺼내 추론합니다.
+# 결과는 메인 프로세스의 결과 스레드에서 on_result 콜백으로 처리한 뒤 슬롯을 반납합니다.
+# 분석이 별도 프로세스에서 돌기 때문에 캡처 루프와 GIL을 두고 경쟁하지 않습니다.
+# 여러 카메라가 함께 쓸 때는 카메라(key)마다 쓸 수 있는 슬롯 수를 slot_quota로 제한해,
+# 움직임이 많은 카메라가 슬롯을 모두 차지해 다른 카메라의 프레임이 들어가지 못하는 일이 없게 합니다.
+# 카메라마다 해상도가 다를 수 있으므로 링은 프레임 크기별로 하나씩 (그 크기의 프레임이 처음 들어올 때) 만듭니다.
+# 슬롯은 (링 이름, 슬롯 번호)로 구분합니다.
+# =====================================================================================
+
+
+def _collect_batch(task_queue, first_task, batch_size, batch_max_wait_ms):
+    """첫 작업 이후 최대 batch_size개까지 모으되, batch_max_wait_ms 이상은 기다리지 않음"""
+    batch = [first_task]
+    deadline = time.perf_counter() + batch_max_wait_ms / 1000.0
+    while len(batch) < batch_size:
+        remaining = deadline - time.perf_counter()
+        try:
+            task = task_queue.get(timeout=max(remaining, 0.001))
+        except queue.Empty:
+            break
+        if task is None:  # 종료 신호는 다음 루프에서 처리하도록 되돌려 놓음
+            task_queue.put(None)
+            break
+        batch.append(task)
+    return batch
+
+
+def _worker_main(worker_id, task_queue, result_queue, num_slots, engine_options, conf, batch_size,
+                 batch_max_wait_ms, threads):
+    """분석 프로세스 진입점. 모델을 한 번 로딩한 뒤 종료 신호(None)를 받을 때까지 작업을 처리"""
+    # 프로세스 여러 개가 각각 모든 코어를 쓰려고 하면 오히려 느려지므로 스레드 수를 제한
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    try:
+        import inference
+        import cascade
+
+        if engine_options.get("backend", "torch") == "torch":
+            import torch
+            torch.set_num_threads(threads)
+        engine = cascade.build_engine(engine_options, threads=threads)
+    except Exception as e:
+        # 모델 파일이 없거나 export에 실패하면 작업을 받지 않고 종료 (메인 프로세스가 실패로 처리)
+        result_queue.put(("error", worker_id, None, f"모델 로딩 실패: {e}", None))
+        return
+
+    rings = {}  # 링 이름 -> 연결한 링 (그 링의 작업을 처음 받을 때 연결)
+    print(f"[INFO] 분석 프로세스 #{worker_id} 모델 로딩 완료 (pid {os.getpid()})")
+    result_queue.put(("ready", worker_id, None, None, None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        batch = _collect_batch(task_queue, task, batch_size, batch_max_wait_ms)
+        # 처리 중에 이 프로세스가 죽으면 메인 프로세스가 이 슬롯들을 반납할 수 있도록 먼저 알림
+        result_queue.put(("taken", worker_id, None, [ticket for ticket, _, _, _ in batch], None))
+        jobs = []
+        for (ring_name, slot), _, regions, shape in batch:
+            if ring_name not in rings:
+                rings[ring_name] = SharedFrameRing.attach(ring_name, num_slots, shape)
+            jobs.append((rings[ring_name].view(slot), regions))
+        start = time.perf_counter()
+        try:
+            batch_detections = inference.predict_jobs(engine, jobs, conf)
+        except Exception as e:
+            print(f"[ERROR] 분석 프로세스 #{worker_id}에서 오류 발생: {e}")
+            batch_detections = [[] for _ in batch]
+        elapsed = time.perf_counter() - start
+        # cascade 단계별 통계 / 결과 캐시 통계도 함께 보냄 (사용하지 않으면 None)
+        result_queue.put(("batch", worker_id, elapsed,
+                          [(ticket, timestamp, detections)
+                           for (ticket, timestamp, _, _), detections in zip(batch, batch_detections)],
+                          {"cascade": getattr(engine, "stats", None), "cache": getattr(engine, "cache_stats", None)}))
+
+    jobs = None
+    for ring in rings.values():
+        ring.close()
+
+
+class AnalysisPool:
+    """
+    분석 프로세스 풀.
+    submit()으로 프레임을 공유 메모리 슬롯에 복사해 작업을 넣고,
+    결과가 오면 on_result(frame_view, timestamp, detections, key)를 메인 프로세스에서 호출합니다.
+    engine_options는 cascade.build_engine()에 넘길 인자 (model_path, backend, imgsz, cascade)입니다.
+    공유 메모리 링은 frame_shape 크기로 하나 만들고, 다른 크기의 프레임이 들어오면
+    그 크기의 링(슬롯 num_slots개)을 더 만듭니다.
+    분석 프로세스가 죽으면 그 프로세스가 처리 중이던 슬롯을 반납하고, 모두 죽으면 남은 작업을 버린 뒤
+    on_failure(이유)를 호출합니다. 그 뒤로 submit()은 항상 False입니다.
+    """
+
+    def __init__(self, num_workers, num_slots, frame_shape, engine_options, conf, on_result,
+                 batch_size=1, batch_max_wait_ms=0, threads_per_worker=1, slot_quota=None, stage_timer=None,
+                 on_failure=None):
+        self.num_workers = num_workers
+        self.on_result = on_result
+        self.on_failure = on_failure
+        self.failed = False
+        self.slot_quota = slot_quota or num_slots  # key 하나가 동시에 쓸 수 있는 최대 슬롯 수
+        self.stage_timer = stage_timer
+        self.num_slots = num_slots
+        self.rings = {}  # 프레임 크기 -> 링
+        self._rings_by_name = {}
+        self._rings_lock = threading.Lock()
+
+        ctx = mp.get_context("spawn")  # 스레드가 떠 있는 상태에서 fork하지 않도록 spawn 사용
+        self.task_queue = ctx.Queue()
+        self.result_queue = ctx.Queue()
+        self.processes = [
+            ctx.Process(target=_worker_main, name=f"analysis-{i}", daemon=True,
+                        args=(i, self.task_queue, self.result_queue, num_slots, engine_options, conf, batch_size,
+                              batch_max_wait_ms, threads_per_worker))
+            for i in range(num_workers)
+        ]
+        self._pending = 0
+        self._slot_keys = {}  # (링 이름, 슬롯) -> 넣은 key (메인 프로세스에서만 사용)
+        self._slot_submitted = {}  # (링 이름, 슬롯) -> 넣은 시각 (perf_counter)
+        self._key_slots = {}  # key -> 사용 중인 슬롯 수
+        self._engine_stats = {}  # 분석 프로세스별 엔진 통계 {"cascade": ..., "cache": ...}
+        self._worker_slots = {}  # 분석 프로세스 -> 처리 중인 슬롯 목록 (죽으면 반납)
+        self._dead_workers = set()
+        self._errors = {}  # 분석 프로세스 -> 보낸 오류 메시지
+        self._pending_cond = threading.Condition()
+        self._stop = threading.Event()
+        self._stopping = threading.Event()  # stop()으로 분석 프로세스를 끝내는 중 (종료를 실패로 보지 않음)
+        self._result_thread = threading.Thread(target=self._result_loop, name="analysis-results", daemon=True)
+        self._ring_for(frame_shape)
+
+    def _ring_for(self, shape):
+        """프레임 크기에 맞는 링 (없으면 만듦)"""
+        shape = tuple(shape)
+        ring = self.rings.get(shape)
+        if ring is None:
+            with self._rings_lock:
+                ring = self.rings.get(shape)
+                if ring is None:
+                    ring = SharedFrameRing(self.num_slots, shape)
+                    self._rings_by_name[ring.name] = ring
+                    self.rings[shape] = ring
+                    if len(self.rings) > 1:
+                        print(f"[INFO] 프레임 크기 {shape}용 공유 메모리 슬롯 {self.num_slots}개 추가")
+        return ring
+
+    def _view(self, ticket):
+        ring_name, slot = ticket
+        return self._rings_by_name[ring_name].view(slot)
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        self._result_thread.start()
+        print(f"[INFO] 분석 프로세스 {self.num_workers}개 시작 (공유 메모리 슬롯 {self.num_slots}개)")
+        return self
+
+    def submit(self, frame, timestamp, regions=None, block=False, key=None):
+        """프레임을 빈 슬롯에 복사하고 작업을 넣습니다. 빈 슬롯이 없거나 key가 slot_quota만큼 쓰고 있으면 False"""
+        ring = self._ring_for(frame.shape)
+        with self._pending_cond:
+            if self.failed:
+                return False
+            if self._key_slots.get(key, 0) >= self.slot_quota:
+                if not block:
+                    return False
+                self._pending_cond.wait_for(lambda: self.failed or self._key_slots.get(key, 0) < self.slot_quota)
+                if self.failed:
+                    return False
+            self._key_slots[key] = self._key_slots.get(key, 0) + 1
+        slot = None
+        while slot is None:
+            # 분석 프로세스가 모두 죽으면 슬롯이 반납되지 않을 수 있으므로 기다리는 동안 실패 여부를 확인
+            slot = ring.acquire(block=block, timeout=0.5 if block else None)
+            if slot is None and (not block or self.failed):
+                with self._pending_cond:
+                    self._key_slots[key] -= 1
+                return False
+        ring.view(slot)[...] = frame  # 유일한 복사: 캡처 버퍼 -> 공유 메모리 슬롯
+        ticket = (ring.name, slot)
+        with self._pending_cond:
+            if self.failed:  # 슬롯을 복사하는 사이에 실패한 경우
+                self._key_slots[key] -= 1
+                ring.release(slot)
+                return False
+            self._pending += 1
+            self._slot_keys[ticket] = key
+            self._slot_submitted[ticket] = time.perf_counter()
+        self.task_queue.put((ticket, timestamp, regions, ring.shape))
+        return True
+
+    def pending(self):
+        with self._pending_cond:
+            return self._pending
+
+    def engine_stats(self, kind):
+        """분석 프로세스들의 최신 엔진 통계 목록. kind: cascade | cache"""
+        return [stats[kind] for stats in self._engine_stats.values() if stats[kind] is not None]
+
+    def join(self):
+        """넣은 작업의 결과 처리가 모두 끝날 때까지 대기"""
+        with self._pending_cond:
+            self._pending_cond.wait_for(lambda: self._pending == 0)
+
+    def _result_loop(self):
+        while not self._stop.is_set():
+            try:
+                kind, worker_id, elapsed, items, engine_stats = self.result_queue.get(timeout=0.5)
+            except queue.Empty:
+                # 받을 결과가 없을 때만 확인 (죽은 프로세스가 죽기 전에 보낸 결과를 먼저 처리)
+                self._check_workers()
+                continue
+            if kind == "taken":
+                self._worker_slots[worker_id] = items
+                continue
+            if kind == "error":
+                self._errors[worker_id] = items
+                print(f"[ERROR] 분석 프로세스 #{worker_id}: {items}")
+                continue
+            if kind != "batch":
+                continue
+            self._worker_slots.pop(worker_id, None)
+            self._engine_stats[worker_id] = engine_stats
+            if self.stage_timer:
+                self.stage_timer.record("predict", elapsed)
+                self.stage_timer.count("analyzed_frames", len(items))
+            received = time.perf_counter()
+            for ticket, timestamp, detections in items:
+                with self._pending_cond:
+                    key = self._slot_keys.pop(ticket, None)
+                    submitted = self._slot_submitted.pop(ticket, received)
+                if self.stage_timer:
+                    # 대기열에서 기다린 시간 (넣은 뒤 결과가 오기까지에서 추론 시간을 뺀 값)
+                    self.stage_timer.record("queue_wait", max(received - submitted - elapsed, 0.0))
+                try:
+                    self.on_result(self._view(ticket), timestamp, detections, key)
+                except Exception as e:
+                    print(f"[ERROR] 분석 결과 처리 중 오류 발생: {e}")
+                finally:
+                    self._finish(ticket, key)
+
+    def _finish(self, ticket, key):
+        ring_name, slot = ticket
+        self._rings_by_name[ring_name].release(slot)
+        with self._pending_cond:
+            self._pending -= 1
+            self._key_slots[key] -= 1
+            self._pending_cond.notify_all()
+
+    def _abandon(self, tickets):
+        """결과가 오지 않을 슬롯들을 분석하지 않은 채 반납"""
+        for ticket in tickets:
+            with self._pending_cond:
+                if ticket not in self._slot_keys:
+                    continue
+                key = self._slot_keys.pop(ticket)
+                self._slot_submitted.pop(ticket, None)
+            self._finish(ticket, key)
+
+    def _check_workers(self):
+        """(결과 스레드) 죽은 분석 프로세스를 찾아 처리 중이던 슬롯을 반납. 모두 죽으면 남은 작업도 모두 버림"""
+        if self._stopping.is_set():
+            return
+        for worker_id, process in enumerate(self.processes):
+            if worker_id in self._dead_workers or process.is_alive() or process.exitcode is None:
+                continue
+            self._dead_workers.add(worker_id)
+            slots = self._worker_slots.pop(worker_id, [])
+            print(f"[ERROR] 분석 프로세스 #{worker_id}가 종료되었습니다 (exit code {process.exitcode}, "
+                  f"처리 중이던 프레임 {len(slots)}개 버림)")
+            self._abandon(slots)
+        if self.failed or len(self._dead_workers) < len(self.processes):
+            return
+        with self._pending_cond:
+            self.failed = True
+            lost = list(self._slot_keys)
+            self._pending_cond.notify_all()
+        self._abandon(lost)
+        reason = "; ".join(sorted(set(self._errors.values()))) or "분석 프로세스가 모두 종료됨"
+        print(f"[ERROR] 분석 프로세스를 사용할 수 없습니다 (대기 중이던 프레임 {len(lost)}개 버림): {reason}")
+        if self.on_failure:
+            self.on_failure(reason)
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        for _ in self.processes:
+            self.task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._stop.set()
+        if self._result_thread.is_alive():
+            self._result_thread.join(timeout=timeout)
+        self.task_queue.close()
+        self.result_queue.close()
+        for ring in self.rings.values():
+            ring.close()
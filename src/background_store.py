@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# =====================================================================================
+# 배경 모델 저장 / 복원
+# MOG2는 재시작하면 배경을 처음부터 다시 학습하므로(history 프레임) 그동안 움직임 판단이 불안정합니다.
+# 학습한 배경 이미지(getBackgroundImage)를 주기적으로 PNG로 저장해 두었다가, 다시 시작하면
+# 첫 프레임을 받았을 때 저장한 배경을 seed_frames번 학습시켜 배경 모델을 미리 채웁니다.
+# (OpenCV는 MOG2의 가우시안 혼합 상태 자체를 내보내지 않으므로 배경 이미지로 다시 학습시킴)
+# 다음 경우에는 저장한 배경을 쓰지 않습니다.
+# - 저장한 지 max_age_s가 지남 (조명이 바뀌었을 수 있음)
+# - 축소 해상도 / history / threshold가 지금 설정과 다름
+# - 첫 프레임과의 평균 밝기 차이가 max_mean_diff보다 큼 (낮/밤, 카메라 위치 변경)
+# 저장은 캡처 루프를 멈추지 않도록 저장 스레드에서 하고, 종료할 때 한 번 더 저장합니다.
+# =====================================================================================
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BackgroundSnapshotter:
+    """
+    카메라 하나의 배경 스냅샷. 캡처 스레드에서 restore() (첫 프레임), maybe_save() (매 프레임)를 호출합니다.
+    저장 경로: directory/<카메라 이름>.png (배경 이미지) + .json (저장 시각, 설정)
+    """
+
+    def __init__(self, directory, name, settings, interval_s=300.0, max_age_s=3600.0, max_mean_diff=25.0,
+                 seed_frames=50, min_learned_frames=None):
+        self.directory = directory
+        self.image_path = os.path.join(directory, f"{name}.png")
+        self.meta_path = os.path.join(directory, f"{name}.json")
+        self.settings = settings  # {"resize_w", "resize_h", "history", "threshold"}. 다르면 복원하지 않음
+        self.interval_s = interval_s
+        self.max_age_s = max_age_s
+        self.max_mean_diff = max_mean_diff
+        self.seed_frames = seed_frames
+        # 이만큼 학습하기 전(복원하지 않았을 때)의 배경은 저장하지 않음
+        self.min_learned_frames = settings.get("history", 500) if min_learned_frames is None else min_learned_frames
+        self.restored = False
+        self.frames_seen = 0
+        self._last_save_time = None  # 프레임 시각
+        self._saving = None  # 진행 중인 저장 스레드
+        self.stats = {"saved": 0, "restored": 0, "rejected": None}
+        os.makedirs(directory, exist_ok=True)
+
+    def _load(self):
+        """(배경 이미지, 메타데이터). 없거나 읽지 못하면 (None, 이유)"""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None, "저장된 배경 없음"
+        except (OSError, ValueError) as e:
+            return None, f"메타데이터를 읽지 못함 ({e})"
+        image = cv2.imread(self.image_path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None, "배경 이미지를 읽지 못함"
+        return image, meta
+
+    def restore(self, detector, first_frame_small):
+        """
+        저장한 배경이 쓸 만하면 detector의 배경 모델을 채웁니다. 복원했으면 True
+        first_frame_small: 지금 카메라의 축소 프레임 (저장한 배경과 비교해 장면이 바뀌었는지 확인)
+        """
+        image, meta = self._load()
+        reason = None
+        if image is None:
+            reason = meta
+        elif time.time() - meta.get("saved_at", 0) > self.max_age_s:
+            reason = f"저장한 지 {(time.time() - meta.get('saved_at', 0)) / 60:.0f}분 지남"
+        elif any(meta.get(key) != value for key, value in self.settings.items()):
+            reason = "배경 차분 설정 또는 해상도가 다름"
+        elif image.shape != first_frame_small.shape:
+            reason = "이미지 크기가 다름"
+        else:
+            mean_diff = float(np.mean(cv2.absdiff(image, first_frame_small)))
+            if mean_diff > self.max_mean_diff:
+                reason = f"지금 장면과 차이가 큼 (평균 차이 {mean_diff:.1f})"
+        if reason:
+            self.stats["rejected"] = reason
+            print(f"[INFO] 저장한 배경을 사용하지 않습니다: {reason} ({self.image_path})")
+            return False
+        detector.seed_background(image, self.seed_frames)
+        self.restored = True
+        self.stats["restored"] += 1
+        print(f"[INFO] 저장한 배경으로 배경 모델 복원 ({self.image_path}, "
+              f"{(time.time() - meta['saved_at']) / 60:.0f}분 전 저장)")
+        return True
+
+    def maybe_save(self, detector, frame_time):
+        """(캡처 루프) 배경을 충분히 학습했고 저장 간격이 지났으면 배경 이미지를 저장 스레드에서 저장"""
+        self.frames_seen += 1
+        if self._last_save_time is None:
+            self._last_save_time = frame_time
+            return
+        if frame_time - self._last_save_time < self.interval_s or not self._ready_to_save():
+            return
+        if self._saving is not None and self._saving.is_alive():
+            return
+        self._last_save_time = frame_time
+        image = detector.background_image()  # 새 배열 (캡처 스레드에서만 MOG2에 접근)
+        self._saving = threading.Thread(target=self._save, args=(image,), name="background-save", daemon=True)
+        self._saving.start()
+
+    def save_now(self, detector):
+        """(종료 시) 지금 배경을 바로 저장"""
+        if self._saving is not None:
+            self._saving.join()
+        if self._ready_to_save():
+            self._save(detector.background_image())
+
+    def _ready_to_save(self):
+        return self.restored or self.frames_seen >= self.min_learned_frames
+
+    def _save(self, image):
+        if image is None:
+            return
+        try:
+            ok, data = cv2.imencode(".png", image)
+            if not ok:
+                raise ValueError("PNG 인코딩 실패")
+            _write_atomic(self.image_path, data.tobytes())
+            meta = dict(self.settings, saved_at=time.time())
+            _write_atomic(self.meta_path, json.dumps(meta).encode("utf-8"))
+            self.stats["saved"] += 1
+        except Exception as e:
+            print(f"[WARN] 배경 저장 실패: {e}")
+
+    def summary(self):
+        return dict(self.stats, frames_seen=self.frames_seen)
@@ -0,0 +1,66 @@
+import threading
+
+# =====================================================================================
+# 카메라별 파이프라인 상태
+# 여러 카메라를 함께 쓸 때 카메라마다 따로 가져야 하는 상태만 모아 둡니다.
+# (프레임 소스, 배경 차분기와 저장한 배경, 움직임 track, 처리 간격 모드, 감시 영역, 클립, 업로드 쿨다운)
+# 추론 엔진, 분석 대기열, 업로드 풀은 모든 카메라가 함께 쓰므로 카메라를 늘려도 모델은 늘지 않습니다.
+# =====================================================================================
+
+
+class CameraPipeline:
+    """카메라 하나의 상태. 캡처 스레드 하나가 소유하고, 쿨다운 상태만 분석/업로드 스레드와 공유"""
+
+    def __init__(self, name, source_config, source_device, cooldown_s, zone_map=None):
+        self.name = name
+        self.source_config = source_config
+        self.source_device = source_device  # Firestore 문서의 sourceDevice
+        self.cooldown_s = cooldown_s
+        self.zone_map = zone_map
+        # main()에서 채움
+        self.source = None
+        self.motion_detector = None
+        self.tracker = None
+        self.scheduler = None
+        self.clip_writer = None
+        self.background_store = None  # 배경 모델 저장 / 복원 (BackgroundSnapshotter)
+        # 캡처 루프 상태
+        self.motion_tracks = []
+        self.capture_buffer = None  # 첫 프레임 이후에는 같은 버퍼에 계속 읽어 들임
+        self.last_capture_time = 0
+        self.pending_reload = None  # 설정 감시 스레드가 넣은 바뀐 설정 (캡처 스레드가 프레임 사이에 적용)
+        # 업로드 쿨다운 상태 (결과 처리 스레드와 업로드 스레드가 함께 씀)
+        self.last_successful_upload_times = {}  # 쿨다운 키별 마지막 업로드 성공 시각 (프레임 시각 기준)
+        self.uploads_in_flight = set()  # 업로드 결과를 기다리는 쿨다운 키 (그동안 같은 키의 새 업로드는 넣지 않음)
+        self._lock = threading.Lock()
+        self.stats = {"frames": 0, "motion_frames": 0, "enqueued": 0, "queue_full": 0, "analyzed": 0, "uploads": 0}
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def cooldown_remaining(self, key, timestamp):
+        """업로드할 수 있으면 0, 이전 업로드 결과를 기다리는 중이면 None, 쿨다운 중이면 남은 시간(초)"""
+        with self._lock:
+            if key in self.uploads_in_flight:
+                return None
+            last_upload_time = self.last_successful_upload_times.get(key)
+        if last_upload_time is None or (timestamp - last_upload_time) > self.cooldown_s:
+            return 0
+        return max(0, self.cooldown_s - (timestamp - last_upload_time))
+
+    def mark_in_flight(self, key):
+        with self._lock:
+            self.uploads_in_flight.add(key)
+
+    def finish_upload(self, key, timestamp=None):
+        """업로드가 끝남. timestamp를 주면(성공) 그 시각부터 쿨다운"""
+        with self._lock:
+            self.uploads_in_flight.discard(key)
+            if timestamp is not None:
+                self.last_successful_upload_times[key] = timestamp
+                self.stats["uploads"] += 1
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,189 @@
+import os
+import time
+
+import numpy as np
+
+import inference
+import result_cache
+import roi
+
+# =====================================================================================
+# 모델 cascade
+# 모든 후보 이미지는 가장 가벼운 모델(예: bird_detect_320)로 먼저 분석하고,
+# 유효한 새 종류의 최고 confidence가 불확실 구간(uncertainty_band)에 들어올 때만
+# 다음 단계 모델(416 -> 640)로 다시 분석합니다. 대부분의 프레임은 작은 모델 비용으로 끝나고,
+# 애매한 경우에만 정밀한 모델의 판단을 따릅니다.
+# =====================================================================================
+
+
+class CascadeEngine(inference.InferenceEngine):
+    """여러 단계(tier)의 엔진을 confidence 기준으로 순서대로 호출하는 엔진"""
+
+    backend = "cascade"
+
+    def __init__(self, tiers, valid_species, uncertainty_band=(0.25, 0.6), escalate_on="detection",
+                 detection_padding=0.5, stage_timer=None):
+        """
+        tiers: [(이름, 엔진)] - 가벼운 모델부터
+        escalate_on: image(앞 단계가 본 이미지 전체) | detection(최고 confidence 탐지 박스 주변만)
+        """
+        super().__init__()
+        self.tiers = tiers
+        self.names = tiers[0][1].names
+        self.valid_species = set(valid_species)
+        self.band = tuple(uncertainty_band)
+        self.escalate_on = escalate_on
+        self.detection_padding = detection_padding
+        self.stage_timer = stage_timer
+        # 단계별 통계: 호출 수, 분석한 이미지 수, 넘겨받은(escalation) 이미지 수, 총 시간
+        self.stats = {name: {"calls": 0, "images": 0, "escalated": 0, "total_ms": 0.0} for name, _ in tiers}
+
+    def warmup(self, imgsz=320):
+        for _, engine in self.tiers:
+            engine.warmup(getattr(engine, "imgsz", None) or imgsz)
+
+    def _run_tier(self, level, images, conf):
+        name, engine = self.tiers[level]
+        start = time.perf_counter()
+        detections = engine.predict(images, conf)
+        elapsed = time.perf_counter() - start
+        stats = self.stats[name]
+        stats["calls"] += 1
+        stats["images"] += len(images)
+        stats["total_ms"] += elapsed * 1000.0
+        if self.stage_timer:
+            self.stage_timer.record(f"predict_{name}", elapsed)
+        return detections
+
+    def _top_valid(self, detections):
+        """confidence 내림차순 탐지 결과에서 유효한 새 종류 중 가장 높은 것"""
+        for detection in detections:
+            if detection.class_name in self.valid_species:
+                return detection
+        return None
+
+    def _is_uncertain(self, detection):
+        return detection is not None and self.band[0] <= detection.confidence < self.band[1]
+
+    def _escalation_input(self, image, detection):
+        """다음 단계에 넘길 이미지와 그 이미지의 원래 이미지 내 위치(offset)"""
+        if self.escalate_on != "detection":
+            return image, (0, 0)
+        h, w = image.shape[:2]
+        box = tuple(int(v) for v in detection.box)
+        x1, y1, x2, y2 = roi.pad_box(box, self.detection_padding, 64, w, h)
+        return np.ascontiguousarray(image[y1:y2, x1:x2]), (x1, y1)
+
+    def _merge_crop(self, detections, escalated, crop_detections):
+        """
+        박스 주변만 다시 분석한 경우: 애매했던 탐지 하나만 다음 단계의 crop 탐지로 바꾸고 나머지 탐지는 유지.
+        crop 탐지와 겹치는(IoU 0.5 이상) 나머지 탐지는 같은 대상이므로 다음 단계의 판단을 따름
+        """
+        kept = [d for d in detections if d is not escalated
+                and not any(roi.iou(d.box, c.box) >= 0.5 for c in crop_detections)]
+        return sorted(kept + crop_detections, key=lambda d: d.confidence, reverse=True)
+
+    def predict(self, images, conf):
+        # 불확실 구간의 탐지까지 봐야 하므로 각 단계는 구간 하한으로 실행하고, 마지막에 conf로 거름
+        tier_conf = min(self.band[0], conf)
+        results = self._run_tier(0, images, tier_conf)
+
+        candidates = list(range(len(images)))
+        for level in range(1, len(self.tiers)):
+            escalate = [i for i in candidates if self._is_uncertain(self._top_valid(results[i]))]
+            if not escalate:
+                break
+            inputs = [self._escalation_input(images[i], self._top_valid(results[i])) for i in escalate]
+            self.stats[self.tiers[level][0]]["escalated"] += len(escalate)
+            tier_results = self._run_tier(level, [image for image, _ in inputs], tier_conf)
+
+            # 다음 단계 모델의 판단으로 대체 (탐지가 없으면 앞 단계의 애매한 탐지는 버림)
+            for i, (_, (ox, oy)), detections in zip(escalate, inputs, tier_results):
+                replaced = [d._replace(box=(d.box[0] + ox, d.box[1] + oy, d.box[2] + ox, d.box[3] + oy))
+                            for d in detections]
+                if self.escalate_on == "detection":
+                    replaced = self._merge_crop(results[i], self._top_valid(results[i]), replaced)
+                results[i] = replaced
+            candidates = escalate
+
+        return [[d for d in detections if d.confidence >= conf] for detections in results]
+
+
+def merge_stats(stats_list):
+    """여러 프로세스의 단계별 통계를 합칩니다."""
+    merged = {}
+    for stats in stats_list:
+        for name, values in stats.items():
+            target = merged.setdefault(name, {"calls": 0, "images": 0, "escalated": 0, "total_ms": 0.0})
+            for key, value in values.items():
+                target[key] += value
+    return merged
+
+
+def summarize_stats(stats):
+    """단계별 escalation 비율과 평균 지연 시간을 계산"""
+    summary = {}
+    first_images = next(iter(stats.values()))["images"] if stats else 0
+    for name, s in stats.items():
+        summary[name] = {
+            "images": s["images"],
+            "escalated": s["escalated"],
+            "escalation_rate": round(s["escalated"] / first_images, 4) if first_images else 0.0,
+            "mean_ms_per_call": round(s["total_ms"] / s["calls"], 2) if s["calls"] else 0.0,
+            "mean_ms_per_image": round(s["total_ms"] / s["images"], 2) if s["images"] else 0.0,
+        }
+    return summary
+
+
+def print_stats(stats):
+    print("[INFO] cascade 단계별 통계")
+    for name, s in summarize_stats(stats).items():
+        print(f"        - {name}: 이미지 {s['images']}장, escalation {s['escalated']}회 "
+              f"({s['escalation_rate'] * 100:.1f}%), 평균 {s['mean_ms_per_image']}ms/장")
+
+
+def build_engine(engine_options, threads=None, stage_timer=None):
+    """
+    engine_options로 엔진을 만듭니다. engine_options['cascade']가 있으면 CascadeEngine을 만들고,
+    engine_options['result_cache']가 있으면 그 앞에 추론 결과 캐시(CachedEngine)를 둡니다.
+    engine_options: {model_path, backend, imgsz,
+                     cascade: {tiers, valid_species, uncertainty_band, ...} 또는 None,
+                     result_cache: {max_entries, ttl_s, max_distance, hash_size, hash_margin} 또는 None}
+    """
+    options = dict(engine_options)
+    cache_options = options.pop('result_cache', None)
+    engine = _build_cascade(options, threads, stage_timer)
+    if not cache_options:
+        return engine
+    cache = result_cache.ResultCache(
+        max_entries=cache_options.get('max_entries', 256),
+        ttl_s=cache_options.get('ttl_s', 10.0),
+        max_distance=cache_options.get('max_distance', 4),
+    )
+    return result_cache.CachedEngine(engine, cache, hash_size=cache_options.get('hash_size', 16),
+                                     hash_margin=cache_options.get('hash_margin', 4))
+
+
+def _build_cascade(options, threads, stage_timer):
+    options = dict(options)
+    cascade_options = options.pop('cascade', None)
+    base = inference.create_engine(threads=threads, **options)
+    if not cascade_options:
+        return base
+
+    tiers = [(_tier_name(options['model_path']), base)]
+    for tier in cascade_options['tiers']:
+        engine = inference.create_engine(tier['model_path'], tier.get('backend', options.get('backend', 'torch')),
+                                         tier.get('imgsz', options.get('imgsz', 320)), threads)
+        tiers.append((_tier_name(tier['model_path']), engine))
+    return CascadeEngine(
+        tiers, cascade_options['valid_species'],
+        uncertainty_band=cascade_options.get('uncertainty_band', (0.25, 0.6)),
+        escalate_on=cascade_options.get('escalate_on', 'detection'),
+        detection_padding=cascade_options.get('detection_padding', 0.5),
+        stage_timer=stage_timer,
+    )
+
+
+def _tier_name(model_path):
+    return os.path.splitext(os.path.basename(model_path))[0]
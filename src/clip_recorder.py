@@ -0,0 +1,217 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import perf_stats
+import tracing
+
+# =====================================================================================
+# 탐지 전후 영상 클립 저장
+# 최근 ring_seconds 동안의 프레임을 JPEG으로 압축해 메모리 링에 보관하다가,
+# 새 탐지가 확정되면(trigger) 탐지 시각 기준 pre_roll_s 전부터 post_roll_s 후까지를 MP4로 저장합니다.
+# - 캡처 루프는 프레임을 작은 대기열에 복사해 넣기만 하고, 압축은 압축 스레드가 합니다.
+#   대기열이 가득 차면 그 프레임은 버리고 dropped_frames로 셉니다. (캡처를 멈추지 않음)
+# - post-roll 프레임이 모두 모이면 인코딩 스레드가 JPEG을 풀어 MP4로 씁니다.
+#   클립 구간이 겹치는 탐지는 하나의 클립으로 합칩니다. (max_clip_s까지)
+# - 클립은 원본 대신 움직임 감지용 축소 프레임(resize_width x resize_height)으로 저장합니다.
+# 시각은 모두 프레임 시각 기준입니다.
+# =====================================================================================
+
+
+class PreEventRing:
+    """(프레임 시각, JPEG bytes)를 최근 seconds 동안, 최대 max_bytes까지 보관하는 링"""
+
+    def __init__(self, seconds, max_bytes):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.frames = deque()
+        self.bytes = 0
+        self.peak_bytes = 0
+        self.evicted_frames = 0
+
+    def append(self, frame_time, data):
+        self.frames.append((frame_time, data))
+        self.bytes += len(data)
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        while self.frames and (frame_time - self.frames[0][0] > self.seconds or self.bytes > self.max_bytes):
+            _, old = self.frames.popleft()
+            self.bytes -= len(old)
+            self.evicted_frames += 1
+
+    def window(self, start, end):
+        return [(t, data) for t, data in self.frames if start <= t <= end]
+
+    @property
+    def newest_time(self):
+        return self.frames[-1][0] if self.frames else None
+
+
+class _PendingClip:
+    def __init__(self, start, end, label, triggered_at, wall_time):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.triggered_at = triggered_at  # perf_counter (트리거부터 파일 완성까지의 지연 측정)
+        self.wall_time = wall_time  # 트리거한 실제 시각 (파일 이름. 녹화 영상 재생이면 start는 영상 내 시각)
+
+
+class ClipRecorder:
+    """
+    add_frame()은 캡처 루프에서, trigger()는 결과 처리 스레드에서 호출합니다.
+    클립은 output_dir/<탐지 시각>_<label>.mp4로 저장합니다. (같은 이름이 있으면 _2, _3 ...을 붙임)
+    """
+
+    def __init__(self, output_dir, fps=10.0, pre_roll_s=5.0, post_roll_s=5.0, max_clip_s=30.0,
+                 jpeg_quality=80, max_ring_mb=64, handoff_size=4, max_disk_mb=1024, stage_timer=None):
+        self.output_dir = output_dir
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self.fps = fps
+        self.pre_roll_s = pre_roll_s
+        self.post_roll_s = post_roll_s
+        self.max_clip_s = max_clip_s
+        self.jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.stage_timer = stage_timer or perf_stats.StageTimer()
+        # 링은 pre-roll에 post-roll을 기다리는 동안 밀려나지 않을 만큼 여유를 둠
+        self.ring = PreEventRing(pre_roll_s + max_clip_s, max_ring_mb * 1024 * 1024)
+        self.stats = {"frames": 0, "dropped_frames": 0, "clips": 0, "merged_triggers": 0, "failed_clips": 0}
+        self._last_added = None
+        self._frame_size = None
+        self._lock = threading.Lock()  # ring과 pending 클립 보호
+        self._pending = []
+        self._handoff = queue.Queue(maxsize=handoff_size)
+        self._encode_queue = queue.Queue()
+        self._compress_thread = threading.Thread(target=self._compress_loop, name="clip-compress", daemon=True)
+        self._encode_thread = threading.Thread(target=self._encode_loop, name="clip-encode", daemon=True)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def start(self):
+        self._compress_thread.start()
+        self._encode_thread.start()
+        return self
+
+    def add_frame(self, frame, frame_time, block=False):
+        """(캡처 루프) 클립 FPS 간격마다 프레임 복사본을 압축 스레드에 넘김. block=False면 대기열이 차면 버림"""
+        if self._last_added is not None and frame_time - self._last_added < 1.0 / self.fps - 1e-6:
+            return
+        self._last_added = frame_time
+        try:
+            self._handoff.put((frame_time, frame.copy(), tracing.current_frame()), block=block)
+        except queue.Full:
+            self.stats["dropped_frames"] += 1
+
+    def trigger(self, timestamp, label):
+        """timestamp 프레임에서 탐지 확정. 진행 중인 클립 구간과 겹치면 그 클립을 늘림"""
+        with self._lock:
+            for clip in self._pending:
+                if clip.start <= timestamp <= clip.end:
+                    clip.end = min(max(clip.end, timestamp + self.post_roll_s), clip.start + self.max_clip_s)
+                    self.stats["merged_triggers"] += 1
+                    return
+            self._pending.append(_PendingClip(timestamp - self.pre_roll_s, timestamp + self.post_roll_s,
+                                              label, time.perf_counter(), time.time()))
+        self._handoff_ready()
+
+    def _handoff_ready(self, flush=False):
+        """post-roll까지 프레임이 모인 클립(flush=True면 전부)을 인코딩 스레드로 넘김"""
+        with self._lock:
+            newest = self.ring.newest_time
+            ready = [clip for clip in self._pending if flush or (newest is not None and newest >= clip.end)]
+            for clip in ready:
+                self._pending.remove(clip)
+                self._encode_queue.put((clip, self.ring.window(clip.start, clip.end)))
+
+    def _compress_loop(self):
+        while True:
+            item = self._handoff.get()
+            if item is None:
+                break
+            frame_time, frame, frame_id = item
+            tracing.set_frame(frame_id)
+            with self.stage_timer.measure("clip_compress"):
+                ok, data = cv2.imencode(".jpg", frame, self.jpeg_params)
+            if ok:
+                with self._lock:
+                    self._frame_size = (frame.shape[1], frame.shape[0])
+                    self.ring.append(frame_time, data.tobytes())
+                    self.stats["frames"] += 1
+                self._handoff_ready()
+        self._handoff_ready(flush=True)
+        self._encode_queue.put(None)
+
+    def _encode_loop(self):
+        while True:
+            item = self._encode_queue.get()
+            if item is None:
+                break
+            clip, frames = item
+            start = time.perf_counter()
+            try:
+                path = self._write_clip(clip, frames)
+            except Exception as e:
+                self.stats["failed_clips"] += 1
+                print(f"[ERROR] 클립 저장 실패: {e}")
+                continue
+            if path is None:
+                continue
+            self.stats["clips"] += 1
+            self.stage_timer.record("clip_encode", time.perf_counter() - start)
+            self.stage_timer.record("clip_latency", time.perf_counter() - clip.triggered_at)
+            print(f"[INFO] 클립 저장: {path} ({len(frames)}프레임)")
+            self._remove_old_clips()
+
+    def _remove_old_clips(self):
+        """클립 폴더 용량이 max_disk_mb를 넘으면 오래된 클립부터 삭제"""
+        clips = sorted((entry for entry in os.scandir(self.output_dir) if entry.name.endswith(".mp4")
+                        and not entry.name.endswith(".tmp.mp4")), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in clips)
+        for entry in clips[:-1]:  # 방금 저장한 클립은 남김
+            if total <= self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+            print(f"[INFO] 클립 폴더 용량 초과. 오래된 클립 삭제: {entry.name}")
+
+    def _write_clip(self, clip, frames):
+        if not frames:
+            print("[WARN] 클립 구간의 프레임이 링에 남아 있지 않아 저장하지 않습니다.")
+            return None
+        name = f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(clip.wall_time))}_{clip.label.replace(' ', '_')}"
+        tmp_path = os.path.join(self.output_dir, f"{name}.tmp.mp4")
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, self._frame_size)
+        try:
+            # 클립 FPS의 각 시각에 그 시각 이전의 가장 최근 프레임을 씀 (프레임을 버린 구간도 재생 속도 유지)
+            index, decoded = -1, None
+            for tick in np.arange(frames[0][0], frames[-1][0] + 1e-6, 1.0 / self.fps):
+                latest = index
+                while latest + 1 < len(frames) and frames[latest + 1][0] <= tick + 1e-6:
+                    latest += 1
+                if latest != index:
+                    index = latest
+                    decoded = cv2.imdecode(np.frombuffer(frames[index][1], np.uint8), cv2.IMREAD_COLOR)
+                writer.write(decoded)
+        finally:
+            writer.release()
+        # 같은 초에 같은 종류의 클립이 있으면 덮어쓰지 않도록 번호를 붙임 (파일 이름은 인코딩 스레드에서만 정함)
+        path = os.path.join(self.output_dir, f"{name}.mp4")
+        number = 1
+        while os.path.exists(path):
+            number += 1
+            path = os.path.join(self.output_dir, f"{name}_{number}.mp4")
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, ring_frames=len(self.ring.frames), ring_mb=round(self.ring.bytes / 1048576, 2),
+                        ring_peak_mb=round(self.ring.peak_bytes / 1048576, 2), pending_clips=len(self._pending))
+
+    def close(self, timeout=30):
+        """남은 프레임을 압축하고, post-roll이 다 모이지 않은 클립도 있는 프레임까지 저장한 뒤 종료"""
+        self._handoff.put(None)
+        self._compress_thread.join(timeout=timeout)
+        self._encode_thread.join(timeout=timeout)
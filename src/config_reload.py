@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import namedtuple
+
+import yaml
+
+# =====================================================================================
+# 설정 파일 다시 읽기
+# ConfigWatcher가 설정 파일의 수정 시각/크기를 주기적으로 확인하고, 바뀌면 YAML을 읽어 검증한 뒤
+# 이전 설정과 다른 항목(점으로 이은 키, 예: detection.min_area)만 on_reload(new_config, changes)로 넘깁니다.
+# - 파싱이나 검증에 실패하면 오류만 출력하고 이전 설정을 계속 씁니다. (파일을 고치면 다시 읽음)
+# - 어떤 항목을 실행 중에 적용할지, 어떻게 적용할지는 on_reload 쪽(main.py)에서 정합니다.
+# =====================================================================================
+
+# 실행 중에 바꿀 수 있는 전역 값. 읽는 쪽은 live 객체 하나를 통째로 읽으므로 값이 섞이지 않음
+LiveSettings = namedtuple("LiveSettings", ["capture_interval", "confidence_threshold", "valid_species",
+                                           "upload_cooldown"])
+
+
+def flatten(config, prefix=""):
+    """중첩된 dict를 {"section.key": 값}으로 펼침. list는 하나의 값으로 취급"""
+    items = {}
+    for key, value in (config or {}).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, name + "."))
+        else:
+            items[name] = value
+    return items
+
+
+def diff_config(old, new):
+    """바뀐 항목 [(키, 이전 값, 새 값)] (키 순서대로). 없어진 키는 새 값이 None"""
+    old_items, new_items = flatten(old), flatten(new)
+    return [(key, old_items.get(key), new_items.get(key))
+            for key in sorted(set(old_items) | set(new_items)) if old_items.get(key) != new_items.get(key)]
+
+
+def _number(config, key, minimum=None, maximum=None, integer=False):
+    section, name = key.split(".")
+    value = (config.get(section) or {}).get(name)
+    if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+        raise ValueError(f"{key}: {'정수' if integer else '숫자'}가 아님 ({value!r})")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f"{key}: 범위를 벗어남 ({value!r})")
+    return value
+
+
+def validate(config):
+    """main.py가 시작할 때 읽는 필수 항목과 실행 중에 바꿀 수 있는 항목의 형식을 확인. 잘못되면 ValueError"""
+    if not isinstance(config, dict):
+        raise ValueError("설정 파일의 최상위가 dict가 아님")
+    for section in ("camera", "detection", "background_subtraction", "yolo"):
+        if not isinstance(config.get(section), dict):
+            raise ValueError(f"{section} 항목이 없음")
+    for key in ("camera.frame_width", "camera.frame_height", "camera.resize_width", "camera.resize_height"):
+        _number(config, key, minimum=1, integer=True)
+    _number(config, "detection.capture_interval", minimum=0)
+    _number(config, "detection.firebase_upload_cooldown", minimum=0)
+    _number(config, "detection.min_area", minimum=0)
+    _number(config, "background_subtraction.history", minimum=1, integer=True)
+    _number(config, "background_subtraction.threshold", minimum=0)
+    _number(config, "yolo.confidence_threshold", minimum=0, maximum=1)
+    species = config["yolo"].get("valid_bird_species")
+    if not isinstance(species, list) or not species or not all(isinstance(name, str) for name in species):
+        raise ValueError(f"yolo.valid_bird_species: 이름 목록이 아님 ({species!r})")
+    return config
+
+
+class ConfigWatcher:
+    """설정 파일을 interval_s마다 확인하여 바뀐 항목이 있으면 on_reload(new_config, changes)를 호출하는 스레드"""
+
+    def __init__(self, path, config, on_reload, interval_s=2.0):
+        self.path = path
+        self.config = config  # 마지막으로 적용한 설정
+        self.on_reload = on_reload
+        self.interval_s = interval_s
+        self.reloads = 0
+        self.errors = 0
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def start(self):
+        self._thread.start()
+        print(f"[INFO] 설정 파일 변경 감시 시작: {self.path}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval_s + 1)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            # 편집기가 파일을 나눠 쓰는 중일 수 있으므로 크기/수정 시각이 멈출 때까지 잠깐 기다린 뒤 읽음
+            while not self._stop.wait(0.2):
+                settled = self._stat()
+                if settled == signature:
+                    break
+                signature = settled
+            self._signature = signature
+            self.check()
+
+    def check(self):
+        """설정 파일을 다시 읽어 바뀐 항목이 있으면 적용. 적용한 변경 목록 (실패하거나 바뀐 것이 없으면 [])"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                new_config = validate(yaml.safe_load(f))
+        except (OSError, yaml.YAMLError, ValueError) as e:
+            self.errors += 1
+            print(f"[ERROR] 바뀐 설정 파일을 적용하지 않습니다 (이전 설정 유지): {e}")
+            return []
+        changes = diff_config(self.config, new_config)
+        if not changes:
+            return []
+        try:
+            self.on_reload(new_config, changes)
+        except Exception as e:
+            self.errors += 1
+            print(f"[ERROR] 설정 적용 중 오류 발생: {e}")
+            return []
+        self.config = new_config
+        self.reloads += 1
+        return changes
@@ -0,0 +1,98 @@
+import queue
+import threading
+from collections import OrderedDict, deque
+
+# =====================================================================================
+# 카메라별 공정 분석 대기열
+# 카메라(키)마다 크기가 제한된 대기열을 따로 두고, 꺼낼 때는 작업이 있는 카메라를 돌아가며(라운드 로빈) 꺼냅니다.
+# - 움직임이 많은 카메라가 자기 대기열을 가득 채워도 다른 카메라의 자리는 줄지 않습니다.
+# - 배치로 꺼내면 여러 카메라의 프레임이 번갈아 섞이므로, 바쁜 카메라가 추론 시간을 독차지하지 못합니다.
+# queue.Queue와 같은 get / get_nowait / task_done / join / qsize를 제공하므로 분석 스레드는 그대로 씁니다.
+# =====================================================================================
+
+
+class FairQueue:
+    """키별 대기열(최대 maxsize_per_key개) + 라운드 로빈 꺼내기"""
+
+    def __init__(self, maxsize_per_key=10):
+        self.maxsize_per_key = maxsize_per_key
+        self._queues = OrderedDict()  # 키 -> deque. 앞쪽 키부터 꺼내고, 꺼낸 키는 맨 뒤로
+        self._size = 0
+        self._unfinished = 0
+        self._cond = threading.Condition()
+        self.stats = {}  # 키 -> {"put", "dropped", "served"}
+
+    def _key_stats(self, key):
+        return self.stats.setdefault(key, {"put": 0, "dropped": 0, "served": 0})
+
+    def put(self, key, item, block=True, timeout=None):
+        """key의 대기열에 넣습니다. 그 키의 대기열이 가득 차 있으면 (block=False거나 timeout이 지나면) queue.Full"""
+        with self._cond:
+            pending = self._queues.setdefault(key, deque())
+            stats = self._key_stats(key)
+            if len(pending) >= self.maxsize_per_key:
+                if not block or not self._cond.wait_for(lambda: len(pending) < self.maxsize_per_key, timeout):
+                    stats["dropped"] += 1
+                    raise queue.Full
+            pending.append(item)
+            stats["put"] += 1
+            self._size += 1
+            self._unfinished += 1
+            self._cond.notify_all()
+
+    def get(self, block=True, timeout=None):
+        """작업이 있는 키를 돌아가며 하나씩 꺼냅니다. 비어 있으면 (block=False거나 timeout이 지나면) queue.Empty"""
+        with self._cond:
+            if not self._size:
+                if not block or not self._cond.wait_for(lambda: self._size > 0, timeout):
+                    raise queue.Empty
+            for key, pending in self._queues.items():
+                if pending:
+                    break
+            self._queues.move_to_end(key)
+            item = pending.popleft()
+            self._key_stats(key)["served"] += 1
+            self._size -= 1
+            self._cond.notify_all()  # 이 키의 대기열에 자리가 남
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        with self._cond:
+            self._unfinished -= 1
+            if self._unfinished <= 0:
+                self._cond.notify_all()
+
+    def join(self):
+        """넣은 작업이 모두 task_done() 될 때까지 대기"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._unfinished <= 0)
+
+    def qsize(self, key=None):
+        with self._cond:
+            if key is None:
+                return self._size
+            return len(self._queues.get(key, ()))
+
+    def summary(self):
+        with self._cond:
+            return {key: dict(stats) for key, stats in self.stats.items()}
+
+
+if __name__ == "__main__":
+    # 바쁜 카메라(매번 3장)와 조용한 카메라(매번 1장)가 함께 넣고, 엔진은 매번 2장만 처리할 때
+    # FIFO 하나였다면 조용한 카메라의 프레임은 바쁜 카메라의 프레임 뒤에서 점점 오래 기다리게 됨
+    fair = FairQueue(maxsize_per_key=6)
+    for step in range(30):
+        for _ in range(3):
+            try:
+                fair.put("busy", "busy", block=False)
+            except queue.Full:
+                pass
+        fair.put("quiet", "quiet", block=False)
+        for _ in range(2):
+            fair.get_nowait()
+            fair.task_done()
+    print(f"남은 작업 {fair.qsize()}개, 카메라별 통계: {fair.summary()}")
@@ -3,6 +3,9 @@ from firebase_admin import credentials, firestore, storage
 import datetime
 import uuid
 import os
+import threading
+from metadata_batcher import MetadataBatcher # Firestore WriteBatch로 메타데이터 모아 쓰기
+from image_derivatives import derivative_images, derivative_path # 원본 + 크기별 파생본 (thumb / preview)
 
 # =====================================================================================
 # Firebase 설정
@@ -19,8 +22,16 @@ _STORAGE_BUCKET = "bird-recog-project.firebasestorage.app"
 
 # =====================================================================================
 
-def initialize_firebase():
-    """Firebase Admin SDK를 초기화합니다."""
+_uploader = None # initialize_firebase()에서 만드는 FirebaseUploader (프로그램이 끝날 때까지 재사용)
+
+def initialize_firebase(metadata_batch_size=20, metadata_batch_window_ms=200):
+    """
+    Firebase Admin SDK를 초기화하고 업로드 객체를 만듭니다.
+
+    :param metadata_batch_size: Firestore WriteBatch 하나에 모을 최대 문서 수 (1이면 문서마다 바로 저장)
+    :param metadata_batch_window_ms: 첫 문서가 들어온 뒤 다른 문서를 기다리는 최대 시간
+    """
+    global _uploader
     try:
         if not os.path.exists(_SERVICE_ACCOUNT_KEY_PATH):
             print(f"🔥 [에러] 서비스 계정 키 파일이 없습니다: '{_SERVICE_ACCOUNT_KEY_PATH}'")
@@ -31,6 +42,7 @@ def initialize_firebase():
         firebase_admin.initialize_app(cred, {
             'storageBucket': _STORAGE_BUCKET
         })
+        _uploader = FirebaseUploader(metadata_batch_size, metadata_batch_window_ms)
         print("Firebase 앱이 성공적으로 초기화되었습니다.")
         return True
     except Exception as e:
@@ -38,52 +50,73 @@ def initialize_firebase():
         print("    => 서비스 계정 키 파일 경로와 Storage 버킷 이름이 올바른지 확인해주세요.")
         return False
 
-def upload_detection_data(image_data, detected_species, confidence, source_device="Raspberry Pi 4B"):
+def _timeout_kwargs(timeout):
+    """timeout을 지정한 경우에만 요청 인자로 넘김 (None이면 라이브러리 기본값 사용)"""
+    return {'timeout': timeout} if timeout is not None else {}
+
+class FirebaseUploader:
     """
-    탐지된 이미지 데이터와 메타데이터를 Firebase에 업로드합니다.
-    
-    :param image_data: 이미지 파일의 바이너리 데이터 (예: cv2.imencode 결과)
-    :param detected_species: YOLO가 탐지한 새의 종류 (문자열)
-    :param confidence: 탐지된 객체의 confidence 값 (float)
-    :param source_device: 데이터를 전송하는 장치 (기본값: Raspberry Pi 4B)
-    :return: 업로드 성공 시 이미지 URL과 Firestore 문서 ID를 포함하는 딕셔너리, 실패 시 None
+    Firestore/Storage 클라이언트를 한 번만 만들어 재사용하는 업로드 객체.
+    - 이미지 업로드 요청에 공개 ACL(predefined_acl)을 함께 지정해 make_public() 왕복을 없앰
+      (버킷이 균일한 버킷 수준 액세스를 쓰면 ACL을 지정할 수 없으므로 버킷 자체를 공개로 설정해야 함)
+    - 메타데이터는 여러 업로드 스레드의 문서를 WriteBatch 하나로 모아 commit
     """
-    if not detected_species:
-        print("탐지된 새 종류가 없어 Firebase 업로드를 건너뜁니다.")
-        return None
-
-    print(f"🚀 '{detected_species}' 탐지! Firebase 업로드를 시작합니다...")
 
-    try:
-        db = firestore.client()
-        bucket = storage.bucket()
-
-        # --- 1. Cloud Storage에 이미지 업로드 ---
-        # 파일명 중복을 피하기 위해 UUID와 현재 시간을 사용
-        timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    def __init__(self, metadata_batch_size=20, metadata_batch_window_ms=200):
+        self.db = firestore.client()
+        self.bucket = storage.bucket()
+        self.collection = self.db.collection('detections')
+        # Firestore WriteBatch는 최대 500개까지
+        self.batcher = MetadataBatcher(self._commit, min(metadata_batch_size, 500), metadata_batch_window_ms)
+        self._lock = threading.Lock()
+        self.round_trips = {'storage_upload': 0, 'firestore_commit': 0}
+        self.uploads = 0
+
+    def _count(self, kind):
+        with self._lock:
+            self.round_trips[kind] += 1
+
+    def _commit(self, items, timeout):
+        batch = self.db.batch()
+        for doc_ref, metadata in items:
+            batch.set(doc_ref, metadata)
+        self._count('firestore_commit')
+        batch.commit(**_timeout_kwargs(timeout))
+
+    def upload(self, image_data, detected_species, confidence, source_device, timeout, upload_id, detected_at):
+        with self.batcher.writer():
+            return self._upload(image_data, detected_species, confidence, source_device, timeout, upload_id, detected_at)
+
+    def _upload(self, image_data, detected_species, confidence, source_device, timeout, upload_id, detected_at):
+        # --- 1. Cloud Storage에 이미지(원본 + 파생본) 업로드 (공개 ACL 포함) ---
+        # 파일명 중복을 피하기 위해 UUID와 탐지 시간을 사용
+        detected_time = datetime.datetime.fromtimestamp(detected_at) if detected_at is not None else datetime.datetime.now()
+        timestamp_str = detected_time.strftime("%Y%m%d_%H%M%S")
         # 탐지율을 파일명에 포함 (정수 형태로 변환 후 세 자리로 포맷)
         confidence_int = int(confidence * 100) # 0.95 -> 95
-        destination_blob_name = f"detections/{detected_species}/{timestamp_str}_{confidence_int:03d}.jpg"
-        
-        blob = bucket.blob(destination_blob_name)
+        suffix = f"_{upload_id[:8]}" if upload_id else ""
+        destination_blob_name = f"detections/{detected_species}/{timestamp_str}_{confidence_int:03d}{suffix}.jpg"
+
+        images = derivative_images(image_data)
 
-        print(f"  [1/3] 이미지를 Storage에 업로드 중...")
+        print(f"  [1/2] 이미지를 Storage에 업로드 중... ({', '.join(images)})")
         print(f"        - 대상 경로: {destination_blob_name}")
-        
-        # 이미지 데이터를 직접 업로드 (파일 경로 대신)
-        blob.upload_from_string(image_data.tobytes(), content_type='image/jpeg')
-
-        # --- 2. 업로드된 이미지의 공개 URL 가져오기 ---
-        blob.make_public()
-        image_url = blob.public_url
-        print(f"  [2/3] 이미지 공개 URL 생성 완료.")
-        print(f"        - URL: {image_url}")
-
-        # --- 3. Firestore에 메타데이터 저장 ---
-        doc_ref = db.collection('detections').document()
-        
+
+        # 이미지 데이터를 직접 업로드 (파일 경로 대신). 파생본은 원본 경로 옆에 _<이름>을 붙여 저장
+        urls = {}
+        for name, data in images.items():
+            blob = self.bucket.blob(derivative_path(destination_blob_name, name))
+            self._count('storage_upload')
+            blob.upload_from_string(data, content_type='image/jpeg',
+                                    predefined_acl='publicRead', **_timeout_kwargs(timeout))
+            urls[name] = blob.public_url # 요청 없이 경로로 만들어지는 공개 URL
+        image_url = urls["full"]
+
+        # --- 2. Firestore에 메타데이터 저장 (WriteBatch로 모아서 commit) ---
+        doc_ref = self.collection.document(upload_id) if upload_id else self.collection.document()
+
         # Firestore에 저장할 UTC 시간 (ISO 8601 형식)
-        timestamp_iso = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        timestamp_iso = detected_time.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
 
         metadata = {
             'species': detected_species,
@@ -93,17 +126,65 @@ def upload_detection_data(image_data, detected_species, confidence, source_devic
             'sourceDevice': source_device,
             'confidence': f"{float(confidence):.2f}" # confidence를 소수점 2자리 문자열로 저장
         }
-        
-        print(f"  [3/3] Firestore에 메타데이터 저장 중...")
-        doc_ref.set(metadata)
+        # 대시보드가 카드마다 원본 대신 작은 이미지를 받도록 파생본 URL/경로도 저장 (thumbUrl, previewUrl 등)
+        for name in images:
+            if name != "full":
+                metadata[f'{name}Url'] = urls[name]
+                metadata[f'{name}Path'] = derivative_path(destination_blob_name, name)
+
+        print(f"  [2/2] Firestore에 메타데이터 저장 중...")
+        self.batcher.add((doc_ref, metadata), timeout)
+        with self._lock:
+            self.uploads += 1
 
         print(f"🎉 업로드 성공! Firestore 문서 ID: {doc_ref.id}")
         return {"imageUrl": image_url, "firestoreDocId": doc_ref.id}
 
+    def stats(self):
+        with self._lock:
+            total = sum(self.round_trips.values())
+            return dict(self.round_trips, uploads=self.uploads,
+                        round_trips_per_upload=round(total / self.uploads, 2) if self.uploads else 0.0)
+
+    def close(self):
+        self.batcher.close()
+
+def upload_detection_data(image_data, detected_species, confidence, source_device="Raspberry Pi 4B", timeout=None,
+                          upload_id=None, detected_at=None):
+    """
+    탐지된 이미지 데이터와 메타데이터를 Firebase에 업로드합니다.
+    
+    :param image_data: 이미지 파일의 바이너리 데이터 (예: cv2.imencode 결과),
+                       또는 파생본을 포함한 {이름: bytes} (image_derivatives.encode_derivatives 결과, "full"이 원본)
+    :param detected_species: YOLO가 탐지한 새의 종류 (문자열)
+    :param confidence: 탐지된 객체의 confidence 값 (float)
+    :param source_device: 데이터를 전송하는 장치 (기본값: Raspberry Pi 4B)
+    :param timeout: Storage/Firestore 요청 하나당 최대 대기 시간(초). None이면 라이브러리 기본값
+    :param upload_id: 지정하면 Firestore 문서 ID와 Storage 경로에 사용 (같은 ID로 다시 보내도 덮어쓸 뿐 중복되지 않음)
+    :param detected_at: 탐지 시각 (UNIX time). None이면 현재 시각 (outbox에서 늦게 보내는 경우에도 탐지 시각 유지)
+    :return: 업로드 성공 시 이미지 URL과 Firestore 문서 ID를 포함하는 딕셔너리, 실패 시 None
+    """
+    if not detected_species:
+        print("탐지된 새 종류가 없어 Firebase 업로드를 건너뜁니다.")
+        return None
+
+    print(f"🚀 '{detected_species}' 탐지! Firebase 업로드를 시작합니다...")
+
+    try:
+        return _uploader.upload(image_data, detected_species, confidence, source_device, timeout, upload_id, detected_at)
     except Exception as e:
         print(f"🔥 [에러] Firebase 업로드 중 문제가 발생했습니다: {e}")
         return None
 
+def upload_stats():
+    """요청 왕복 횟수 통계 (storage_upload, firestore_commit, uploads, round_trips_per_upload)"""
+    return _uploader.stats() if _uploader else None
+
+def shutdown():
+    """모아 둔 메타데이터를 commit하고 업로드 객체를 닫습니다."""
+    if _uploader:
+        _uploader.close()
+
 # 이 파일이 직접 실행될 경우 테스트 코드
 if __name__ == "__main__":
     print("==================================================")
@@ -132,5 +213,7 @@ if __name__ == "__main__":
             print(f"테스트 업로드 결과: {result}")
         else:
             print("테스트 업로드 실패.")
+        shutdown()
+        print(f"요청 왕복 통계: {upload_stats()}")
     
     print("스크립트 실행이 완료되었습니다.")
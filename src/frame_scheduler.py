@@ -0,0 +1,109 @@
+# =====================================================================================
+# 적응형 프레임 처리 간격 (idle / dark 모드)
+# 움직임이 없는 장면을 매 프레임 1080p로 처리하지 않도록 모드에 따라 처리 간격을 바꿉니다.
+#   active : 움직임 이후 idle_after_s 동안. active_fps (0이면 들어오는 프레임 모두)
+#   idle   : idle_after_s 동안 움직임이 없으면. idle_fps로 낮춤, 첫 움직임에 바로 active로 복귀
+#   dark   : 평균 밝기가 dark_threshold 미만이면 움직임 감지를 멈추고 dark_check_interval_s마다 밝기만 확인
+# 밝기는 프레임을 듬성듬성 뽑은 픽셀의 평균으로 계산하므로 비용이 거의 없습니다.
+# 시각은 모두 프레임 시각 기준이라 녹화 영상 재생에서도 실제 운영과 같은 결정을 내립니다.
+# =====================================================================================
+
+MODES = ("active", "idle", "dark")
+
+
+def mean_brightness(frame, step=16):
+    """step 간격으로 뽑은 픽셀의 평균 밝기 (0~255, 채널 평균)"""
+    return float(frame[::step, ::step].mean())
+
+
+class AdaptiveFrameScheduler:
+    """프레임마다 처리할지(due) 정하고, 움직임/밝기에 따라 모드를 바꿉니다."""
+
+    def __init__(self, active_fps=0.0, idle_fps=2.0, idle_after_s=60.0, dark_threshold=20.0,
+                 dark_check_interval_s=10.0, brightness_check_interval_s=10.0):
+        self.intervals = {
+            "active": 1.0 / active_fps if active_fps else 0.0,
+            "idle": 1.0 / idle_fps if idle_fps else 0.0,
+            "dark": dark_check_interval_s,
+        }
+        self.idle_after_s = idle_after_s
+        self.dark_threshold = dark_threshold
+        self.brightness_check_interval_s = brightness_check_interval_s
+        self.mode = "active"
+        self.last_motion_time = None
+        self.last_processed_time = None
+        self.last_brightness_time = None
+        self.brightness = None
+        self._last_frame_time = None
+        self.stats = {
+            "frames_seen": 0,
+            "frames_processed": 0,
+            "brightness_checks": 0,
+            "mode_seconds": {mode: 0.0 for mode in MODES},
+            "mode_changes": 0,
+        }
+
+    @property
+    def read_interval(self):
+        """현재 모드의 처리 간격(초). 실시간 카메라는 이 간격으로만 읽으면 됨 (FrameSource.set_min_interval)"""
+        return self.intervals[self.mode]
+
+    def _set_mode(self, mode, frame_time, reason):
+        if mode == self.mode:
+            return
+        print(f"[INFO] 프레임 처리 모드: {self.mode} -> {mode} ({reason})")
+        self.mode = mode
+        self.stats["mode_changes"] += 1
+        if mode == "active":
+            self.last_motion_time = frame_time
+
+    def due(self, frame, frame_time):
+        """
+        이 프레임을 처리(움직임 감지)해야 하는지. 밝기 확인과 dark 모드 전환도 여기서 합니다.
+        False면 호출한 쪽은 프레임을 버리고 다음 프레임으로 넘어갑니다.
+        """
+        stats = self.stats
+        stats["frames_seen"] += 1
+        if self._last_frame_time is not None:
+            stats["mode_seconds"][self.mode] += max(frame_time - self._last_frame_time, 0.0)
+        self._last_frame_time = frame_time
+        if self.last_motion_time is None:
+            self.last_motion_time = frame_time
+
+        if self.last_processed_time is not None and \
+                frame_time - self.last_processed_time < self.read_interval - 1e-6:
+            return False
+
+        if self.last_brightness_time is None or self.mode == "dark" or \
+                frame_time - self.last_brightness_time >= self.brightness_check_interval_s:
+            self.last_brightness_time = frame_time
+            self.brightness = mean_brightness(frame)
+            stats["brightness_checks"] += 1
+            if self.brightness < self.dark_threshold:
+                self._set_mode("dark", frame_time, f"밝기 {self.brightness:.0f}")
+            elif self.mode == "dark":
+                # 어두운 동안의 시간은 idle 판단에 넣지 않음 (밝아진 뒤 idle_after_s 동안은 active)
+                self._set_mode("active", frame_time, f"밝기 {self.brightness:.0f}")
+
+        self.last_processed_time = frame_time
+        if self.mode == "dark":
+            return False
+
+        if self.mode == "active" and frame_time - self.last_motion_time > self.idle_after_s:
+            self._set_mode("idle", frame_time, f"{self.idle_after_s:.0f}초 동안 움직임 없음")
+        stats["frames_processed"] += 1
+        return True
+
+    def on_motion(self, detected, frame_time):
+        """처리한 프레임의 움직임 감지 결과를 알려줌. 움직임이 있으면 바로 active로"""
+        if detected:
+            self.last_motion_time = frame_time
+            self._set_mode("active", frame_time, "움직임 감지")
+
+    def summary(self):
+        stats = dict(self.stats, mode_seconds={m: round(s, 1) for m, s in self.stats["mode_seconds"].items()})
+        stats["media_s"] = round(sum(self.stats["mode_seconds"].values()), 1)
+        seen = stats["frames_seen"]
+        stats["processed_ratio"] = round(stats["frames_processed"] / seen, 4) if seen else 0.0
+        return stats
+
@@ -0,0 +1,384 @@
+import cv2
+import os
+import time
+import threading
+import numpy as np
+
+# =====================================================================================
+# 프레임 소스
+# 카메라, 녹화 영상, 이미지 폴더, 합성 영상을 같은 인터페이스(read/release)로 다룹니다.
+# read()는 cv2.VideoCapture.read()와 같이 (ret, frame)을 반환하고,
+# 마지막으로 읽은 프레임의 시각(초)은 frame_time 속성에 저장됩니다.
+# read(out)처럼 버퍼를 넘기면 크기가 맞을 때 새 배열을 할당하지 않고 그 버퍼에 프레임을 씁니다.
+# =====================================================================================
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameSource:
+    """모든 프레임 소스의 기본 클래스"""
+
+    is_live = False  # 실시간 장치(카메라)인지 여부. 녹화 영상 재생은 False
+
+    def __init__(self):
+        self.frame_time = 0.0   # 마지막 프레임의 시각 (live: time.time(), 파일: 영상 내 시각)
+        self.frame_index = -1   # 마지막 프레임 번호
+
+    def open(self):
+        return self
+
+    def read(self, out=None):
+        raise NotImplementedError
+
+    def set_min_interval(self, seconds):
+        """실시간 소스가 프레임을 읽는 최소 간격 (idle/dark 모드). 녹화 영상 재생 소스는 무시"""
+        pass
+
+    def release(self):
+        pass
+
+    def describe(self):
+        return self.__class__.__name__
+
+
+class CameraSource(FrameSource):
+    """cv2.VideoCapture 장치 번호로 여는 실시간 카메라"""
+
+    is_live = True
+
+    def __init__(self, device, width, height):
+        super().__init__()
+        self.device = device
+        self.width = width
+        self.height = height
+        self.cap = None
+        self.min_interval = 0.0
+        self._last_read = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.device)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # 드라이버 버퍼를 최소화하여 오래된 프레임이 쌓이지 않도록 함 (지원하지 않는 백엔드는 무시)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not self.cap.isOpened():
+            raise IOError("카메라를 열 수 없습니다.")
+        actual_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        actual_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        print(f"[INFO] 카메라 해상도: {actual_w}x{actual_h}")
+        return self
+
+    def set_min_interval(self, seconds):
+        self.min_interval = seconds
+
+    def read(self, out=None):
+        # 최소 간격 전에는 읽지 않고 기다림 (드라이버 버퍼가 1이므로 기다린 뒤 읽어도 최신 프레임)
+        if self.min_interval > 0 and self._last_read is not None:
+            delay = self._last_read + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self._last_read = time.monotonic()
+        ret, frame = self.cap.read(out)
+        if ret:
+            self.frame_time = time.time()
+            self.frame_index += 1
+        return ret, frame
+
+    def release(self):
+        if self.cap:
+            self.cap.release()
+
+    def describe(self):
+        return f"camera:{self.device}"
+
+
+class VideoFileSource(FrameSource):
+    """녹화된 영상 파일 재생. realtime=True이면 원래 FPS 속도에 맞춰 프레임을 내보냄"""
+
+    def __init__(self, path, realtime=False, loop=False):
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.cap = None
+        self.fps = 0.0
+        self._time_offset = 0.0   # loop 재생 시 영상 시각이 되돌아가지 않도록 누적
+        self._start_wall = None
+
+    def open(self):
+        if not os.path.exists(self.path):
+            raise IOError(f"영상 파일이 없습니다: {self.path}")
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise IOError(f"영상 파일을 열 수 없습니다: {self.path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        print(f"[INFO] 영상 파일: {self.path} ({w}x{h}, {self.fps:.1f} FPS)")
+        return self
+
+    def read(self, out=None):
+        ret, frame = self.cap.read(out)
+        if not ret and self.loop and self.frame_index >= 0:
+            self._time_offset = self.frame_time + 1.0 / self.fps
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(out)
+        if not ret:
+            return False, None
+
+        self.frame_index += 1
+        # 영상 내 시각은 프레임 번호로 계산 (POS_MSEC는 코덱에 따라 부정확한 경우가 있음)
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+        self.frame_time = self._time_offset + position / self.fps
+
+        if self.realtime:
+            if self._start_wall is None:
+                self._start_wall = time.time() - self.frame_time
+            delay = self._start_wall + self.frame_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        return True, frame
+
+    def release(self):
+        if self.cap:
+            self.cap.release()
+
+    def describe(self):
+        return f"video:{self.path}"
+
+
+class ImageDirectorySource(FrameSource):
+    """폴더 안의 이미지들을 파일명 순서대로 하나의 영상처럼 재생"""
+
+    def __init__(self, path, fps=1.0, realtime=False, loop=False):
+        super().__init__()
+        self.path = path
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.files = []
+        self._position = 0
+        self._start_wall = None
+
+    def open(self):
+        if not os.path.isdir(self.path):
+            raise IOError(f"이미지 폴더가 없습니다: {self.path}")
+        self.files = sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.files:
+            raise IOError(f"이미지 폴더가 비어 있습니다: {self.path}")
+        print(f"[INFO] 이미지 폴더: {self.path} ({len(self.files)}장)")
+        return self
+
+    def read(self, out=None):
+        # 이미지 디코딩은 항상 새 배열을 만들므로 out은 사용하지 않음
+        while True:
+            if self._position >= len(self.files):
+                if not self.loop:
+                    return False, None
+                self._position = 0
+            file_path = self.files[self._position]
+            self._position += 1
+            frame = cv2.imread(file_path)
+            if frame is not None:
+                break
+            print(f"[WARN] 이미지를 읽을 수 없습니다. 건너뜁니다: {file_path}")
+
+        self.frame_index += 1
+        self.frame_time = self.frame_index / self.fps
+        if self.realtime:
+            if self._start_wall is None:
+                self._start_wall = time.time()
+            delay = self._start_wall + self.frame_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        return True, frame
+
+    def describe(self):
+        return f"images:{self.path}"
+
+
+class SyntheticSource(FrameSource):
+    """
+    카메라 없이 파이프라인을 돌려보기 위한 합성 영상.
+    고정된 노이즈 배경 위로 일정 주기마다 '새' 역할의 타원이 지나갑니다.
+    seed가 같으면 항상 같은 프레임이 생성됩니다.
+    day_length_s를 주면 그 주기로 낮/밤 밝기가 바뀝니다. (예: 86400으로 하루를 재생, 자정에서 시작)
+    """
+
+    def __init__(self, width, height, fps=30.0, num_frames=0, seed=0, realtime=False,
+                 visit_interval_s=10.0, visit_duration_s=4.0, day_length_s=0.0):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.num_frames = num_frames  # 0이면 무한
+        self.realtime = realtime
+        self.visit_interval_s = visit_interval_s
+        self.visit_duration_s = visit_duration_s
+        self.day_length_s = day_length_s
+        rng = np.random.default_rng(seed)
+        background = rng.integers(60, 120, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        self.background = cv2.resize(background, (width, height), interpolation=cv2.INTER_LINEAR)
+        self._start_wall = None
+
+    def daylight(self, frame_time):
+        """밝기 배율. 하루의 0~25%(자정~06시)와 80~100%(19시 12분~자정)는 밤, 그 사이 1시간씩 밝아지고 어두워짐"""
+        if not self.day_length_s:
+            return 1.0
+        phase = (frame_time % self.day_length_s) / self.day_length_s
+        ramp = 1.0 / 24
+        if phase < 0.25 or phase >= 0.8:
+            return 0.1
+        if phase < 0.25 + ramp:
+            return 0.1 + 0.9 * (phase - 0.25) / ramp
+        if phase >= 0.8 - ramp:
+            return 0.1 + 0.9 * (0.8 - phase) / ramp
+        return 1.0
+
+    def bird_visible(self, frame_index):
+        """frame_index 프레임에 새가 그려지는지 (움직임 감지 평가의 정답)"""
+        return frame_index % int(self.fps * self.visit_interval_s) < int(self.fps * self.visit_duration_s)
+
+    def read(self, out=None):
+        if self.num_frames and self.frame_index + 1 >= self.num_frames:
+            return False, None
+
+        self.frame_index += 1
+        self.frame_time = self.frame_index / self.fps
+        if out is not None and out.shape == self.background.shape:
+            np.copyto(out, self.background)
+            frame = out
+        else:
+            frame = self.background.copy()
+
+        # visit_interval_s 주기 중 앞의 visit_duration_s 동안 새가 화면을 가로지름
+        phase = self.frame_index % int(self.fps * self.visit_interval_s)
+        visit = int(self.fps * self.visit_duration_s)
+        if self.bird_visible(self.frame_index):
+            x = int(self.width * phase / visit)
+            y = int(self.height * 0.5 + self.height * 0.15 * np.sin(phase / self.fps * 3))
+            axes = (max(self.width // 25, 4), max(self.height // 30, 3))
+            cv2.ellipse(frame, (x, y), axes, 0, 0, 360, (30, 40, 50), -1)
+
+        light = self.daylight(self.frame_time)
+        if light < 1.0:
+            cv2.convertScaleAbs(frame, dst=frame, alpha=light)
+
+        if self.realtime:
+            if self._start_wall is None:
+                self._start_wall = time.time()
+            delay = self._start_wall + self.frame_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        return True, frame
+
+    def describe(self):
+        return f"synthetic:{self.width}x{self.height}"
+
+
+class LatestFrameGrabber(FrameSource):
+    """
+    백그라운드 스레드에서 소스를 계속 읽고 가장 최신 프레임 하나만 유지합니다.
+    처리 루프가 느려도 드라이버 버퍼에 오래된 프레임이 쌓이지 않아, 캡처부터 판단까지의 지연이 일정하게 유지됩니다.
+    소비되기 전에 덮어써진 프레임 수는 dropped_frames에 기록됩니다.
+    내부 버퍼 두 개를 번갈아 쓰고, read(out)은 최신 프레임을 out에 복사해 돌려줍니다.
+    """
+
+    def __init__(self, source, read_timeout=5.0):
+        super().__init__()
+        self.source = source
+        self.is_live = source.is_live
+        self.read_timeout = read_timeout
+        self.min_interval = 0.0
+        self.dropped_frames = 0
+        self.grabbed_frames = 0
+        self._cond = threading.Condition()
+        self._latest = None          # (frame, frame_time, frame_index)
+        self._back_buffer = None     # 다음 프레임을 읽어 들일 버퍼 (이전 최신 프레임을 재사용)
+        self._consumed = True
+        self._ended = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self):
+        self.source.open()
+        self._thread = threading.Thread(target=self._grab_loop, name="frame-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _grab_loop(self):
+        while not self._stop.is_set():
+            ret, frame = self.source.read(self._back_buffer)
+            with self._cond:
+                if not ret:
+                    self._ended = True
+                    self._cond.notify_all()
+                    return
+                self.grabbed_frames += 1
+                if not self._consumed:
+                    self.dropped_frames += 1
+                # 소비자는 잠금 안에서 복사해 가므로 이전 최신 프레임 버퍼는 다음 읽기에 재사용 가능
+                self._back_buffer = self._latest[0] if self._latest else None
+                self._latest = (frame, self.source.frame_time, self.source.frame_index)
+                self._consumed = False
+                self._cond.notify_all()
+
+    def read(self, out=None):
+        with self._cond:
+            timeout = self.read_timeout + self.min_interval  # 원래 소스를 느리게 읽는 동안은 그만큼 더 기다림
+            if not self._cond.wait_for(lambda: not self._consumed or self._ended, timeout=timeout):
+                return False, None
+            if self._consumed:  # 소스 종료
+                return False, None
+            frame, self.frame_time, self.frame_index = self._latest
+            self._consumed = True
+            if out is not None and out.shape == frame.shape and out.dtype == frame.dtype:
+                np.copyto(out, frame)
+                return True, out
+            return True, frame.copy()
+
+    def set_min_interval(self, seconds):
+        # 읽는 스레드가 원래 소스를 그 간격으로만 읽게 되어, 쉬는 동안 디코딩도 하지 않음
+        self.min_interval = seconds
+        self.source.set_min_interval(seconds)
+
+    def release(self):
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self.source.release()
+
+    def describe(self):
+        return f"{self.source.describe()} (latest-frame)"
+
+
+def create_frame_source(source_config, frame_w, frame_h):
+    """설정(dict)으로 프레임 소스를 생성합니다. open()은 호출하지 않습니다."""
+    source_type = source_config.get('type', 'camera')
+    realtime = source_config.get('realtime', False)
+    loop = source_config.get('loop', False)
+
+    if source_type == 'camera':
+        source = CameraSource(source_config.get('device', 0), frame_w, frame_h)
+    elif source_type == 'video':
+        source = VideoFileSource(source_config['path'], realtime=realtime, loop=loop)
+    elif source_type == 'images':
+        source = ImageDirectorySource(source_config['path'], fps=source_config.get('fps', 1.0),
+                                      realtime=realtime, loop=loop)
+    elif source_type == 'synthetic':
+        source = SyntheticSource(frame_w, frame_h, fps=source_config.get('fps', 30.0),
+                                 num_frames=source_config.get('num_frames', 0),
+                                 seed=source_config.get('seed', 0), realtime=realtime,
+                                 visit_interval_s=source_config.get('visit_interval_s', 10.0),
+                                 visit_duration_s=source_config.get('visit_duration_s', 4.0),
+                                 day_length_s=source_config.get('day_length_s', 0.0))
+    else:
+        raise ValueError(f"알 수 없는 프레임 소스 종류: {source_type}")
+
+    # 실시간 소스는 기본적으로 최신 프레임만 유지. 녹화 영상 재생은 모든 프레임을 순서대로 처리
+    if source_config.get('latest_frame_only', source.is_live):
+        source = LatestFrameGrabber(source)
+    return source
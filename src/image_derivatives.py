@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+
+import cv2
+
+import perf_stats
+import tracing
+
+# =====================================================================================
+# 업로드 이미지 파생본 (thumb / preview / full)
+# 대시보드는 카드마다 작은 이미지만 보여 주므로, 업로드할 때 크기별 JPEG을 함께 만들어 둡니다.
+#   thumb   : 카드 목록용 (기본 가로 320px)
+#   preview : 크게 보기용 (기본 가로 1280px)
+#   full    : 원본 해상도
+# 큰 쪽부터 차례로 줄여(원본 -> preview -> thumb) 한 번에 만들고, 종류별 JPEG 품질을 따로 정합니다.
+# 인코딩은 분석/결과 처리 스레드가 아니라 DerivativeEncoder의 인코딩 스레드에서 합니다.
+# =====================================================================================
+
+DEFAULT_SPECS = {
+    "full": {"max_width": 0, "quality": 95},  # max_width 0: 줄이지 않음
+    "preview": {"max_width": 1280, "quality": 80},
+    "thumb": {"max_width": 320, "quality": 70},
+}
+
+
+def build_specs(config):
+    """설정(upload.derivatives)을 기본값과 합친 {이름: {max_width, quality}}. 이름을 null로 두면 만들지 않음"""
+    config = config or {}
+    specs = {}
+    for name, default in DEFAULT_SPECS.items():
+        if name != "full" and name in config and config[name] is None:
+            continue
+        specs[name] = dict(default, **(config.get(name) or {}))
+    return specs
+
+
+def derivative_images(image_data):
+    """
+    업로드할 이미지 {이름: bytes}. encode_derivatives() 결과는 그대로,
+    원본 하나(cv2.imencode 결과 numpy 배열 또는 outbox에서 읽은 bytes)만 넘기면 {"full": 원본}
+    """
+    if isinstance(image_data, dict):
+        return {name: _image_bytes(data) for name, data in image_data.items()}
+    return {"full": _image_bytes(image_data)}
+
+
+def _image_bytes(image_data):
+    return image_data if isinstance(image_data, (bytes, bytearray)) else image_data.tobytes()
+
+
+def derivative_path(path, name):
+    """원본 저장 경로 옆의 파생본 경로 (예: detections/Crow/x.jpg -> detections/Crow/x_thumb.jpg)"""
+    return path if name == "full" else f"{path[:-len('.jpg')]}_{name}.jpg"
+
+
+def encode_derivatives(frame, specs):
+    """
+    frame에서 specs의 파생본을 모두 JPEG으로 인코딩합니다. 반환: {이름: bytes} (실패하면 None)
+    작은 파생본은 바로 위 크기의 축소본에서 다시 줄이므로 원본을 여러 번 줄이지 않습니다.
+    """
+    images = {}
+    source = frame
+    for name, spec in sorted(specs.items(), key=lambda item: item[1]["max_width"] or float("inf"), reverse=True):
+        width = spec["max_width"]
+        if width and source.shape[1] > width:
+            height = max(1, round(source.shape[0] * width / source.shape[1]))
+            source = cv2.resize(source, (width, height), interpolation=cv2.INTER_AREA)
+        ok, data = cv2.imencode(".jpg", source, [cv2.IMWRITE_JPEG_QUALITY, int(spec["quality"])])
+        if not ok:
+            return None
+        images[name] = data.tobytes()
+    return images
+
+
+class DerivativeEncoder:
+    """
+    크기가 제한된 인코딩 큐 + 인코딩 스레드.
+    submit()은 프레임을 복사해 큐에 넣기만 하고, 인코딩 스레드가 파생본을 만든 뒤 on_encoded(images)를 호출합니다.
+    (인코딩에 실패하면 images는 None)
+    """
+
+    def __init__(self, specs=None, num_workers=1, queue_size=8, stage_timer=None):
+        self.specs = specs or build_specs(None)
+        self.num_workers = num_workers
+        self.stage_timer = stage_timer or perf_stats.StageTimer()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.stats = {"encoded": 0, "failed": 0, "dropped": 0, "bytes": {name: 0 for name in self.specs}}
+        self.threads = [threading.Thread(target=self._worker, name=f"encode-{i}", daemon=True)
+                        for i in range(num_workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def submit(self, frame, on_encoded):
+        """프레임 복사본을 큐에 넣습니다. 큐가 가득 차 있으면 기다리지 않고 False (분석 버퍼는 곧 재사용되므로 복사)"""
+        try:
+            self.queue.put_nowait((frame.copy(), on_encoded, tracing.current_frame()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+            return False
+
+    def join(self):
+        """넣은 인코딩 작업이 모두 끝날 때까지 대기"""
+        self.queue.join()
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                frame, on_encoded, frame_id = item
+                tracing.set_frame(frame_id)  # 업로드 작업도 같은 프레임 ID를 이어받음
+                start = time.perf_counter()
+                images = encode_derivatives(frame, self.specs)
+                self.stage_timer.record("imencode", time.perf_counter() - start)
+                with self._lock:
+                    if images is None:
+                        self.stats["failed"] += 1
+                    else:
+                        self.stats["encoded"] += 1
+                        for name, data in images.items():
+                            self.stats["bytes"][name] += len(data)
+                try:
+                    on_encoded(images)
+                except Exception as e:
+                    print(f"[ERROR] 인코딩 완료 콜백에서 오류 발생: {e}")
+            finally:
+                self.queue.task_done()
+
+    def summary(self):
+        """인코딩 통계와 파생본별 평균 크기(KB)"""
+        with self._lock:
+            encoded = self.stats["encoded"]
+            mean_kb = {name: round(total / encoded / 1024.0, 1) if encoded else 0.0
+                       for name, total in self.stats["bytes"].items()}
+            return {"encoded": encoded, "failed": self.stats["failed"], "dropped": self.stats["dropped"],
+                    "mean_kb": mean_kb}
+
+    def stop(self, timeout=10):
+        """남은 작업을 처리한 뒤 스레드를 종료합니다."""
+        deadline = time.perf_counter() + timeout
+        while self.queue.unfinished_tasks and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        for _ in self.threads:
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(timeout=max(deadline - time.perf_counter(), 0.1))
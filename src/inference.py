@@ -0,0 +1,314 @@
+import hashlib
+import json
+import os
+import shutil
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# =====================================================================================
+# YOLO 추론 엔진
+# 모델 실행 방식(backend)과 무관하게 Detection 리스트를 돌려주는 엔진 인터페이스와,
+# 프레임 전체 또는 움직임 영역(crop)을 한 번의 호출로 분석하는 predict_jobs()를 제공합니다.
+#
+# backend
+#   torch    : ultralytics.YOLO로 .pt를 그대로 실행 (PyTorch 필요)
+#   onnx     : ONNX Runtime CPU 실행
+#   openvino : OpenVINO CPU 실행
+# onnx/openvino 모델은 처음 한 번만 .pt에서 export하여 .pt 옆의 캐시 폴더에 저장하고,
+# 이후에는 (파일 해시, 입력 크기, backend)가 같으면 캐시를 그대로 사용합니다. 이때는 PyTorch를 import하지 않습니다.
+# =====================================================================================
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# box: 원본 프레임 좌표 (x1, y1, x2, y2)
+Detection = namedtuple("Detection", ["class_name", "confidence", "box"])
+
+
+def result_to_detections(result, names, offset=(0, 0)):
+    """ultralytics 결과 하나를 Detection 리스트로 변환. offset은 crop의 원본 프레임 내 위치"""
+    ox, oy = offset
+    detections = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = (float(v) for v in box.xyxy[0])
+        detections.append(Detection(
+            class_name=names[int(box.cls[0])],
+            confidence=float(box.conf[0]),
+            box=(x1 + ox, y1 + oy, x2 + ox, y2 + oy),
+        ))
+    return detections
+
+
+# ----------------------------- 엔진 -----------------------------
+class InferenceEngine:
+    """모든 엔진의 기본 클래스. predict()는 이미지마다 Detection 리스트(이미지 좌표)를 반환"""
+
+    backend = None
+
+    def __init__(self):
+        self.names = {}
+
+    def predict(self, images, conf):
+        raise NotImplementedError
+
+    def warmup(self, imgsz=320):
+        """첫 호출의 초기화 비용을 미리 치르기 위한 더미 추론"""
+        self.predict([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)], conf=0.99)
+
+
+class TorchEngine(InferenceEngine):
+    """ultralytics.YOLO(.pt) 실행"""
+
+    backend = "torch"
+
+    def __init__(self, model_path, imgsz=None):
+        super().__init__()
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.imgsz = imgsz
+
+    def predict(self, images, conf):
+        kwargs = {"imgsz": self.imgsz} if self.imgsz else {}
+        results = self.model.predict(source=list(images), conf=conf, save=False, verbose=False, **kwargs)
+        return [result_to_detections(result, self.names) for result in results]
+
+
+class _ExportedEngine(InferenceEngine):
+    """
+    export된 YOLO 모델(onnx/openvino) 공통 전/후처리.
+    ultralytics와 같은 방식으로 letterbox(회색 114 여백) 후 추론하고, 클래스별 NMS를 적용합니다.
+    """
+
+    def __init__(self, names, imgsz, iou=0.7, max_det=300):
+        super().__init__()
+        self.names = names
+        self.imgsz = imgsz
+        self.iou = iou
+        self.max_det = max_det
+        self.fixed_batch = None  # 입력 batch 크기가 고정된 모델이면 그 크기
+
+    def _run(self, blob):
+        raise NotImplementedError
+
+    def _letterbox(self, image):
+        h, w = image.shape[:2]
+        ratio = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+        dw, dh = (self.imgsz - new_w) / 2, (self.imgsz - new_h) / 2
+        if (new_w, new_h) != (w, h):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+        image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return image, ratio, (left, top)
+
+    def predict(self, images, conf):
+        letterboxed = [self._letterbox(image) for image in images]
+        blob = np.stack([lb[0] for lb in letterboxed])[..., ::-1]  # BGR -> RGB
+        blob = np.ascontiguousarray(blob.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+        if self.fixed_batch and len(images) != self.fixed_batch:
+            outputs = np.concatenate([self._run(blob[i:i + 1]) for i in range(len(images))])
+        else:
+            outputs = self._run(blob)
+
+        return [self._postprocess(output, conf, ratio, pad, image.shape)
+                for output, image, (_, ratio, pad) in zip(outputs, images, letterboxed)]
+
+    def _postprocess(self, output, conf, ratio, pad, shape):
+        num_classes = len(self.names)
+        # YOLOv8/v5u 형식 (4 + 클래스 수, 앵커 수)을 (앵커 수, 4 + 클래스 수)로 맞춤
+        if output.shape[0] in (4 + num_classes, 5 + num_classes) and output.shape[0] < output.shape[1]:
+            output = output.T
+        if output.shape[1] == 5 + num_classes:  # 구 YOLOv5 형식: objectness 포함
+            scores_all = output[:, 5:] * output[:, 4:5]
+        else:
+            scores_all = output[:, 4:]
+
+        class_ids = scores_all.argmax(axis=1)
+        scores = scores_all[np.arange(len(class_ids)), class_ids]
+        keep = scores >= conf
+        if not keep.any():
+            return []
+        boxes, scores, class_ids = output[keep, :4], scores[keep], class_ids[keep]
+
+        # (cx, cy, w, h) -> (x, y, w, h)
+        xywh = boxes.copy()
+        xywh[:, 0] -= xywh[:, 2] / 2
+        xywh[:, 1] -= xywh[:, 3] / 2
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), scores.tolist(), class_ids.tolist(), conf, self.iou)
+        indices = np.array(indices, dtype=int).reshape(-1)[:self.max_det]
+
+        h, w = shape[:2]
+        detections = []
+        for i in indices:
+            x, y, bw, bh = xywh[i]
+            x1 = min(max((x - pad[0]) / ratio, 0), w)
+            y1 = min(max((y - pad[1]) / ratio, 0), h)
+            x2 = min(max((x + bw - pad[0]) / ratio, 0), w)
+            y2 = min(max((y + bh - pad[1]) / ratio, 0), h)
+            detections.append(Detection(self.names[int(class_ids[i])], float(scores[i]),
+                                        (float(x1), float(y1), float(x2), float(y2))))
+        detections.sort(key=lambda d: d.confidence, reverse=True)
+        return detections
+
+
+class OnnxEngine(_ExportedEngine):
+    """ONNX Runtime CPU 실행"""
+
+    backend = "onnx"
+
+    def __init__(self, onnx_path, names, imgsz, threads=None):
+        super().__init__(names, imgsz)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        if isinstance(model_input.shape[0], int):
+            self.fixed_batch = model_input.shape[0]
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoEngine(_ExportedEngine):
+    """OpenVINO CPU 실행"""
+
+    backend = "openvino"
+
+    def __init__(self, xml_path, names, imgsz, threads=None):
+        super().__init__(names, imgsz)
+        import openvino as ov
+        core = ov.Core()
+        model = core.read_model(xml_path)
+        if not model.input(0).get_partial_shape()[0].is_dynamic:
+            self.fixed_batch = model.input(0).get_partial_shape()[0].get_length()
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.output = self.compiled.output(0)
+
+    def _run(self, blob):
+        return self.compiled([blob])[self.output]
+
+
+# ----------------------------- export 캐시 -----------------------------
+def file_hash(path, length=16):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def export_cache_dir(model_path, backend, imgsz):
+    """캐시 위치: <.pt 폴더>/.engine_cache/<이름>-<파일 해시>-<입력 크기>-<backend>/"""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{stem}-{file_hash(model_path)}-{imgsz}-{backend}"
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), ".engine_cache", key)
+
+
+def _lock_exclusive(lock_file):
+    """다른 프로세스와 함께 쓰는 잠금 파일을 배타적으로 잠금 (파일을 닫으면 풀림)"""
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        import msvcrt
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)  # 1바이트 잠금 (약 10초 시도 후 OSError)
+                return
+            except OSError:
+                continue
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+
+def export_cached(model_path, backend, imgsz):
+    """
+    .pt를 backend 형식으로 export하고 캐시 폴더를 반환합니다. 이미 있으면 export하지 않습니다.
+    여러 분석 프로세스가 동시에 시작해도 한 번만 export되도록 파일 잠금을 사용합니다.
+    """
+    cache_dir = export_cache_dir(model_path, backend, imgsz)
+    names_path = os.path.join(cache_dir, "names.json")
+    if os.path.exists(names_path):
+        return cache_dir
+
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    with open(cache_dir + ".lock", "w") as lock_file:
+        _lock_exclusive(lock_file)
+        if os.path.exists(names_path):  # 잠금을 기다리는 동안 다른 프로세스가 만든 경우
+            return cache_dir
+
+        print(f"[INFO] {os.path.basename(model_path)} -> {backend} ({imgsz}) export 중... (최초 1회)")
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        exported = model.export(format=backend, imgsz=imgsz, dynamic=True, half=False)
+
+        tmp_dir = cache_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        if backend == "onnx":
+            shutil.move(exported, os.path.join(tmp_dir, "model.onnx"))
+        else:  # openvino: <이름>_openvino_model/ 폴더
+            for name in os.listdir(exported):
+                target = "model" + os.path.splitext(name)[1] if name.endswith((".xml", ".bin")) else name
+                shutil.move(os.path.join(exported, name), os.path.join(tmp_dir, target))
+            shutil.rmtree(exported, ignore_errors=True)
+        with open(os.path.join(tmp_dir, "names.json"), "w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in model.names.items()}, f, ensure_ascii=False)
+        os.replace(tmp_dir, cache_dir)  # 완성된 폴더만 캐시로 보이도록 마지막에 이름 변경
+        print(f"[INFO] export 완료: {cache_dir}")
+    return cache_dir
+
+
+def create_engine(model_path, backend="torch", imgsz=320, threads=None):
+    """설정된 backend로 추론 엔진을 생성합니다."""
+    if backend == "torch":
+        return TorchEngine(model_path, imgsz)
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 추론 backend: {backend} (가능: {', '.join(BACKENDS)})")
+
+    cache_dir = export_cached(model_path, backend, imgsz)
+    with open(os.path.join(cache_dir, "names.json"), "r", encoding="utf-8") as f:
+        names = {int(k): v for k, v in json.load(f).items()}
+    if backend == "onnx":
+        return OnnxEngine(os.path.join(cache_dir, "model.onnx"), names, imgsz, threads)
+    return OpenVinoEngine(os.path.join(cache_dir, "model.xml"), names, imgsz, threads)
+
+
+# ----------------------------- 프레임/영역 분석 -----------------------------
+def predict_jobs(engine, jobs, conf):
+    """
+    jobs: [(frame, regions)] - regions가 None이면 프레임 전체, 아니면 (x1, y1, x2, y2) 영역 목록을 분석
+    반환: jobs와 같은 순서의 Detection 리스트 (원본 프레임 좌표, confidence 내림차순)
+
+    모든 프레임의 모든 crop을 하나의 배치로 묶어 엔진을 한 번만 호출합니다.
+    """
+    images = []
+    owners = []  # (job 번호, crop offset)
+    for job_index, (frame, regions) in enumerate(jobs):
+        if regions:
+            for x1, y1, x2, y2 in regions:
+                images.append(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+                owners.append((job_index, (x1, y1)))
+        else:
+            images.append(frame)
+            owners.append((job_index, (0, 0)))
+
+    detections = [[] for _ in jobs]
+    if not images:
+        return detections
+
+    for (job_index, (ox, oy)), image_detections in zip(owners, engine.predict(images, conf)):
+        detections[job_index].extend(
+            d._replace(box=(d.box[0] + ox, d.box[1] + oy, d.box[2] + ox, d.box[3] + oy))
+            for d in image_detections
+        )
+
+    for job_detections in detections:
+        job_detections.sort(key=lambda d: d.confidence, reverse=True)
+    return detections
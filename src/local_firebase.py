@@ -0,0 +1,148 @@
+import datetime
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+from image_derivatives import derivative_images, derivative_path
+from metadata_batcher import MetadataBatcher
+
+# =====================================================================================
+# firebase_manager 로컬 대체 모듈
+# Firebase 없이 파이프라인을 재생/벤치마크할 때 사용합니다. (app_config.yaml의 upload.backend: local)
+# 업로드 대신 이미지는 output_dir/detections/ 아래에, 메타데이터는 output_dir/documents/<문서 ID>.json과
+# output_dir/detections.jsonl(새 문서만)에 기록합니다. Firestore처럼 같은 문서 ID로 다시 쓰면 덮어씁니다.
+# firebase_manager와 같은 순서로 요청을 흉내 냅니다: 이미지 업로드 1회 + 메타데이터 WriteBatch commit.
+# latency_ms를 지정하면 요청 한 번마다 네트워크 왕복 시간을, failure_rate를 지정하면 업로드 실패를 흉내 냅니다.
+# separate_acl=True면 예전 방식처럼 업로드 후 make_public() 요청을 따로 한 번 더 보냅니다. (비교용)
+# =====================================================================================
+
+_output_dir = None
+_latency_ms = 0
+_failure_rate = 0.0
+_separate_acl = False
+_lock = threading.Lock()
+_batcher = None
+upload_count = 0
+round_trips = {'storage_upload': 0, 'make_public': 0, 'firestore_commit': 0}
+_uploads = 0
+
+
+def configure(output_dir, latency_ms=0, failure_rate=0.0, separate_acl=False):
+    """저장 위치, 가상 지연 시간, 가상 실패 비율을 설정합니다."""
+    global _output_dir, _latency_ms, _failure_rate, _separate_acl
+    _output_dir = output_dir
+    _latency_ms = latency_ms
+    _failure_rate = failure_rate
+    _separate_acl = separate_acl
+
+
+def initialize_firebase(metadata_batch_size=20, metadata_batch_window_ms=200):
+    """firebase_manager.initialize_firebase()와 같은 인터페이스. 저장 폴더를 준비합니다."""
+    global _output_dir, _batcher
+    if _output_dir is None:
+        _output_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "local_uploads"))
+    os.makedirs(os.path.join(_output_dir, "detections"), exist_ok=True)
+    os.makedirs(os.path.join(_output_dir, "documents"), exist_ok=True)
+    _batcher = MetadataBatcher(_commit, min(metadata_batch_size, 500), metadata_batch_window_ms)
+    print(f"[INFO] 로컬 업로드 모드: {_output_dir}")
+    return True
+
+
+def _round_trip(kind, timeout):
+    """요청 한 번의 가상 왕복. 가상 지연이 timeout보다 길면 timeout만큼 기다린 뒤 실패"""
+    with _lock:
+        round_trips[kind] += 1
+    if _latency_ms:
+        if timeout is not None and _latency_ms / 1000.0 > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"{kind} timed out")
+        time.sleep(_latency_ms / 1000.0)
+
+
+def _commit(items, timeout):
+    """메타데이터 WriteBatch commit 흉내: 문서 파일을 쓰고, 새 문서만 detections.jsonl에 추가"""
+    global upload_count
+    _round_trip('firestore_commit', timeout)
+    with _lock:
+        for doc_id, metadata in items:
+            doc_path = os.path.join(_output_dir, "documents", f"{doc_id}.json")
+            is_new = not os.path.exists(doc_path)
+            with open(doc_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f, ensure_ascii=False)
+            if is_new:
+                upload_count += 1
+                with open(os.path.join(_output_dir, "detections.jsonl"), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(dict(metadata, id=doc_id), ensure_ascii=False) + "\n")
+
+
+def upload_detection_data(image_data, detected_species, confidence, source_device="Raspberry Pi 4B", timeout=None,
+                          upload_id=None, detected_at=None):
+    """firebase_manager.upload_detection_data()와 같은 인터페이스로 로컬 폴더에 저장합니다."""
+    global _uploads
+    if not detected_species:
+        return None
+
+    try:
+        with _batcher.writer():
+            result = _upload(image_data, detected_species, confidence, source_device, timeout, upload_id, detected_at)
+    except Exception as e:
+        print(f"[WARN] 로컬 업로드 실패: {e}")
+        return None
+
+    if result:
+        with _lock:
+            _uploads += 1
+    return result
+
+
+def _upload(image_data, detected_species, confidence, source_device, timeout, upload_id, detected_at):
+    _round_trip('storage_upload', timeout)
+    if _failure_rate and random.random() < _failure_rate:
+        return None
+
+    doc_id = upload_id or uuid.uuid4().hex
+    confidence_int = int(confidence * 100)
+    storage_path = f"detections/{detected_species}/{doc_id}_{confidence_int:03d}.jpg"
+    images = derivative_images(image_data)
+    for index, (name, data) in enumerate(images.items()):
+        if index:  # 첫 이미지의 왕복은 위에서 셈
+            _round_trip('storage_upload', timeout)
+        file_path = os.path.join(_output_dir, derivative_path(storage_path, name))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(data)
+        if _separate_acl:
+            _round_trip('make_public', timeout)
+
+    detected_time = datetime.datetime.fromtimestamp(detected_at, datetime.timezone.utc) \
+        if detected_at is not None else datetime.datetime.now(datetime.timezone.utc)
+    metadata = {
+        'species': detected_species,
+        'timestamp': detected_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'imageUrl': "file://" + os.path.join(_output_dir, storage_path),
+        'storagePath': storage_path,
+        'sourceDevice': source_device,
+        'confidence': f"{float(confidence):.2f}"
+    }
+    for name in images:
+        if name != "full":
+            metadata[f'{name}Url'] = "file://" + os.path.join(_output_dir, derivative_path(storage_path, name))
+            metadata[f'{name}Path'] = derivative_path(storage_path, name)
+    _batcher.add((doc_id, metadata), timeout)
+    return {"imageUrl": metadata['imageUrl'], "firestoreDocId": doc_id}
+
+
+def upload_stats():
+    """firebase_manager.upload_stats()와 같은 형식의 요청 왕복 횟수 통계"""
+    with _lock:
+        total = sum(round_trips.values())
+        return dict(round_trips, uploads=_uploads,
+                    round_trips_per_upload=round(total / _uploads, 2) if _uploads else 0.0)
+
+
+def shutdown():
+    if _batcher:
+        _batcher.close()
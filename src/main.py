@@ -1,11 +1,33 @@
-import cv2
 import time
+STARTUP_T0 = time.perf_counter() # 시작 단계별 시간의 기준 (아래 import 시간 포함)
+import cv2
 import threading
 import queue
 import os
 import sys
-from ultralytics import YOLO
-import firebase_manager # Firebase 모듈 임포트
+import signal
+import uuid
+import frame_source # 카메라/영상/이미지 프레임 소스
+import perf_stats # 단계별 처리 시간 측정 (벤치마크용)
+import inference # YOLO 추론 엔진 (torch / onnx / openvino, 전체 프레임 / 움직임 영역 crop)
+import roi # 움직임 영역 계산
+import motion # 움직임 감지 (버퍼 재사용)
+import cascade # 320/416/640 모델 cascade
+import result_cache # 거의 같은 이미지의 추론 결과 재사용 (perceptual hash)
+import tracker # 움직임/탐지 박스 추적 (같은 새를 다시 분석하지 않도록)
+import frame_scheduler # 움직임 없는 장면 / 어두운 장면에서 처리 간격 늘리기
+import zones # 감시 영역 (include / exclude 다각형)
+import background_store # MOG2 배경 모델 저장 / 복원 (재시작 후 배경 학습 시간 단축)
+import clip_recorder # 탐지 전후 영상 클립 (압축 메모리 링 + 백그라운드 인코딩)
+import image_derivatives # 업로드 이미지 파생본 (thumb / preview / full) 인코딩 스레드
+import fair_queue # 카메라별 대기열 + 라운드 로빈 (바쁜 카메라가 분석을 독차지하지 않도록)
+from camera_pipeline import CameraPipeline # 카메라별 상태 (배경 차분기, track, 쿨다운 등)
+import metrics # 메트릭 레지스트리 + Prometheus 엔드포인트
+import tracing # 프레임별 단계 trace (Chrome / Perfetto 형식)
+import config_reload # 설정 파일이 바뀌면 다시 읽어 실행 중에 적용
+from analysis_pool import AnalysisPool # 공유 메모리 기반 멀티 프로세스 분석
+from upload_pool import UploadPool, UploadJob # 분석과 분리된 업로드 스레드 풀 (재시도/백오프)
+import outbox # 오프라인 대비 영속 업로드 대기열 (SQLite + JPEG spool)
 import yaml # YAML 파싱을 위한 라이브러리
 
 # ----------------------------- 설정 로드 -----------------------------
@@ -13,7 +35,8 @@ try:
     # 현재 스크립트의 절대 경로를 기준으로 프로젝트 루트를 찾습니다.
     current_file_path = os.path.abspath(__file__)
     project_root = os.path.dirname(os.path.dirname(current_file_path))
-    CONFIG_PATH = os.path.join(project_root, "config", "app_config.yaml")
+    # BIRD_CONFIG_PATH 환경 변수로 다른 설정 파일을 지정할 수 있음 (벤치마크/재생용)
+    CONFIG_PATH = os.environ.get("BIRD_CONFIG_PATH") or os.path.join(project_root, "config", "app_config.yaml")
 
     with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
         config = yaml.safe_load(f)
@@ -24,6 +47,9 @@ try:
     FRAME_H = config['camera']['frame_height']
     RESIZE_W = config['camera']['resize_width']
     RESIZE_H = config['camera']['resize_height']
+    SOURCE_CONFIG = config.get('source', {'type': 'camera', 'device': 1})
+    # 여러 카메라: [{name, source, zones(선택), source_device(선택)}, ...]. 비어 있으면 source 하나만 사용
+    CAMERAS_CONFIG = config.get('cameras') or []
 
     CAPTURE_INTERVAL = config['detection']['capture_interval']
     FIREBASE_UPLOAD_COOLDOWN = config['detection']['firebase_upload_cooldown']
@@ -31,176 +57,904 @@ try:
 
     BG_HISTORY = config['background_subtraction']['history']
     BG_THRESHOLD = config['background_subtraction']['threshold']
+    BG_SNAPSHOT_CONFIG = config['background_subtraction'].get('snapshot', {})
+    BG_SNAPSHOT_ENABLED = BG_SNAPSHOT_CONFIG.get('enabled', False)
 
     CONF_THRESHOLD = config['yolo']['confidence_threshold']
+    BATCH_SIZE = max(1, config['yolo'].get('batch_size', 1))
+    BATCH_MAX_WAIT_MS = config['yolo'].get('batch_max_wait_ms', 0)
     VALID_BIRD_SPECIES = config['yolo']['valid_bird_species']
+    MODEL_FILE = config['yolo'].get('model_path', os.path.join("models", "bird_detect_320.pt"))
+    ENGINE_BACKEND = config['yolo'].get('engine', 'torch')
+    MODEL_IMGSZ = config['yolo'].get('imgsz', 320)
+
+    ANALYSIS_CONFIG = config.get('analysis', {})
+    ANALYSIS_WORKERS = ANALYSIS_CONFIG.get('workers', 0)
+    ANALYSIS_QUEUE_SIZE = ANALYSIS_CONFIG.get('queue_size_per_camera', 10)
+
+    CASCADE_CONFIG = config.get('cascade', {})
+    RESULT_CACHE_CONFIG = config.get('result_cache', {})
+
+    TRACKING_CONFIG = config.get('tracking', {})
+    TRACKING_ENABLED = TRACKING_CONFIG.get('enabled', False)
+    # 업로드 쿨다운 적용 단위: global(전체 하나) | species(종류별) | track(찾아온 새마다, tracking 필요)
+    COOLDOWN_SCOPE = TRACKING_CONFIG.get('cooldown_scope', 'track' if TRACKING_ENABLED else 'global')
+
+    ADAPTIVE_RATE_CONFIG = config.get('adaptive_rate', {})
+    ADAPTIVE_RATE_ENABLED = ADAPTIVE_RATE_CONFIG.get('enabled', False)
+
+    ZONES_CONFIG = config.get('zones', {})
+    ZONES_ENABLED = ZONES_CONFIG.get('enabled', False)
+
+    CLIPS_CONFIG = config.get('clips', {})
+    CLIPS_ENABLED = CLIPS_CONFIG.get('enabled', False)
+
+    ROI_CONFIG = config.get('roi', {})
+    ROI_ENABLED = ROI_CONFIG.get('enabled', False)
+
+    UPLOAD_CONFIG = config.get('upload', {})
+    UPLOAD_BACKEND = UPLOAD_CONFIG.get('backend', 'firebase')
+    SOURCE_DEVICE = UPLOAD_CONFIG.get('source_device', "Raspberry Pi 4B")
+
+    OUTBOX_CONFIG = config.get('outbox', {})
+    OUTBOX_ENABLED = OUTBOX_CONFIG.get('enabled', False)
+
+    METRICS_CONFIG = config.get('metrics', {})
+    METRICS_ENABLED = METRICS_CONFIG.get('enabled', False)
+
+    TRACING_CONFIG = config.get('tracing', {})
+    TRACING_ENABLED = TRACING_CONFIG.get('enabled', False)
+
+    CONFIG_RELOAD_CONFIG = config.get('config_reload', {})
+    CONFIG_RELOAD_ENABLED = CONFIG_RELOAD_CONFIG.get('enabled', False)
 
 except Exception as e:
     print(f"[ERROR] 설정 파일 로드 또는 파싱 실패: {e}")
     sys.exit(1)
 
+# 시작 단계별 시간 (import / 모델 로딩 / warm-up / Firebase 초기화 / 첫 프레임 / 첫 분석)
+startup = perf_stats.StartupTimeline(STARTUP_T0)
+startup.mark("config_loaded")
+
+# 실행 중에 설정 파일을 고치면 바뀌는 값. 설정 감시 스레드가 객체를 통째로 바꿔 끼우므로,
+# 읽는 쪽은 프레임(배치)마다 live를 한 번만 읽으면 이전 값과 새 값이 섞이지 않음
+live = config_reload.LiveSettings(CAPTURE_INTERVAL, CONF_THRESHOLD, VALID_BIRD_SPECIES, FIREBASE_UPLOAD_COOLDOWN)
+# 카메라별 상태(배경 차분기, track)에 적용하는 설정: 설정 키 -> 카메라 변경 이름 (캡처 스레드가 프레임 사이에 적용)
+CAMERA_RELOAD_KEYS = {
+    'detection.min_area': 'min_area',
+    'background_subtraction.history': 'history',
+    'background_subtraction.threshold': 'threshold',
+    'tracking.iou_threshold': 'iou_threshold',
+    'tracking.center_distance_ratio': 'center_distance_ratio',
+    'tracking.max_age_s': 'max_age_s',
+    'tracking.change_iou': 'change_iou',
+    'tracking.reanalyze_interval_s': 'reanalyze_interval_s',
+}
+LIVE_RELOAD_KEYS = {
+    'detection.capture_interval': 'capture_interval',
+    'yolo.confidence_threshold': 'confidence_threshold',
+    'yolo.valid_bird_species': 'valid_species',
+    'detection.firebase_upload_cooldown': 'upload_cooldown',
+}
+config_watcher = None # config_reload.enabled 일 때 main()에서 시작
+
 # ----------------------------- 경로 설정 -----------------------------
 try:
-    # MODEL_PATH는 그대로 유지
-    MODEL_PATH = os.path.join(project_root, "models", "bird_detect_320.pt")
+    # 상대 경로는 프로젝트 루트 기준
+    MODEL_PATH = os.path.join(project_root, MODEL_FILE)
     print(f"[INFO] 모델 경로: {MODEL_PATH}")
 
 except Exception as e:
     print(f"[ERROR] 경로 설정 실패: {e}")
     sys.exit(1)
 
+# ----------------------------- 업로드 모듈 -----------------------------
+# Firebase SDK import와 초기화는 main()에서 백그라운드로 합니다. (카메라 시작이 기다리지 않도록)
+# 분석 프로세스(spawn)가 이 파일을 다시 import할 때도 Firebase SDK를 불러오지 않음
+firebase_manager = None
+
+def load_upload_backend():
+    """업로드 모듈 import. local: Firebase 대신 로컬 폴더에 저장 (재생/벤치마크용)"""
+    global firebase_manager
+    if UPLOAD_BACKEND == 'local':
+        import local_firebase as backend
+        backend.configure(UPLOAD_CONFIG.get('local_dir') or os.path.join(project_root, "local_uploads"),
+                          UPLOAD_CONFIG.get('local_latency_ms', 0), UPLOAD_CONFIG.get('local_failure_rate', 0.0))
+    else:
+        import firebase_manager as backend # Firebase 모듈 임포트
+    firebase_manager = backend
+
 # ----------------------------- 모델 로딩 -----------------------------
-try:
-    model = YOLO(MODEL_PATH)
-    print("[INFO] YOLO 모델 로딩 완료.")
-except Exception as e:
-    print(f"[ERROR] YOLO 모델 로딩 실패: {e}")
-    sys.exit(1)
+stage_timer = perf_stats.StageTimer() # 벤치마크에서 enable() 하면 단계별 시간이 기록됨
+# 모델은 main()에서 백그라운드 스레드로 로딩합니다. (그동안 캡처와 배경 학습을 먼저 시작)
+# 분석 프로세스를 사용하면 모델은 각 분석 프로세스에서 로딩하므로 메인 프로세스에서는 로딩하지 않음
+ENGINE_OPTIONS = {'model_path': MODEL_PATH, 'backend': ENGINE_BACKEND, 'imgsz': MODEL_IMGSZ, 'cascade': None,
+                  'result_cache': None}
+if CASCADE_CONFIG.get('enabled', False):
+    ENGINE_OPTIONS['cascade'] = {
+        'tiers': [dict(tier, model_path=os.path.join(project_root, tier['model_path'])) for tier in CASCADE_CONFIG['tiers']],
+        'valid_species': VALID_BIRD_SPECIES,
+        'uncertainty_band': CASCADE_CONFIG.get('uncertainty_band', [0.25, 0.6]),
+        'escalate_on': CASCADE_CONFIG.get('escalate_on', 'detection'),
+        'detection_padding': CASCADE_CONFIG.get('detection_padding', 0.5),
+    }
+if RESULT_CACHE_CONFIG.get('enabled', False):
+    ENGINE_OPTIONS['result_cache'] = {
+        'max_entries': RESULT_CACHE_CONFIG.get('max_entries', 256),
+        'ttl_s': RESULT_CACHE_CONFIG.get('ttl_s', 10.0),
+        'max_distance': RESULT_CACHE_CONFIG.get('max_distance', 4),
+        'hash_size': RESULT_CACHE_CONFIG.get('hash_size', 16),
+        'hash_margin': RESULT_CACHE_CONFIG.get('hash_margin', 4),
+    }
+engine = None
+engine_ready = threading.Event() # 모델 로딩 + warm-up이 끝나면 (실패해도) 설정
+engine_loader = None
 
 # ----------------------------- 스레드 관련 -----------------------------
-analysis_queue = queue.Queue(maxsize=10)
+# 모든 카메라가 함께 쓰는 분석 대기열. 카메라마다 ANALYSIS_QUEUE_SIZE개까지, 꺼낼 때는 카메라를 돌아가며
+analysis_queue = fair_queue.FairQueue(maxsize_per_key=ANALYSIS_QUEUE_SIZE)
+analysis_pool = None # analysis.workers > 0 일 때 첫 프레임을 받으면 생성 (공유 메모리는 프레임 크기별로 할당)
+analysis_pool_lock = threading.Lock() # 여러 캡처 스레드 중 처음 프레임을 받은 쪽이 생성
 stop_thread = threading.Event()
-last_successful_bird_upload_time = 0 # Firebase 업로드 쿨다운 관리를 위한 전역 변수
-
-def analysis_worker():
-    """YOLO 분석, 새 필터링, 쿨다운 적용 및 Firebase 업로드를 처리하는 워커 스레드"""
-    global last_successful_bird_upload_time # 전역 변수 수정 선언
+uploads_ready = threading.Event() # 업로드 모듈 초기화가 끝나면 (실패해도) 설정
+startup_failed = threading.Event() # 백그라운드 초기화(모델 로딩 / Firebase 초기화) 또는 분석 프로세스가 실패하면 설정
+cameras = [] # 카메라별 상태 (CameraPipeline). main()에서 build_cameras()로 생성
+upload_pool = None # main()에서 Firebase 초기화 후 생성
+upload_outbox = None # outbox.enabled 일 때 main()에서 생성
+outbox_flusher = None
+derivative_encoder = None # main()에서 업로드 풀과 함께 생성
+metrics_registry = metrics.MetricsRegistry()
+metrics_server = None # metrics.enabled 일 때 main()에서 시작
+tracer = None # tracing.enabled 일 때 main()에서 생성
 
-    while not stop_thread.is_set():
+def collect_batch(first_item):
+    """
+    첫 작업을 받은 뒤 큐에 쌓여 있는 작업을 최대 BATCH_SIZE개까지 모읍니다.
+    큐가 비어 있으면 최대 BATCH_MAX_WAIT_MS까지만 기다리고, 그때까지 모인 만큼만 반환합니다.
+    """
+    batch = [first_item]
+    deadline = time.perf_counter() + BATCH_MAX_WAIT_MS / 1000.0
+    while len(batch) < BATCH_SIZE:
+        remaining = deadline - time.perf_counter()
         try:
-            frame, timestamp = analysis_queue.get(timeout=1)
-
-            # YOLO 모델로 객체 탐지
-            results = model.predict(source=[frame], conf=CONF_THRESHOLD, save=False, verbose=False)
-
-            bird_detected_in_frame = False
-            detected_species_name = None
-            
-            # 결과에서 유효한 새 종류 필터링
-            if len(results) > 0 and len(results[0].boxes) > 0:
-                for box in results[0].boxes:
-                    cls = int(box.cls[0])
-                    class_name = model.names[cls]
-                    
-                    if class_name in VALID_BIRD_SPECIES: # 유효한 새 종류인지 확인
-                        bird_detected_in_frame = True
-                        detected_species_name = class_name # 탐지된 정확한 새 이름 사용
-                        detected_confidence = box.conf[0] # 탐지된 객체의 confidence 값 저장
-                        
-                        # 바운딩 박스 그리기 (선택 사항, 디버깅용)
-                        # x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        # conf = box.conf[0]
-                        # label = f"{class_name}: {conf:.2f}"
-                        # cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        # cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                        break # 유효한 새가 하나라도 탐지되면 충분
-            
-            if bird_detected_in_frame:
-                # 쿨다운 적용: 마지막 성공적인 업로드 이후 충분한 시간이 지났는지 확인
-                if (time.time() - last_successful_bird_upload_time) > FIREBASE_UPLOAD_COOLDOWN:
-                    print(f"[INFO] '{detected_species_name}' 객체 탐지! Firebase 업로드 조건 충족.")
-                    
-                    # 이미지를 JPEG 형식으로 인코딩 (Firebase 업로드용)
-                    is_success, im_buf_arr = cv2.imencode(".jpg", frame)
-                    if is_success:
-                        # Firebase에 업로드
-                        upload_result = firebase_manager.upload_detection_data(im_buf_arr, detected_species_name, detected_confidence)
-                        if upload_result:
-                            last_successful_bird_upload_time = time.time() # 성공 시 시간 갱신
-                            print(f"[INFO] Firebase 업로드 성공. 다음 업로드까지 {FIREBASE_UPLOAD_COOLDOWN}초 쿨다운.")
-                        else:
-                            print("[WARN] Firebase 업로드 실패.")
-                    else:
-                        print("[ERROR] 프레임 JPEG 인코딩 실패.")
-                else:
-                    time_since_last_upload = time.time() - last_successful_bird_upload_time
-                    remaining_cooldown = max(0, FIREBASE_UPLOAD_COOLDOWN - time_since_last_upload)
-                    print(f"[INFO] '{detected_species_name}' 객체 탐지되었으나, 쿨다운 ({remaining_cooldown:.1f}초 남음) 중입니다. 스킵.")
+            if remaining <= 0:
+                batch.append(analysis_queue.get_nowait()) # 대기 시간이 끝나도 이미 쌓인 작업은 가져감
             else:
-                print("[INFO] 움직임은 감지되었으나, YOLO 모델이 유효한 새 객체를 탐지하지 못했습니다.")
+                batch.append(analysis_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def cooldown_key(species, track=None):
+    """COOLDOWN_SCOPE에 따른 쿨다운 키"""
+    if COOLDOWN_SCOPE == 'track' and track is not None:
+        return ('track', track.track_id)
+    if COOLDOWN_SCOPE in ('track', 'species'):
+        return ('species', species)
+    return ('global',)
+
+def on_upload_complete(job, result):
+    """(업로드 스레드) 업로드 최종 결과 처리. 쿨다운 시각은 성공했을 때만 갱신"""
+    camera, timestamp, entry, key = job.context
+    if entry is not None:
+        # 성공하면 outbox에서 삭제, 실패하면 남겨 두었다가 flusher가 다시 보냄
+        if result:
+            upload_outbox.mark_done(entry)
+        else:
+            upload_outbox.mark_failed(entry, "upload failed")
+    # 성공 시 쿨다운 시각 갱신 (탐지한 프레임 시각)
+    camera.finish_upload(key, timestamp if result else None)
+    if result:
+        stage_timer.count("uploads", 1)
+        print(f"[INFO] Firebase 업로드 성공. 다음 업로드까지 {camera.cooldown_s}초 쿨다운.")
+    elif entry is not None:
+        print(f"[WARN] Firebase 업로드 실패. ({job.attempts}회 시도) outbox에 보관 후 나중에 다시 보냅니다.")
+    else:
+        print(f"[WARN] Firebase 업로드 실패. ({job.attempts}회 시도)")
+
+def handle_result(frame, timestamp, detections, camera):
+    """카메라 프레임 하나의 탐지 결과(confidence 내림차순)에 대해 새 필터링, 쿨다운 적용 및 업로드 요청을 처리"""
+    camera.count("analyzed")
+    valid_species = live.valid_species
+    if startup.mark("first_analysis"):
+        print(f"[INFO] 시작 단계별 시간: {startup.format()}")
+    # 제외 영역에 중심이 있는 탐지는 무시
+    if camera.zone_map:
+        frame_h, frame_w = frame.shape[:2]
+        detections = [d for d in detections if camera.zone_map.contains(
+            (d.box[0] + d.box[2]) / 2, (d.box[1] + d.box[3]) / 2, frame_w, frame_h)]
 
-            analysis_queue.task_done()
+    # 결과에서 유효한 새 종류 필터링 (tracking을 쓰면 탐지마다 track을 연결)
+    if camera.tracker:
+        candidates = camera.tracker.assign_detections(detections, timestamp, valid_species)
+    else:
+        candidates = [(detection, None) for detection in detections if detection.class_name in valid_species]
 
+    # 바운딩 박스 그리기 (선택 사항, 디버깅용, box는 원본 프레임 좌표)
+    # for detection, _ in candidates:
+    #     x1, y1, x2, y2 = map(int, detection.box)
+    #     label = f"{detection.class_name}: {detection.confidence:.2f}"
+    #     cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    #     cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+
+    if not candidates:
+        print("[INFO] 움직임은 감지되었으나, YOLO 모델이 유효한 새 객체를 탐지하지 못했습니다.")
+        return
+
+    # 쿨다운 적용: 쿨다운 키(전체 / 종류 / track)별로 마지막 성공적인 업로드 이후 충분한 시간이 지났는지 확인
+    # (timestamp는 프레임 시각이므로 녹화 영상 재생 시에도 같은 결과가 나옴)
+    # confidence가 높은 탐지부터 보고, 업로드할 수 있는 첫 탐지 하나만 업로드
+    for detection, track in candidates:
+        detected_species_name = detection.class_name # 탐지된 정확한 새 이름 사용
+        detected_confidence = detection.confidence # 탐지된 객체의 confidence 값 저장
+        label = f"'{detected_species_name}'" + (f" (track #{track.track_id})" if track else "")
+        if len(cameras) > 1:
+            label = f"[{camera.name}] {label}"
+        key = cooldown_key(detected_species_name, track)
+        remaining_cooldown = camera.cooldown_remaining(key, timestamp)
+        if remaining_cooldown is None:
+            stage_timer.count("upload_pending_skipped", 1)
+            print(f"[INFO] {label} 객체 탐지되었으나, 이전 업로드 결과를 기다리는 중입니다. 스킵.")
+        elif remaining_cooldown > 0:
+            stage_timer.count("cooldown_skipped", 1)
+            print(f"[INFO] {label} 객체 탐지되었으나, 쿨다운 ({remaining_cooldown:.1f}초 남음) 중입니다. 스킵.")
+        else:
+            print(f"[INFO] {label} 객체 탐지! Firebase 업로드 조건 충족.")
+            if camera.clip_writer:
+                camera.clip_writer.trigger(timestamp, detected_species_name)
+            request_upload(camera, frame, timestamp, detected_species_name, detected_confidence, key)
+            return
+
+def request_upload(camera, frame, timestamp, detected_species_name, detected_confidence, key):
+    """
+    프레임을 인코딩 스레드에 넘깁니다. (원본 + thumb/preview JPEG 인코딩은 분석/결과 처리 스레드에서 하지 않음)
+    key는 결과가 나올 때까지 업로드 중으로 표시
+    """
+    created_at = time.time()
+    uploads_ready.wait() # 모델이 Firebase 초기화보다 먼저 준비된 경우
+    if derivative_encoder is None:
+        return
+    camera.mark_in_flight(key)
+    if not derivative_encoder.submit(frame, lambda images: submit_upload(
+            camera, images, timestamp, detected_species_name, detected_confidence, key, created_at)):
+        camera.finish_upload(key)
+        print("[WARN] 인코딩 대기열이 가득 찼습니다. 업로드를 건너뜁니다.")
+
+def submit_upload(camera, images, timestamp, detected_species_name, detected_confidence, key, created_at):
+    """(인코딩 스레드) 인코딩한 이미지 {이름: JPEG bytes}를 outbox에 기록하고 업로드 풀에 넣습니다."""
+    if images is None:
+        camera.finish_upload(key)
+        print("[ERROR] 프레임 JPEG 인코딩 실패.")
+        return
+
+    # 업로드는 업로드 스레드에서 처리 (분석은 네트워크 지연을 기다리지 않음)
+    # outbox를 쓰면 업로드 시도 전에 디스크에 먼저 기록 (오프라인/비정상 종료 시에도 유실 없음)
+    entry = None
+    if upload_outbox:
+        entry = upload_outbox.put(images, detected_species_name, detected_confidence, camera.source_device,
+                                  created_at=created_at, claim=True)
+        job = outbox.upload_job(upload_outbox, entry, images,
+                                on_complete=on_upload_complete, context=(camera, timestamp, entry, key))
+    else:
+        # 재시도해도 같은 문서/파일을 덮어쓰도록 upload_id와 탐지 시각을 작업마다 한 번 정해 둠
+        # (commit은 서버에서 성공했는데 응답만 timeout된 경우 새 문서가 하나 더 생기지 않게)
+        job = UploadJob((images, detected_species_name, detected_confidence, camera.source_device),
+                        {'upload_id': uuid.uuid4().hex, 'detected_at': created_at},
+                        on_complete=on_upload_complete, context=(camera, timestamp, None, key))
+    if not upload_pool.submit(job):
+        camera.finish_upload(key)
+        if entry is not None:
+            upload_outbox.mark_failed(entry, "upload queue full")
+            print("[WARN] 업로드 대기열이 가득 찼습니다. outbox에 보관 후 나중에 다시 보냅니다.")
+        else:
+            print("[WARN] 업로드 대기열이 가득 찼습니다. 업로드를 건너뜁니다.")
+
+def analysis_worker():
+    """큐에서 프레임을 배치 단위로 꺼내 YOLO 분석 후, 프레임별로 결과를 처리하는 워커 스레드"""
+    # 모델이 준비될 때까지 움직임 프레임은 분석 대기열에 쌓아 둠 (카메라별 ANALYSIS_QUEUE_SIZE개까지)
+    engine_ready.wait()
+    if engine is None:
+        # 모델 로딩 실패: 가득 찬 대기열에 넣으려고 기다리는 캡처 스레드가 종료 신호를 볼 수 있도록 비움
+        while True:
+            try:
+                analysis_queue.get_nowait()
+                analysis_queue.task_done()
+            except queue.Empty:
+                return
+    while not stop_thread.is_set():
+        try:
+            first_item = analysis_queue.get(timeout=1)
         except queue.Empty:
             continue
+
+        batch = collect_batch(first_item)
+        try:
+            now = time.perf_counter()
+            for item in batch:
+                tracing.set_frame(item[5])
+                stage_timer.record("queue_wait", now - item[4]) # 분석 대기열에서 기다린 시간
+            # 움직임 영역이 있으면 crop만, 없으면 프레임 전체를 분석
+            jobs = [(frame, regions) for frame, _, regions, _, _, _ in batch]
+
+            # YOLO 모델로 객체 탐지 (여러 프레임/crop을 한 번의 호출로 처리)
+            tracing.set_frame([item[5] for item in batch])
+            with stage_timer.measure("predict"):
+                batch_detections = inference.predict_jobs(engine, jobs, live.confidence_threshold)
+            stage_timer.count("analyzed_frames", len(batch))
+
+            # 결과는 입력 순서와 같으므로 각 프레임의 timestamp와 그대로 짝지어 처리
+            for (frame, timestamp, _, camera, _, frame_id), detections in zip(batch, batch_detections):
+                tracing.set_frame(frame_id)
+                handle_result(frame, timestamp, detections, camera)
+
         except Exception as e:
             print(f"[ERROR] 분석 스레드에서 오류 발생: {e}")
+        finally:
+            # 실패한 작업도 완료 처리 (재생 종료 시 join()이 멈추지 않도록)
+            for _ in batch:
+                analysis_queue.task_done()
 
 # ----------------------------- 초기화 관련 -----------------------------
-def initialize_camera():
-    cap = cv2.VideoCapture(1)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_W)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_H)
-    if not cap.isOpened():
-        raise IOError("카메라를 열 수 없습니다.")
-    actual_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    actual_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    print(f"[INFO] 카메라 해상도: {actual_w}x{actual_h}")
-    return cap
-
-def initialize_background_subtractor():
-    return cv2.createBackgroundSubtractorMOG2(history=BG_HISTORY, varThreshold=BG_THRESHOLD, detectShadows=True)
+def start_engine_loader():
+    """(처음 한 번) 모델 로딩 스레드 시작. 분석 프로세스를 쓰면 모델은 각 분석 프로세스에서 로딩"""
+    global engine_loader
+    if ANALYSIS_WORKERS > 0:
+        engine_ready.set()
+    elif engine_loader is None:
+        engine_loader = threading.Thread(target=load_engine, name="model-loader", daemon=True)
+        engine_loader.start()
+
+def load_engine():
+    """(모델 로딩 스레드) 무거운 import, 모델 로딩, 더미 추론(warm-up)으로 첫 분석의 초기화 비용을 미리 치름"""
+    global engine
+    try:
+        if ENGINE_BACKEND == 'torch':
+            with startup.phase("import"):
+                import ultralytics # noqa: F401 (torch를 함께 불러오므로 가장 오래 걸림)
+        with startup.phase("model_load"):
+            loaded = cascade.build_engine(ENGINE_OPTIONS, stage_timer=stage_timer)
+        try:
+            with startup.phase("warmup"):
+                loaded.warmup(MODEL_IMGSZ)
+        except Exception as e:
+            print(f"[WARN] 모델 warm-up 실패 (첫 분석이 느릴 수 있음): {e}")
+        engine = loaded
+        print(f"[INFO] YOLO 모델 로딩 완료. (backend: {ENGINE_BACKEND})")
+    except Exception as e:
+        print(f"[ERROR] YOLO 모델 로딩 실패: {e}")
+        startup_failed.set()
+        stop_thread.set()
+    finally:
+        startup.mark("model_ready")
+        engine_ready.set()
+
+def init_uploads():
+    """(업로드 초기화 스레드) 업로드 모듈 import, Firebase 초기화 후 업로드 풀 / 인코딩 스레드 / outbox 시작"""
+    global upload_pool, upload_outbox, outbox_flusher, derivative_encoder
+    try:
+        with startup.phase("upload_init"):
+            load_upload_backend()
+            if not firebase_manager.initialize_firebase(UPLOAD_CONFIG.get('metadata_batch_size', 20),
+                                                        UPLOAD_CONFIG.get('metadata_batch_window_ms', 200)):
+                print("[ERROR] Firebase 초기화에 실패하여 프로그램을 종료합니다.")
+                startup_failed.set()
+                stop_thread.set()
+                return
+            upload_pool = start_upload_pool()
+            derivative_encoder = start_derivative_encoder()
+            if OUTBOX_ENABLED:
+                upload_outbox, outbox_flusher = start_outbox()
+    except Exception as e:
+        print(f"[ERROR] 업로드 초기화 실패: {e}")
+        startup_failed.set()
+        stop_thread.set()
+    finally:
+        startup.mark("uploads_ready")
+        uploads_ready.set()
+
+def build_cameras():
+    """cameras 설정(없으면 source 하나)으로 카메라별 상태를 만듭니다. 감시 영역은 카메라 설정에 없으면 zones 설정 사용"""
+    camera_configs = CAMERAS_CONFIG or [{'name': 'camera', 'source': SOURCE_CONFIG}]
+    built = []
+    for index, camera_config in enumerate(camera_configs):
+        name = str(camera_config.get('name') or f"camera{index}")
+        zones_config = camera_config.get('zones', ZONES_CONFIG)
+        # 감시 영역은 시작할 때 한 번 만들고, 해상도별 마스크도 처음 쓸 때 한 번만 그림
+        zone_map = zones.ZoneMap(zones_config.get('include'), zones_config.get('exclude'),
+                                 zones_config.get('crop_min_coverage', ZONES_CONFIG.get('crop_min_coverage', 0.1))) \
+            if zones_config.get('enabled', False) else None
+        default_device = SOURCE_DEVICE if len(camera_configs) == 1 else f"{SOURCE_DEVICE} ({name})"
+        built.append(CameraPipeline(name, camera_config.get('source', SOURCE_CONFIG),
+                                    camera_config.get('source_device', default_device),
+                                    FIREBASE_UPLOAD_COOLDOWN, zone_map))
+    return built
+
+def initialize_frame_source(camera):
+    source = frame_source.create_frame_source(camera.source_config, FRAME_W, FRAME_H)
+    source.open()
+    print(f"[INFO] 프레임 소스 ({camera.name}): {source.describe()}")
+    return source
+
+def initialize_tracker():
+    return tracker.BirdTracker(
+        iou_threshold=TRACKING_CONFIG.get('iou_threshold', 0.3),
+        center_distance_ratio=TRACKING_CONFIG.get('center_distance_ratio', 0.5),
+        max_age_s=TRACKING_CONFIG.get('max_age_s', 30.0),
+        change_iou=TRACKING_CONFIG.get('change_iou', 0.5),
+        reanalyze_interval_s=TRACKING_CONFIG.get('reanalyze_interval_s', 60.0),
+    )
+
+def initialize_scheduler():
+    return frame_scheduler.AdaptiveFrameScheduler(
+        active_fps=ADAPTIVE_RATE_CONFIG.get('active_fps', 0),
+        idle_fps=ADAPTIVE_RATE_CONFIG.get('idle_fps', 2.0),
+        idle_after_s=ADAPTIVE_RATE_CONFIG.get('idle_after_s', 60.0),
+        dark_threshold=ADAPTIVE_RATE_CONFIG.get('dark_threshold', 20.0),
+        dark_check_interval_s=ADAPTIVE_RATE_CONFIG.get('dark_check_interval_s', 10.0),
+        brightness_check_interval_s=ADAPTIVE_RATE_CONFIG.get('brightness_check_interval_s', 10.0),
+    )
+
+def initialize_motion_detector(camera):
+    zone_mask = None
+    if camera.zone_map:
+        zone_mask = camera.zone_map.mask(RESIZE_W, RESIZE_H)
+        print(f"[INFO] 감시 영역 ({camera.name}): 화면의 {camera.zone_map.allowed_fraction(RESIZE_W, RESIZE_H) * 100:.1f}%")
+    return motion.MotionDetector(RESIZE_W, RESIZE_H, BG_HISTORY, BG_THRESHOLD, MIN_AREA, stage_timer=stage_timer,
+                                 zone_mask=zone_mask)
 
 # ----------------------------- 움직임 감지 관련 -----------------------------
-def detect_motion(frame_small, fgbg):
-    fgmask = fgbg.apply(frame_small)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, kernel)
-    contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    motion_detected = False
-    for cnt in contours:
-        if cv2.contourArea(cnt) > MIN_AREA:
-            motion_detected = True
-            x, y, w, h = cv2.boundingRect(cnt)
-            cv2.rectangle(frame_small, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            
-    return motion_detected, fgmask
+def filter_zone_regions(camera, regions, frame_w, frame_h):
+    """감시 영역이 거의 없는 crop 제외. 빈 목록이면 분석할 영역이 없음 (None은 전체 프레임 분석)"""
+    if not camera.zone_map:
+        return regions
+    return camera.zone_map.filter_regions(regions, frame_w, frame_h)
 
-# ----------------------------- 메인 루프 -----------------------------
-def main():
-    cap = None
+def compute_regions(motion_boxes, frame_w, frame_h):
+    """저해상도 움직임 박스를 원본 해상도의 분석 영역(crop)으로 변환. None이면 전체 프레임 분석"""
+    return roi.compute_regions(
+        motion_boxes, frame_w / RESIZE_W, frame_h / RESIZE_H, frame_w, frame_h,
+        padding=ROI_CONFIG.get('padding', 0.25),
+        min_size=ROI_CONFIG.get('min_size', 320),
+        max_regions=ROI_CONFIG.get('max_regions', 4),
+        max_area_ratio=ROI_CONFIG.get('max_area_ratio', 0.5),
+    )
+
+def compute_track_regions(tracks, frame_w, frame_h):
+    """track 박스(원본 해상도)를 분석 영역(crop)으로 변환. None이면 전체 프레임 분석"""
+    boxes = [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in (track.box for track in tracks)]
+    return roi.compute_regions(
+        boxes, 1.0, 1.0, frame_w, frame_h,
+        padding=ROI_CONFIG.get('padding', 0.25),
+        min_size=ROI_CONFIG.get('min_size', 320),
+        max_regions=ROI_CONFIG.get('max_regions', 4),
+        max_area_ratio=ROI_CONFIG.get('max_area_ratio', 0.5),
+    )
+
+def tracks_to_analyze(camera, timestamp):
+    """이번 움직임의 track 중 YOLO 분석이 필요한 것 (종류를 아는 track은 업로드할 차례일 때만)"""
+    due = []
+    for track in camera.motion_tracks:
+        upload_due = track.species is not None and \
+            camera.cooldown_remaining(cooldown_key(track.species, track), timestamp) == 0
+        if camera.tracker.needs_analysis(track, timestamp, upload_due=upload_due):
+            due.append(track)
+    return due
+
+def start_analysis_pool(frame_shape):
+    """분석 프로세스 풀 시작. 공유 메모리 슬롯 크기는 실제 프레임 크기로 정함 (다른 크기의 카메라가 있으면 풀이 추가 할당)"""
+    return AnalysisPool(
+        ANALYSIS_WORKERS, ANALYSIS_CONFIG.get('shared_slots', 8), frame_shape, ENGINE_OPTIONS, CONF_THRESHOLD,
+        on_result=handle_result, batch_size=BATCH_SIZE, batch_max_wait_ms=BATCH_MAX_WAIT_MS,
+        threads_per_worker=ANALYSIS_CONFIG.get('threads_per_worker', 1),
+        # 카메라 하나가 공유 메모리 슬롯을 모두 차지하지 않도록 카메라별 몫을 나눔
+        slot_quota=max(1, ANALYSIS_CONFIG.get('shared_slots', 8) // len(cameras)), stage_timer=stage_timer,
+        on_failure=on_analysis_failure,
+    ).start()
+
+def on_analysis_failure(reason):
+    """(분석 결과 스레드) 분석 프로세스가 모두 종료됨 (모델 로딩 실패 등) -> 캡처를 멈추고 프로그램 종료"""
+    print(f"[ERROR] 분석 프로세스가 모두 종료되어 프로그램을 종료합니다: {reason}")
+    startup_failed.set()
+    stop_thread.set()
+
+def enqueue_for_analysis(camera, frame, timestamp, regions, block):
+    """분석 대기열(카메라별 몫)에 프레임을 넣습니다. 대기열이 가득 차서 넣지 못하면 False"""
+    if analysis_pool:
+        return analysis_pool.submit(frame, timestamp, regions, block=block, key=camera)
     try:
-        # Firebase 초기화
-        if not firebase_manager.initialize_firebase():
-            print("[ERROR] Firebase 초기화에 실패하여 프로그램을 종료합니다.")
-            sys.exit(1)
+        analysis_queue.put(camera.name, (frame.copy(), timestamp, regions, camera, time.perf_counter(),
+                                         tracing.current_frame()), block=block)
+        return True
+    except queue.Full:
+        return False
 
-        cap = initialize_camera()
-        fgbg = initialize_background_subtractor()
-        last_capture_time = 0
+def pending_analysis():
+    return analysis_pool.pending() if analysis_pool else analysis_queue.qsize()
 
-        # 분석 스레드 시작
-        analysis_thread = threading.Thread(target=analysis_worker, daemon=True)
-        analysis_thread.start()
+def cascade_stats():
+    """cascade 단계별 통계 (cascade를 사용하지 않으면 None)"""
+    if analysis_pool:
+        stats_list = analysis_pool.engine_stats("cascade")
+        return cascade.merge_stats(stats_list) if stats_list else None
+    return getattr(engine, "stats", None)
 
-        print("[INFO] 프로그램 시작. 'q'를 눌러 종료하세요.")
+def cache_stats():
+    """추론 결과 캐시 적중/실패 횟수 (캐시를 사용하지 않으면 None)"""
+    if analysis_pool:
+        stats_list = analysis_pool.engine_stats("cache")
+        return result_cache.merge_stats(stats_list) if stats_list else None
+    return getattr(engine, "cache_stats", None)
 
-        while True:
-            ret, frame = cap.read()
+def start_upload_pool():
+    return UploadPool(
+        firebase_manager.upload_detection_data,
+        num_workers=UPLOAD_CONFIG.get('workers', 2),
+        queue_size=UPLOAD_CONFIG.get('queue_size', 16),
+        max_retries=UPLOAD_CONFIG.get('max_retries', 3),
+        backoff_base_s=UPLOAD_CONFIG.get('backoff_base_s', 1.0),
+        backoff_max_s=UPLOAD_CONFIG.get('backoff_max_s', 30.0),
+        attempt_timeout_s=UPLOAD_CONFIG.get('attempt_timeout_s', 20.0),
+        stage_timer=stage_timer,
+    ).start()
+
+def start_derivative_encoder():
+    return image_derivatives.DerivativeEncoder(
+        image_derivatives.build_specs(UPLOAD_CONFIG.get('derivatives')),
+        num_workers=UPLOAD_CONFIG.get('encode_workers', 1),
+        queue_size=UPLOAD_CONFIG.get('encode_queue_size', 8),
+        stage_timer=stage_timer,
+    ).start()
+
+def start_outbox():
+    """outbox를 열고 (이전 실행에서 남은 항목 포함) 주기적으로 다시 보내는 flusher를 시작"""
+    directory = os.path.join(project_root, OUTBOX_CONFIG.get('dir', "outbox"))
+    box = outbox.UploadOutbox(directory, max_bytes=int(OUTBOX_CONFIG.get('max_mb', 500) * 1024 * 1024))
+    flusher = outbox.OutboxFlusher(
+        box, upload_pool,
+        batch_size=OUTBOX_CONFIG.get('flush_batch_size', 10),
+        interval_s=OUTBOX_CONFIG.get('flush_interval_s', 30.0),
+        max_interval_s=OUTBOX_CONFIG.get('flush_max_interval_s', 600.0),
+        on_uploaded=lambda entry, result: stage_timer.count("outbox_uploads", 1),
+    ).start()
+    return box, flusher
+
+def start_background_store(camera):
+    """카메라의 배경 스냅샷 (파일 이름은 카메라 이름). 설정이 바뀌면 저장한 배경은 쓰지 않음"""
+    return background_store.BackgroundSnapshotter(
+        os.path.join(project_root, BG_SNAPSHOT_CONFIG.get('dir', 'background')), camera.name,
+        {'resize_w': RESIZE_W, 'resize_h': RESIZE_H, 'history': BG_HISTORY, 'threshold': BG_THRESHOLD},
+        interval_s=BG_SNAPSHOT_CONFIG.get('interval_s', 300.0),
+        max_age_s=BG_SNAPSHOT_CONFIG.get('max_age_s', 3600.0),
+        max_mean_diff=BG_SNAPSHOT_CONFIG.get('max_mean_diff', 25.0),
+        seed_frames=BG_SNAPSHOT_CONFIG.get('seed_frames', 50),
+    )
+
+def start_clip_recorder(clips_dir):
+    return clip_recorder.ClipRecorder(
+        os.path.join(project_root, clips_dir),
+        fps=CLIPS_CONFIG.get('fps', 10.0),
+        pre_roll_s=CLIPS_CONFIG.get('pre_roll_s', 5.0),
+        post_roll_s=CLIPS_CONFIG.get('post_roll_s', 5.0),
+        max_clip_s=CLIPS_CONFIG.get('max_clip_s', 30.0),
+        jpeg_quality=CLIPS_CONFIG.get('jpeg_quality', 80),
+        max_ring_mb=CLIPS_CONFIG.get('max_ring_mb', 64),
+        max_disk_mb=CLIPS_CONFIG.get('max_disk_mb', 1024),
+        stage_timer=stage_timer,
+    ).start()
+
+def start_metrics():
+    """
+    메트릭 엔드포인트 시작. 단계별 시간/이벤트 개수는 stage_timer가 기록하고,
+    대기열 길이, 버린 프레임 수처럼 이미 다른 곳에서 세고 있는 값은 요청이 올 때 읽음
+    """
+    stage_timer.attach_metrics(metrics_registry)
+    registry = metrics_registry
+    registry.callback("bird_analysis_queue_depth", "gauge", "Frames waiting for analysis", pending_analysis)
+    registry.callback("bird_camera_analysis_queue_depth", "gauge", "Frames waiting for analysis per camera",
+                      lambda: {(camera.name,): analysis_queue.qsize(camera.name) for camera in cameras},
+                      ("camera",))
+    registry.callback("bird_encode_queue_depth", "gauge", "Upload frames waiting for JPEG encoding",
+                      lambda: derivative_encoder.queue.qsize() if derivative_encoder else None)
+    registry.callback("bird_upload_queue_depth", "gauge", "Uploads queued or in progress",
+                      lambda: upload_pool.pending() if upload_pool else None)
+    registry.callback("bird_outbox_entries", "gauge", "Uploads stored in the outbox",
+                      lambda: upload_outbox.count() if upload_outbox else None)
+    registry.callback("bird_camera_events_total", "counter", "Per-camera frame, motion, analysis and upload counts",
+                      lambda: {(camera.name, event): value for camera in cameras
+                               for event, value in camera.summary().items()},
+                      ("camera", "event"))
+    registry.callback("bird_dropped_frames_total", "counter", "Frames dropped before processing",
+                      dropped_frame_counts, ("camera", "reason"))
+    registry.callback("bird_uploads_total", "counter", "Upload results",
+                      lambda: {(result,): value for result, value in upload_pool.stats().items()}
+                      if upload_pool else None, ("result",))
+    registry.callback("bird_camera_mode", "gauge", "Adaptive frame rate mode (1 = current)",
+                      lambda: {(camera.name, mode): int(camera.scheduler.mode == mode) for camera in cameras
+                               if camera.scheduler for mode in frame_scheduler.MODES},
+                      ("camera", "mode"))
+    registry.callback("bird_result_cache_total", "counter", "Inference result cache lookups",
+                      lambda: {(kind,): cache_stats()[kind] for kind in ("hits", "misses")} if cache_stats() else None,
+                      ("result",))
+    try:
+        return metrics.MetricsServer(registry, METRICS_CONFIG.get('host', '127.0.0.1'),
+                                     METRICS_CONFIG.get('port', 9108)).start()
+    except OSError as e:
+        print(f"[WARN] 메트릭 엔드포인트를 시작하지 못했습니다: {e}")
+        return None
+
+def start_tracing():
+    """trace 링 생성. SIGUSR1을 받으면 그때까지의 trace를 저장 (종료할 때도 저장)"""
+    new_tracer = tracing.Tracer(TRACING_CONFIG.get('capacity', 100000), TRACING_CONFIG.get('gc', True)).start()
+    stage_timer.attach_tracer(new_tracer)
+    if hasattr(signal, 'SIGUSR1'): # Windows에는 없음
+        signal.signal(signal.SIGUSR1, lambda signum, frame: dump_trace(on_demand=True))
+        print(f"[INFO] trace 저장 요청: kill -USR1 {os.getpid()}")
+    return new_tracer
+
+def dump_trace(on_demand=False):
+    """trace를 tracing.output에 저장. 실행 중 요청이면 파일 이름에 시각을 붙여 따로 저장"""
+    path = os.path.join(project_root, TRACING_CONFIG.get('output') or os.path.join("traces", "trace.json"))
+    if on_demand:
+        path = f"{path[:-len('.json')] if path.endswith('.json') else path}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    try:
+        tracer.dump(path)
+    except Exception as e:
+        print(f"[ERROR] trace 저장 실패: {e}")
+
+def reload_config(new_config, changes):
+    """
+    (설정 감시 스레드) 바뀐 설정 중 실행 중에 바꿀 수 있는 값만 적용하고, 나머지는 재시작해야 적용된다고 알림.
+    모델과 학습한 배경은 그대로 유지 (배경 차분 파라미터도 배경 차분기를 새로 만들지 않고 바꿈)
+    """
+    global live
+    live_keys = dict(LIVE_RELOAD_KEYS)
+    if ANALYSIS_WORKERS > 0:
+        # 분석 프로세스는 시작할 때 받은 값을 씀 (cascade의 새 종류 목록도 분석 프로세스 안에 있음)
+        live_keys.pop('yolo.confidence_threshold')
+        live_keys.pop('yolo.valid_bird_species')
+    applied, restart = [], []
+    live_changes, camera_changes = {}, {}
+    for key, old, new in changes:
+        if key in live_keys:
+            live_changes[live_keys[key]] = new
+        elif key in CAMERA_RELOAD_KEYS and (TRACKING_ENABLED or not key.startswith('tracking.')):
+            camera_changes[CAMERA_RELOAD_KEYS[key]] = new
+        else:
+            restart.append(key)
+            continue
+        applied.append(f"{key}: {old} -> {new}")
+
+    if live_changes:
+        live = live._replace(**live_changes)
+        if 'valid_species' in live_changes:
+            set_engine_species(live.valid_species)
+        if 'upload_cooldown' in live_changes:
+            for camera in cameras:
+                camera.cooldown_s = live.upload_cooldown
+    if camera_changes:
+        for camera in cameras:
+            camera.pending_reload = dict(camera.pending_reload or {}, **camera_changes)
+    if applied:
+        print(f"[INFO] 설정 변경 적용: {', '.join(applied)}")
+    if restart:
+        print(f"[WARN] 재시작해야 적용되는 설정이 바뀌었습니다: {', '.join(restart)}")
+    stage_timer.count("config_reloads", 1)
+
+def set_engine_species(species):
+    """cascade가 다음 단계로 넘길지 판단할 때 쓰는 새 종류 목록도 바꿈 (결과 캐시가 감싸고 있으면 안쪽 엔진)"""
+    target = engine
+    while target is not None:
+        if hasattr(target, 'valid_species'):
+            target.valid_species = set(species)
+        target = getattr(target, 'engine', None)
+
+def apply_camera_reload(camera):
+    """(캡처 스레드) 바뀐 움직임 감지 / track 설정을 프레임 사이에 적용"""
+    changes, camera.pending_reload = camera.pending_reload, None
+    detector = camera.motion_detector
+    detector.set_params(min_area=changes.get('min_area'), history=changes.get('history'),
+                        threshold=changes.get('threshold'))
+    if camera.background_store:
+        # 저장하는 배경에도 지금 파라미터를 기록 (다시 시작할 때 설정과 비교)
+        camera.background_store.settings.update(
+            {key: changes[key] for key in ('history', 'threshold') if key in changes})
+    if camera.tracker:
+        for name in ('iou_threshold', 'center_distance_ratio', 'max_age_s', 'change_iou', 'reanalyze_interval_s'):
+            if name in changes:
+                setattr(camera.tracker, name, changes[name])
+
+def dropped_frame_counts():
+    """카메라별 버린 프레임 수 (stale: 처리가 밀려 건너뛴 카메라 프레임, queue_full: 분석 대기열이 가득 참, clip: 클립 대기열)"""
+    counts = {}
+    for camera in cameras:
+        if isinstance(camera.source, frame_source.LatestFrameGrabber):
+            counts[(camera.name, "stale")] = camera.source.dropped_frames
+        counts[(camera.name, "queue_full")] = camera.summary()["queue_full"]
+        if camera.clip_writer:
+            counts[(camera.name, "clip")] = camera.clip_writer.stats["dropped_frames"]
+    return counts
+
+def camera_stats():
+    """카메라별 프레임 / 움직임 / 분석 / 업로드 수와 분석 대기열에서 꺼내 간 수"""
+    stats = {camera.name: camera.summary() for camera in cameras}
+    for name, queue_stats in analysis_queue.summary().items():
+        stats[name]["queue_served"] = queue_stats["served"]
+    return stats
+
+def wait_for_analysis():
+    """남은 분석 작업을 모두 처리할 때까지 대기"""
+    if analysis_pool:
+        analysis_pool.join()
+    else:
+        analysis_queue.join()
+
+# ----------------------------- 메인 루프 -----------------------------
+def start_camera(camera):
+    """카메라 하나의 프레임 소스와 카메라별 상태(배경 차분기, track, 처리 간격, 클립)를 준비"""
+    camera.source = initialize_frame_source(camera)
+    camera.motion_detector = initialize_motion_detector(camera)
+    camera.tracker = initialize_tracker() if TRACKING_ENABLED else None
+    camera.scheduler = initialize_scheduler() if ADAPTIVE_RATE_ENABLED else None
+    if BG_SNAPSHOT_ENABLED:
+        camera.background_store = start_background_store(camera)
+    if CLIPS_ENABLED:
+        # 카메라가 여러 대면 카메라별 하위 폴더에 저장
+        clips_dir = CLIPS_CONFIG.get('dir', 'clips') if len(cameras) == 1 else \
+            os.path.join(CLIPS_CONFIG.get('dir', 'clips'), camera.name)
+        camera.clip_writer = start_clip_recorder(clips_dir)
+
+def ensure_analysis_pool(frame_shape):
+    global analysis_pool
+    with analysis_pool_lock:
+        if analysis_pool is None:
+            analysis_pool = start_analysis_pool(frame_shape)
+
+def run_camera(camera):
+    """(카메라별 캡처 스레드) 프레임을 읽어 움직임을 감지하고, 분석할 프레임을 공유 분석 대기열에 넣음"""
+    source = camera.source
+    motion_detector = camera.motion_detector
+    scheduler = camera.scheduler
+    try:
+        while not stop_thread.is_set():
+            if camera.pending_reload:
+                apply_camera_reload(camera) # 설정이 바뀌었으면 프레임 사이에 한 번에 적용
+            tracing.set_frame((camera.name, camera.stats["frames"] + 1)) # 이 스레드에서 기록하는 단계의 프레임 ID
+            with stage_timer.measure("read"):
+                ret, frame = source.read(camera.capture_buffer)
             if not ret:
-                print("[WARN] 프레임 수신 실패")
+                if source.is_live:
+                    print(f"[WARN] 프레임 수신 실패 ({camera.name})")
+                else:
+                    print(f"[INFO] 영상 재생이 끝났습니다. ({camera.name})")
                 break
 
-            frame_small = cv2.resize(frame, (RESIZE_W, RESIZE_H))
-            detected, fgmask = detect_motion(frame_small, fgbg)
-
-            # CAPTURE_INTERVAL은 움직임 감지 후 분석 큐에 넣는 간격
-            if detected and (time.time() - last_capture_time > CAPTURE_INTERVAL):
-                # timestamp는 이제 사용되지 않지만, 큐 인터페이스 유지를 위해 남겨둠
-                timestamp = int(time.time()) 
-                try:
-                    analysis_queue.put_nowait((frame.copy(), timestamp))
-                    last_capture_time = time.time()
-                    print(f"[DEBUG] 움직임 감지! 분석 큐에 추가 (큐 크기: {analysis_queue.qsize()})")
-                except queue.Full:
-                    print("[WARN] 분석 큐가 가득 찼습니다. 프레임을 건너뜁니다.")
-
-            # cv2.imshow("Motion Detection", frame_small)
+            camera.capture_buffer = frame
+            camera.count("frames")
+            if camera.stats["frames"] == 1:
+                startup.mark("first_frame")
+
+            if ANALYSIS_WORKERS > 0 and analysis_pool is None:
+                ensure_analysis_pool(frame.shape)
+
+            # idle / dark 모드에서는 처리 간격이 되지 않은 프레임을 건너뜀 (실시간 카메라는 읽는 간격 자체를 늘림)
+            if scheduler and not scheduler.due(frame, source.frame_time):
+                source.set_min_interval(scheduler.read_interval)
+                stage_timer.count("scheduler_skipped", 1)
+                continue
+
+            with stage_timer.measure("motion"):
+                detected, fgmask, blobs = motion_detector.detect(frame)
+            if camera.background_store:
+                if not camera.background_store.frames_seen:
+                    # 첫 프레임 (MOG2 초기화 직후): 저장해 둔 배경이 지금 장면과 맞으면 배경 모델을 채움
+                    with startup.phase("background_restore" if len(cameras) == 1 else
+                                       f"background_restore:{camera.name}"):
+                        camera.background_store.restore(motion_detector, motion_detector.frame_small)
+                camera.background_store.maybe_save(motion_detector, source.frame_time)
+            motion_boxes = blobs.boxes
+            if scheduler:
+                scheduler.on_motion(detected, source.frame_time)
+                source.set_min_interval(scheduler.read_interval)
+            if camera.clip_writer:
+                # 이미 축소된 움직임 감지용 프레임을 클립에 사용 (녹화 영상 재생은 결과가 같도록 버리지 않음)
+                camera.clip_writer.add_frame(motion_detector.frame_small, source.frame_time, block=not source.is_live)
+            if detected:
+                camera.count("motion_frames")
+            if detected and camera.tracker:
+                # track은 매 프레임 갱신 (분석 여부는 아래에서 capture_interval마다 판단)
+                scaled_boxes = roi.scale_boxes(motion_boxes, frame.shape[1] / RESIZE_W, frame.shape[0] / RESIZE_H)
+                camera.motion_tracks = camera.tracker.update_motion(scaled_boxes, source.frame_time)
+
+            # capture_interval은 움직임 감지 후 분석 큐에 넣는 간격
+            # 시간 비교는 프레임 시각 기준 (녹화 영상 재생 시에는 영상 내 시각)
+            if detected and (source.frame_time - camera.last_capture_time > live.capture_interval):
+                # timestamp는 프레임 시각 (쿨다운 계산에 사용)
+                timestamp = source.frame_time
+                due_tracks = None
+                if camera.tracker:
+                    due_tracks = tracks_to_analyze(camera, timestamp)
+                    if not due_tracks:
+                        # 이미 종류를 아는 새의 움직임 (쿨다운 중) -> YOLO 분석 생략
+                        stage_timer.count("tracker_skipped", 1)
+                        camera.last_capture_time = source.frame_time
+                        continue
+                    regions = compute_track_regions(due_tracks, frame.shape[1], frame.shape[0]) if ROI_ENABLED else None
+                else:
+                    regions = compute_regions(motion_boxes, frame.shape[1], frame.shape[0]) if ROI_ENABLED else None
+                regions = filter_zone_regions(camera, regions, frame.shape[1], frame.shape[0])
+                if regions == []:
+                    # 움직임 영역이 모두 제외 영역에 걸친 crop -> YOLO 분석 생략
+                    stage_timer.count("zone_skipped", 1)
+                    camera.last_capture_time = source.frame_time
+                    continue
+                if due_tracks:
+                    # 결과가 enqueue 직후 바로 올 수도 있으므로 넣기 전에 표시
+                    camera.tracker.mark_pending(due_tracks, timestamp)
+                # 녹화 영상 재생은 결과가 항상 같도록 프레임을 버리지 않고 대기
+                if enqueue_for_analysis(camera, frame, timestamp, regions, block=not source.is_live):
+                    camera.last_capture_time = source.frame_time
+                    camera.count("enqueued")
+                    if not engine_ready.is_set():
+                        stage_timer.count("buffered_before_ready", 1) # 모델 로딩 중에 쌓아 둔 프레임
+                    print(f"[DEBUG] 움직임 감지! 분석 큐에 추가 ({camera.name}, 큐 크기: {pending_analysis()})")
+                else:
+                    if due_tracks:
+                        camera.tracker.mark_pending(due_tracks, None)
+                    camera.count("queue_full")
+                    print(f"[WARN] 분석 큐가 가득 찼습니다. 프레임을 건너뜁니다. ({camera.name})")
+
+            # cv2.imshow("Motion Detection", motion_detector.frame_small)
             # cv2.imshow("Foreground Mask", fgmask)
 
             # if cv2.waitKey(1) & 0xFF == ord('q'):
             #     break
+    except Exception as e:
+        print(f"[ERROR] 캡처 루프에서 예상치 못한 오류 발생 ({camera.name}): {e}")
+
+def main():
+    global cameras, metrics_server, tracer, config_watcher
+    try:
+        if METRICS_ENABLED:
+            metrics_server = start_metrics()
+        if TRACING_ENABLED:
+            tracer = start_tracing()
+
+        # 오래 걸리는 초기화(모델 import/로딩/warm-up, Firebase 초기화)는 백그라운드 스레드에서 하고,
+        # 카메라 캡처와 배경 학습은 바로 시작 (모델이 준비되기 전의 움직임 프레임은 분석 대기열에 쌓임)
+        start_engine_loader()
+        threading.Thread(target=init_uploads, name="upload-init", daemon=True).start()
+
+        cameras = build_cameras()
+        for camera in cameras:
+            with startup.phase("camera_open" if len(cameras) == 1 else f"camera_open:{camera.name}"):
+                start_camera(camera)
+
+        # 분석 스레드 시작 (모델이 준비될 때까지 대기. 분석 프로세스를 사용하면 첫 프레임을 받은 뒤 시작)
+        if ANALYSIS_WORKERS == 0:
+            analysis_thread = threading.Thread(target=analysis_worker, name="analysis", daemon=True)
+            analysis_thread.start()
+
+        # 카메라마다 캡처 스레드 하나 (추론 엔진과 분석 대기열은 모든 카메라가 함께 씀)
+        capture_threads = [threading.Thread(target=run_camera, args=(camera,), name=f"capture-{camera.name}",
+                                            daemon=True) for camera in cameras]
+        for thread in capture_threads:
+            thread.start()
+        print(f"[INFO] 프로그램 시작. (카메라 {len(cameras)}대) Ctrl+C로 종료하세요.")
+        if CONFIG_RELOAD_ENABLED:
+            config_watcher = config_reload.ConfigWatcher(CONFIG_PATH, config, reload_config,
+                                                         CONFIG_RELOAD_CONFIG.get('interval_s', 2.0)).start()
+
+        while any(thread.is_alive() for thread in capture_threads):
+            for thread in capture_threads:
+                thread.join(timeout=0.5)
+
+        uploads_ready.wait()
+        if startup_failed.is_set():
+            sys.exit(1)
+        if not any(camera.source.is_live for camera in cameras):
+            wait_for_analysis() # 남은 분석 작업을 모두 처리한 후 종료
+            derivative_encoder.join() # 남은 인코딩도 업로드 풀에 넣은 후
+            upload_pool.join() # 남은 업로드(재시도 포함)도 끝낸 후 종료
 
     except (KeyboardInterrupt, SystemExit):
         print("[INFO] 프로그램 종료 요청...")
@@ -209,12 +963,60 @@ def main():
     finally:
         print("[INFO] 리소스 정리 중...")
         stop_thread.set()
+        if config_watcher:
+            config_watcher.stop()
+        if 'capture_threads' in locals():
+            for thread in capture_threads:
+                thread.join(timeout=5)
         if 'analysis_thread' in locals() and analysis_thread.is_alive():
             analysis_thread.join(timeout=5)
-        
-        if cap:
-            cap.release()
-        cv2.destroyAllWindows()
+        if cascade_stats():
+            cascade.print_stats(cascade_stats())
+        if cache_stats():
+            result_cache.print_stats(cache_stats())
+        for camera in cameras:
+            if camera.scheduler:
+                print(f"[INFO] 프레임 처리 모드 통계 ({camera.name}): {camera.scheduler.summary()}")
+            if camera.clip_writer:
+                camera.clip_writer.close()
+                print(f"[INFO] 클립 통계 ({camera.name}): {camera.clip_writer.summary()}")
+            if camera.background_store:
+                camera.background_store.save_now(camera.motion_detector) # 다음 실행 때 복원
+                print(f"[INFO] 배경 저장 통계 ({camera.name}): {camera.background_store.summary()}")
+        if len(cameras) > 1:
+            print(f"[INFO] 카메라별 통계: {camera_stats()}")
+        if analysis_pool:
+            analysis_pool.stop()
+        if derivative_encoder:
+            derivative_encoder.stop() # 인코딩이 끝난 업로드까지 업로드 풀에 넣음
+            print(f"[INFO] 업로드 이미지 인코딩 통계: {derivative_encoder.summary()}")
+        if outbox_flusher:
+            outbox_flusher.stop()
+        if upload_pool:
+            upload_pool.stop(timeout=UPLOAD_CONFIG.get('attempt_timeout_s', 20.0))
+            print(f"[INFO] 업로드 통계: {upload_pool.stats()}")
+            firebase_manager.shutdown() # 모아 둔 메타데이터 commit
+            print(f"[INFO] 업로드 요청 왕복 통계: {firebase_manager.upload_stats()}")
+        if metrics_server:
+            metrics_server.stop()
+        if tracer:
+            tracer.stop()
+            dump_trace()
+        if upload_outbox:
+            print(f"[INFO] 업로드 outbox에 남은 항목: {upload_outbox.count()}개 (다음 실행 때 다시 보냄)")
+            upload_outbox.close()
+
+        for camera in cameras:
+            source = camera.source
+            if source:
+                if isinstance(source, frame_source.LatestFrameGrabber):
+                    print(f"[INFO] 처리하지 못하고 버린 오래된 프레임 ({camera.name}): "
+                          f"{source.dropped_frames}/{source.grabbed_frames}")
+                source.release()
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            pass # GUI 없는 OpenCV(headless) 빌드
         print("[INFO] 프로그램이 성공적으로 종료되었습니다.")
 
 # ----------------------------- 실행 -----------------------------
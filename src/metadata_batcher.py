@@ -0,0 +1,115 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# =====================================================================================
+# 메타데이터 쓰기 배치
+# 여러 업로드 스레드가 동시에 넣은 메타데이터 쓰기를 모아 한 번에 commit 합니다. (Firestore WriteBatch 등)
+# 모인 개수가 max_batch가 되거나, 첫 항목이 들어온 뒤 window_ms가 지나면 commit 합니다.
+# writer()로 진행 중인 업로드를 알려주면, 진행 중인 업로드가 모두 add()에서 기다리는 순간
+# (더 올 항목이 없으므로) window_ms를 기다리지 않고 바로 commit 합니다. 업로드가 하나뿐이면 지연이 없습니다.
+# add()는 자기 항목이 포함된 commit이 끝날 때까지 기다리므로, 호출한 쪽은 지금처럼 성공/실패를 바로 알 수 있습니다.
+# =====================================================================================
+
+
+class _PendingWrite:
+    def __init__(self, item, timeout):
+        self.item = item
+        self.timeout = timeout
+        self.added = time.perf_counter()
+        self.done = threading.Event()
+        self.error = None
+
+
+class MetadataBatcher:
+    """
+    commit_fn(items, timeout)을 배치 단위로 호출하는 스레드.
+    commit_fn이 예외를 던지면 그 배치의 모든 add()가 같은 예외를 다시 던집니다.
+    """
+
+    def __init__(self, commit_fn, max_batch=20, window_ms=200):
+        self.commit_fn = commit_fn
+        self.max_batch = max(1, max_batch)
+        self.window_s = window_ms / 1000.0
+        self.commits = 0
+        self.committed_items = 0
+        self._pending = []
+        self._writers = 0  # writer() 안에 있는 업로드 수
+        self._committing = 0  # commit 중인 배치의 항목 수
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name="metadata-batcher", daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def writer(self):
+        """업로드 하나의 시작~끝을 감싸는 context. 이 안에서 add()를 호출"""
+        with self._cond:
+            self._writers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writers -= 1
+                self._cond.notify_all()
+
+    def _more_expected(self):
+        """(lock 보유 상태) 아직 add()하지 않은 진행 중 업로드가 있는지. writer()를 안 쓰면 항상 True"""
+        return self._writers == 0 or len(self._pending) < self._writers - self._committing
+
+    def add(self, item, timeout=None):
+        """항목을 넣고 commit이 끝날 때까지 대기. timeout이 지나면 TimeoutError"""
+        write = _PendingWrite(item, timeout)
+        with self._cond:
+            if self._stop:
+                raise RuntimeError("metadata batcher is closed")
+            self._pending.append(write)
+            self._cond.notify_all()
+        # commit 자체에도 timeout을 주므로 대기 시간은 배치 대기 시간만큼 여유를 둠
+        if not write.done.wait(None if timeout is None else timeout + self.window_s):
+            raise TimeoutError("metadata commit timed out")
+        if write.error is not None:
+            raise write.error
+
+    def _take_batch(self):
+        """(lock 보유 상태) commit할 항목을 모읍니다. 종료 중이고 남은 항목이 없으면 None"""
+        while not self._pending and not self._stop:
+            self._cond.wait()
+        if not self._pending:
+            return None
+        deadline = self._pending[0].added + self.window_s
+        while len(self._pending) < self.max_batch and self._more_expected() and not self._stop:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        batch = self._pending[:self.max_batch]
+        del self._pending[:self.max_batch]
+        self._committing += len(batch)
+        return batch
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if batch is None:
+                return
+            timeouts = [write.timeout for write in batch if write.timeout is not None]
+            try:
+                self.commit_fn([write.item for write in batch], min(timeouts) if timeouts else None)
+                self.commits += 1
+                self.committed_items += len(batch)
+            except Exception as e:
+                for write in batch:
+                    write.error = e
+            with self._cond:
+                self._committing -= len(batch)
+            for write in batch:
+                write.done.set()
+
+    def close(self, timeout=10):
+        """남은 항목을 commit하고 스레드를 종료"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
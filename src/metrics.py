@@ -0,0 +1,243 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =====================================================================================
+# 메트릭 레지스트리 + Prometheus 텍스트 형식 HTTP 엔드포인트
+# - counter / gauge / histogram을 이름과 label로 등록하고, /metrics 요청이 오면 텍스트 형식(0.0.4)으로 내보냅니다.
+# - 기록 비용을 줄이기 위해 histogram은 고정 bucket 배열에 개수만 더하고(bisect + 정수 덧셈),
+#   누적 합계는 요청이 올 때 계산합니다. label 조합별 객체는 처음 한 번만 만들고 재사용합니다.
+# - 대기열 길이처럼 읽기만 하면 되는 값은 callback으로 등록해 요청이 올 때만 계산합니다. (평소 비용 없음)
+# =====================================================================================
+
+# 초 단위 지연 시간 bucket (프레임 읽기 ~1ms부터 업로드 ~수 초까지)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Value:
+    """counter / gauge 하나 (label 조합 하나)"""
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def set(self, value):
+        self.value = value
+
+
+class _Histogram:
+    """histogram 하나 (label 조합 하나). counts[i]는 bucket i에만 들어간 개수 (누적은 출력할 때 계산)"""
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class MetricFamily:
+    """이름 하나에 속한 label 조합별 값들. labels(...)로 값 객체를 얻어 기록"""
+
+    def __init__(self, name, kind, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.kind = kind  # counter | gauge | histogram
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = _Histogram(self.buckets) if self.kind == "histogram" else _Value()
+                    self._children[values] = child
+        return child
+
+    # label이 없는 metric용
+    def inc(self, n=1):
+        self.labels().inc(n)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        lines = []
+        for values, child in sorted(children, key=lambda item: item[0]):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_label_text(self.labelnames, values)} {_number(child.value)}")
+                continue
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """요청이 올 때 fn()으로 값을 읽는 counter / gauge. fn()은 숫자 또는 {label 값 tuple: 숫자}"""
+
+    def __init__(self, name, kind, help_text, fn, labelnames=()):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        values = self.fn()
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}"
+                for labels, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """metric 등록과 Prometheus 텍스트 형식 출력"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(MetricFamily(name, "counter", help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(MetricFamily(name, "gauge", help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(MetricFamily(name, "histogram", help_text, labelnames, buckets))
+
+    def callback(self, name, kind, help_text, fn, labelnames=()):
+        return self._register(CallbackMetric(name, kind, help_text, fn, labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:  # callback 하나가 실패해도 나머지는 내보냄
+                print(f"[WARN] 메트릭 {metric.name} 값을 읽지 못했습니다: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """GET /metrics에 registry.render()를 돌려주는 HTTP 서버 스레드"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # 요청마다 로그를 남기지 않음
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]  # port 0이면 비어 있는 포트
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        print(f"[INFO] 메트릭 엔드포인트: http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+if __name__ == "__main__":
+    # 기록 한 번의 비용 측정
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "benchmark", ("stage",)).labels("read")
+    counter = registry.counter("bench_total", "benchmark", ("event",)).labels("frames")
+    n = 200000
+    start = time.perf_counter()
+    for i in range(n):
+        histogram.observe(0.001 * (i % 50))
+    observe_ns = (time.perf_counter() - start) / n * 1e9
+    start = time.perf_counter()
+    for _ in range(n):
+        counter.inc()
+    inc_ns = (time.perf_counter() - start) / n * 1e9
+    print(f"histogram.observe: {observe_ns:.0f} ns, counter.inc: {inc_ns:.0f} ns")
+    print(registry.render())
@@ -0,0 +1,148 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+import perf_stats
+
+# =====================================================================================
+# 움직임 감지
+# 매 프레임마다 새 배열을 만들지 않도록 축소 프레임, 전경 마스크, 모폴로지 결과, 라벨 버퍼를 미리 할당해 두고
+# cv2 함수의 dst 인자로 같은 버퍼에 덮어씁니다. 모폴로지 커널도 한 번만 만듭니다.
+# 전경 덩어리(blob)는 connectedComponentsWithStats 한 번으로 박스/면적/중심점을 배열로 얻고,
+# 최소 면적 필터도 배열 연산 한 번으로 처리합니다. (윤곽선마다 Python 루프를 돌지 않으므로
+# 노이즈 덩어리가 수백 개인 마스크도 깨끗한 마스크와 비용이 거의 같습니다)
+# =====================================================================================
+
+# boxes: (N, 4) int32 (x, y, w, h), areas: (N,) int32 픽셀 수, centroids: (N, 2) float64 (x, y)
+# 모두 저해상도 프레임 기준이며, 면적이 큰 순서입니다.
+MotionBlobs = namedtuple("MotionBlobs", ["boxes", "areas", "centroids"])
+
+EMPTY_BLOBS = MotionBlobs(np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.int32), np.empty((0, 2)))
+
+
+class MotionDetector:
+    """MOG2 배경 차분 + 모폴로지 Opening + 연결 요소 면적 필터로 움직임을 감지합니다."""
+
+    def __init__(self, resize_w, resize_h, history, threshold, min_area, stage_timer=None, zone_mask=None):
+        """zone_mask: (resize_h, resize_w) uint8 감시 영역 마스크 (zones.ZoneMap.mask). 0인 곳의 움직임은 무시"""
+        self.resize_w = resize_w
+        self.resize_h = resize_h
+        self.min_area = min_area
+        self.zone_mask = zone_mask
+        self.stage_timer = stage_timer or perf_stats.StageTimer()
+        self.fgbg = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=threshold, detectShadows=True)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        # 미리 할당한 버퍼 (크기가 바뀌지 않는 한 재사용)
+        self.frame_small = np.empty((resize_h, resize_w, 3), dtype=np.uint8)
+        self.raw_mask = np.empty((resize_h, resize_w), dtype=np.uint8)
+        self.fgmask = np.empty((resize_h, resize_w), dtype=np.uint8)
+        self.labels = np.empty((resize_h, resize_w), dtype=np.int32)
+        self.buffer_allocations = 4  # 버퍼를 새로 할당한 횟수. 정상 동작 중에는 늘어나지 않아야 함
+
+    def _check_buffers(self, frame):
+        # 흑백 입력 등 채널 수가 다르면 축소 프레임 버퍼를 다시 할당
+        shape = (self.resize_h, self.resize_w) + frame.shape[2:]
+        if self.frame_small.shape != shape or self.frame_small.dtype != frame.dtype:
+            self.frame_small = np.empty(shape, dtype=frame.dtype)
+            self.buffer_allocations += 1
+
+    def find_blobs(self, mask):
+        """전경 마스크에서 min_area보다 큰 덩어리를 찾습니다. (마스크에 그리지 않음)"""
+        # Grana(BBDT) 알고리즘: 2x2 블록 단위로 라벨링하여 기본 알고리즘보다 빠름
+        count, _, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+            mask, 8, cv2.CV_32S, cv2.CCL_GRANA, labels=self.labels)
+        # 0번은 배경
+        areas = stats[1:count, cv2.CC_STAT_AREA]
+        keep = np.flatnonzero(areas > self.min_area)
+        if keep.size == 0:
+            return EMPTY_BLOBS
+        keep = keep[np.argsort(-areas[keep], kind="stable")]
+        return MotionBlobs(stats[1:count, :4][keep], areas[keep], centroids[1:count][keep])
+
+    def detect(self, frame):
+        """
+        원본 프레임에서 움직임을 감지합니다.
+        반환: (움직임 여부, 전경 마스크, MotionBlobs) - 박스 등은 저해상도 기준
+        반환된 마스크는 내부 버퍼이므로 다음 detect() 호출 때 덮어써집니다.
+        """
+        timer = self.stage_timer
+        self._check_buffers(frame)
+
+        with timer.measure("resize"):
+            cv2.resize(frame, (self.resize_w, self.resize_h), dst=self.frame_small)
+        with timer.measure("mog2"):
+            self.fgbg.apply(self.frame_small, fgmask=self.raw_mask)
+        with timer.measure("components"):
+            cv2.morphologyEx(self.raw_mask, cv2.MORPH_OPEN, self.kernel, dst=self.fgmask)
+            if self.zone_mask is not None:
+                cv2.bitwise_and(self.fgmask, self.zone_mask, dst=self.fgmask)
+
+            # 전경 픽셀이 하나도 없으면 연결 요소 계산을 건너뜀
+            if cv2.countNonZero(self.fgmask) == 0:
+                return False, self.fgmask, EMPTY_BLOBS
+            blobs = self.find_blobs(self.fgmask)
+
+        return len(blobs.areas) > 0, self.fgmask, blobs
+
+    def set_params(self, min_area=None, history=None, threshold=None):
+        """실행 중에 파라미터 변경. 배경 차분기를 새로 만들지 않으므로 학습한 배경은 그대로 유지"""
+        if min_area is not None:
+            self.min_area = min_area
+        if history is not None:
+            self.fgbg.setHistory(int(history))
+        if threshold is not None:
+            self.fgbg.setVarThreshold(float(threshold))
+
+    def background_image(self):
+        """MOG2가 학습한 배경 이미지 (축소 해상도, 새 배열)"""
+        return self.fgbg.getBackgroundImage()
+
+    def seed_background(self, image, repeats=50):
+        """배경 이미지를 repeats번 학습시켜 배경 모델을 채웁니다. (재시작 후 저장해 둔 배경 복원용)"""
+        for _ in range(repeats):
+            self.fgbg.apply(image, fgmask=self.raw_mask)
+
+
+# 이 파일이 직접 실행될 경우
+# 1) 움직임이 없는 정상 상태에서 프레임당 메모리 할당이 없는지 확인
+# 2) 덩어리 수에 따른 find_blobs() 비용 비교 (깨끗한 마스크 vs 노이즈 덩어리 수백 개)
+if __name__ == "__main__":
+    import time
+
+    from frame_source import SyntheticSource
+
+    source = SyntheticSource(1920, 1080, fps=30.0, seed=0)
+    detector = MotionDetector(640, 360, history=500, threshold=50, min_area=500)
+    capture_buffer = None
+
+    def step():
+        global capture_buffer
+        ret, capture_buffer = source.read(capture_buffer)
+        detector.detect(capture_buffer)
+
+    # 새가 지나가지 않는 구간(10초 주기 중 4~10초)에서 측정
+    for _ in range(int(30 * 5)):
+        step()
+    probe = perf_stats.AllocationProbe()
+    with probe:
+        for _ in range(100):
+            with probe.frame():
+                step()
+    print(f"버퍼 할당 횟수: {detector.buffer_allocations}")
+    print(f"프레임당 최대 임시 할당: {probe.max_peak_bytes} bytes, 100프레임 후 순증가: {probe.net_bytes} bytes")
+
+    rng = np.random.default_rng(0)
+    clean = np.zeros((360, 640), dtype=np.uint8)
+    cv2.ellipse(clean, (320, 180), (40, 25), 0, 0, 360, 255, -1)
+    noisy = clean.copy()
+    for x, y in zip(rng.integers(0, 640, 600), rng.integers(0, 360, 600)):
+        cv2.circle(noisy, (int(x), int(y)), int(rng.integers(1, 4)), 255, -1)
+    for name, mask in (("clean", clean), ("noisy", noisy)):
+        start = time.perf_counter()
+        for _ in range(200):
+            blobs = detector.find_blobs(mask)
+        elapsed_ms = (time.perf_counter() - start) / 200 * 1000.0
+        count = cv2.connectedComponents(mask)[0] - 1
+        print(f"{name}: 덩어리 {count}개 -> 움직임 {len(blobs.areas)}개, find_blobs {elapsed_ms:.3f} ms")
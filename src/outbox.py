@@ -0,0 +1,295 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from upload_pool import UploadJob
+
+# =====================================================================================
+# 업로드 outbox (오프라인 대비)
+# 업로드를 시도하기 전에 JPEG은 spool 폴더에, 메타데이터는 SQLite에 먼저 기록합니다.
+# 업로드가 성공하면 항목을 지우고, 실패하면 남겨 두었다가 OutboxFlusher가 연결이 돌아왔을 때 배치로 다시 보냅니다.
+# - 항목마다 upload_id를 정해 두고 Storage 경로/Firestore 문서 ID로 사용하므로,
+#   업로드 직후 항목을 지우기 전에 프로세스가 죽어 다시 보내더라도 같은 문서를 덮어쓸 뿐 중복되지 않습니다.
+# - JPEG은 임시 파일에 쓰고 fsync 후 rename, 메타데이터는 그 다음에 commit 하므로
+#   어느 시점에 죽어도 "파일 없는 항목"은 생기지 않습니다. (항목 없는 파일은 다음 시작 때 정리)
+# - 전체 용량이 max_bytes를 넘으면 가장 오래된 항목부터 지웁니다.
+# - 크기별 파생본(preview, thumb)은 <upload_id>.<이름>.jpg로 원본 옆에 두고, 이름 목록을 derivatives 열에 기록합니다.
+# =====================================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    upload_id TEXT UNIQUE NOT NULL,
+    created_at REAL NOT NULL,
+    species TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    source_device TEXT NOT NULL,
+    image_file TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    derivatives TEXT NOT NULL DEFAULT ''
+)
+"""
+
+_COLUMNS = "id, upload_id, created_at, species, confidence, source_device, image_file, size_bytes, attempts, derivatives"
+
+
+class OutboxEntry:
+    """outbox 항목 하나 (SQLite 행)"""
+
+    def __init__(self, id, upload_id, created_at, species, confidence, source_device, image_file, size_bytes, attempts,
+                 derivatives=""):
+        self.id = id
+        self.upload_id = upload_id
+        self.created_at = created_at  # 탐지 시각 (UNIX time)
+        self.species = species
+        self.confidence = confidence
+        self.source_device = source_device
+        self.image_file = image_file
+        self.size_bytes = size_bytes
+        self.attempts = attempts
+        self.derivatives = [name for name in derivatives.split(",") if name]  # 원본 외 파생본 이름
+
+    def files(self):
+        """원본과 파생본 파일 이름 {이름: 파일 이름}"""
+        stem = self.image_file[:-len(".jpg")]
+        return dict({"full": self.image_file}, **{name: f"{stem}.{name}.jpg" for name in self.derivatives})
+
+
+class UploadOutbox:
+    """SQLite + JPEG spool 폴더 기반의 영속 업로드 대기열"""
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.spool_dir = os.path.join(directory, "spool")
+        self.max_bytes = max_bytes
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._in_flight = set()  # 업로드 중인 항목 id (메모리에만 있음, 재시작하면 모두 다시 대기 상태)
+        self.evicted = 0
+        self.db = sqlite3.connect(os.path.join(directory, "outbox.db"), check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")  # 전원이 꺼져도 commit 된 항목은 남도록
+        self.db.execute(_SCHEMA)
+        if "derivatives" not in {row[1] for row in self.db.execute("PRAGMA table_info(outbox)")}:
+            self.db.execute("ALTER TABLE outbox ADD COLUMN derivatives TEXT NOT NULL DEFAULT ''")  # 이전 버전 DB
+        self._remove_orphan_files()
+
+    def _remove_orphan_files(self):
+        """기록 도중 죽어서 남은 임시 파일 / 항목이 없는 JPEG 정리"""
+        entries = [OutboxEntry(*row) for row in self.db.execute(f"SELECT {_COLUMNS} FROM outbox")]
+        known = {name for entry in entries for name in entry.files().values()}
+        removed = 0
+        for name in os.listdir(self.spool_dir):
+            if name not in known:
+                os.remove(os.path.join(self.spool_dir, name))
+                removed += 1
+        count = len(entries)
+        print(f"[INFO] 업로드 outbox: 대기 중인 항목 {count}개" + (f", 정리한 파일 {removed}개" if removed else ""))
+
+    def _write_file(self, name, data):
+        tmp_path = os.path.join(self.spool_dir, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.spool_dir, name))
+
+    def put(self, images, species, confidence, source_device, created_at=None, claim=False):
+        """
+        업로드할 탐지 결과를 기록하고 항목을 반환합니다.
+        images는 원본 JPEG bytes 또는 파생본을 포함한 {이름: bytes} ("full"이 원본)
+        claim=True면 바로 업로드할 것이므로 flusher가 가져가지 않도록 업로드 중으로 표시합니다.
+        """
+        if isinstance(images, (bytes, bytearray)):
+            images = {"full": images}
+        upload_id = uuid.uuid4().hex
+        created_at = created_at if created_at is not None else time.time()
+        image_file = f"{upload_id}.jpg"
+        derivatives = ",".join(name for name in images if name != "full")
+        files = OutboxEntry(None, upload_id, created_at, species, confidence, source_device, image_file, 0, 0,
+                            derivatives).files()
+        for name, data in images.items():
+            self._write_file(files[name], data)
+        size_bytes = sum(len(data) for data in images.values())
+        with self._lock:
+            cursor = self.db.execute(
+                "INSERT INTO outbox (upload_id, created_at, species, confidence, source_device, image_file, size_bytes, "
+                "derivatives) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (upload_id, created_at, species, float(confidence), source_device, image_file, size_bytes, derivatives))
+            entry = OutboxEntry(cursor.lastrowid, upload_id, created_at, species, float(confidence), source_device,
+                                image_file, size_bytes, 0, derivatives)
+            if claim:
+                self._in_flight.add(entry.id)
+            self._evict()
+        return entry
+
+    def _evict(self):
+        """(lock 보유 상태) 용량 상한을 넘으면 업로드 중이 아닌 가장 오래된 항목부터 삭제"""
+        total = self.db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM outbox").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self.db.execute(f"SELECT {_COLUMNS} FROM outbox ORDER BY created_at, id").fetchall():
+            if total <= self.max_bytes:
+                break
+            entry = OutboxEntry(*row)
+            if entry.id in self._in_flight:
+                continue
+            self._delete(entry)
+            total -= entry.size_bytes
+            self.evicted += 1
+            print(f"[WARN] 업로드 outbox 용량 초과. 가장 오래된 항목 삭제 (id {entry.id})")
+
+    def _delete(self, entry):
+        # 행을 먼저 지우고 파일을 지움 (중간에 죽으면 남은 파일은 다음 시작 때 정리)
+        self.db.execute("DELETE FROM outbox WHERE id = ?", (entry.id,))
+        for name in entry.files().values():
+            try:
+                os.remove(os.path.join(self.spool_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def claim(self, limit):
+        """업로드 중이 아닌 항목을 오래된 순서로 최대 limit개 가져와 업로드 중으로 표시"""
+        with self._lock:
+            rows = self.db.execute(f"SELECT {_COLUMNS} FROM outbox ORDER BY created_at, id").fetchall()
+            entries = [OutboxEntry(*row) for row in rows if row[0] not in self._in_flight][:limit]
+            self._in_flight.update(entry.id for entry in entries)
+        return entries
+
+    def read_images(self, entry):
+        """원본과 파생본 {이름: bytes}"""
+        images = {}
+        for name, file_name in entry.files().items():
+            with open(os.path.join(self.spool_dir, file_name), "rb") as f:
+                images[name] = f.read()
+        return images
+
+    def mark_done(self, entry):
+        """업로드 성공: 항목과 JPEG 삭제"""
+        with self._lock:
+            self._in_flight.discard(entry.id)
+            self._delete(entry)
+
+    def mark_failed(self, entry, error=None):
+        """업로드 실패: 시도 횟수를 남기고 다시 대기 상태로"""
+        with self._lock:
+            self._in_flight.discard(entry.id)
+            self.db.execute("UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                            (error, entry.id))
+
+    def has_in_flight(self):
+        with self._lock:
+            return bool(self._in_flight)
+
+    def count(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def upload_job(outbox, entry, images=None, on_complete=None, context=None):
+    """outbox 항목을 보내는 UploadJob. upload_id를 넘겨 재전송해도 같은 문서/파일을 덮어쓰게 함"""
+    if images is None:
+        images = outbox.read_images(entry)
+    return UploadJob(
+        (images, entry.species, entry.confidence, entry.source_device),
+        {'upload_id': entry.upload_id, 'detected_at': entry.created_at},
+        on_complete=on_complete, context=context,
+    )
+
+
+class OutboxFlusher:
+    """
+    outbox에 남은 항목을 주기적으로 배치 단위로 업로드 풀에 넣는 스레드.
+    배치가 모두 실패하면(오프라인) 확인 간격을 max_interval_s까지 2배씩 늘리고, 하나라도 성공하면 원래 간격으로 돌아옵니다.
+    """
+
+    def __init__(self, outbox, upload_pool, batch_size=10, interval_s=30.0, max_interval_s=600.0, on_uploaded=None):
+        self.outbox = outbox
+        self.upload_pool = upload_pool
+        self.batch_size = batch_size
+        self.interval_s = interval_s
+        self.max_interval_s = max_interval_s
+        self.on_uploaded = on_uploaded  # on_uploaded(entry, result) - 성공한 항목마다 호출
+        self.uploaded = 0
+        self._current_interval = interval_s
+        self._batch_done = threading.Condition()
+        self._batch_remaining = 0
+        self._batch_succeeded = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="outbox-flusher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _on_complete(self, job, result):
+        entry = job.context
+        if result:
+            self.outbox.mark_done(entry)
+            self.uploaded += 1
+            if self.on_uploaded:
+                self.on_uploaded(entry, result)
+        else:
+            self.outbox.mark_failed(entry, "upload failed")
+        with self._batch_done:
+            self._batch_remaining -= 1
+            self._batch_succeeded += bool(result)
+            self._batch_done.notify_all()
+
+    def flush_once(self):
+        """남은 항목 한 배치를 업로드하고 끝날 때까지 기다립니다. 반환: (시도한 수, 성공한 수)"""
+        entries = self.outbox.claim(self.batch_size)
+        if not entries:
+            return 0, 0
+        with self._batch_done:
+            self._batch_remaining = 0
+            self._batch_succeeded = 0
+        for entry in entries:
+            try:
+                job = upload_job(self.outbox, entry, on_complete=self._on_complete, context=entry)
+            except OSError as e:  # JPEG이 사라진 항목은 보낼 수 없으므로 삭제
+                print(f"[WARN] outbox 항목 {entry.id}의 이미지를 읽을 수 없어 삭제합니다: {e}")
+                self.outbox.mark_done(entry)
+                continue
+            with self._batch_done:
+                self._batch_remaining += 1
+            if not self.upload_pool.submit(job):
+                self.outbox.mark_failed(entry, "upload queue full")
+                with self._batch_done:
+                    self._batch_remaining -= 1
+        with self._batch_done:
+            self._batch_done.wait_for(lambda: self._batch_remaining == 0 or self._stop.is_set())
+            return len(entries), self._batch_succeeded
+
+    def _loop(self):
+        while not self._stop.wait(self._current_interval):
+            if self.outbox.has_in_flight():  # 실시간 업로드가 진행 중이면 결과를 보고 판단
+                continue
+            attempted = succeeded = 0
+            while not self._stop.is_set():
+                a, s = self.flush_once()
+                attempted += a
+                succeeded += s
+                if a == 0 or s < a:  # 다 보냈거나 실패가 섞이면 다음 주기에 이어서
+                    break
+            if attempted and not succeeded:
+                self._current_interval = min(self._current_interval * 2, self.max_interval_s)
+            else:
+                self._current_interval = self.interval_s
+            if succeeded:
+                print(f"[INFO] 업로드 outbox에서 {succeeded}개 업로드 완료 (남은 항목 {self.outbox.count()}개)")
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        with self._batch_done:
+            self._batch_done.notify_all()
+        self._thread.join(timeout=timeout)
@@ -0,0 +1,252 @@
+import time
+import threading
+
+# =====================================================================================
+# 단계별 처리 시간 측정
+# 기본값은 비활성화 상태이며, 비활성화 시 measure()는 아무 일도 하지 않는 컨텍스트를 반환합니다.
+# 벤치마크(scripts/replay_benchmark.py)에서 enable()을 호출하여 사용합니다.
+# attach_metrics()로 메트릭 레지스트리를 연결하면 (enable 하지 않아도) 같은 측정값을
+# 단계별 histogram / 이벤트 counter로도 기록합니다. (샘플 목록은 enable 했을 때만 쌓음)
+# attach_tracer()로 tracing.Tracer를 연결하면 단계마다 시작/끝 구간도 trace 링에 기록합니다.
+# =====================================================================================
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class _StageContext:
+    __slots__ = ("timer", "stage", "start")
+
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def percentile(sorted_values, q):
+    """정렬된 리스트에서 q(0~100) 백분위 값을 선형 보간으로 계산"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+class StageTimer:
+    """단계 이름별로 처리 시간(초)을 모아 백분위 통계를 계산합니다. 단순 개수는 count()로 셉니다."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._stage_histogram = None  # attach_metrics() 이후 MetricFamily
+        self._event_counter = None
+        self._histograms = {}  # 단계 -> histogram (label 조회를 매번 하지 않도록)
+        self._counters = {}
+        self._tracer = None
+
+    @property
+    def active(self):
+        return self.enabled or self._stage_histogram is not None or self._tracer is not None
+
+    def attach_tracer(self, tracer):
+        """record()되는 단계마다 (지금 끝난) 구간을 tracer에 기록"""
+        self._tracer = tracer
+
+    def attach_metrics(self, registry):
+        """단계별 시간은 bird_stage_seconds{stage}, 개수는 bird_events_total{event}로도 기록"""
+        self._stage_histogram = registry.histogram(
+            "bird_stage_seconds", "Pipeline stage latency in seconds", ("stage",))
+        self._event_counter = registry.counter(
+            "bird_events_total", "Pipeline event counts (analyzed frames, skips, uploads, ...)", ("event",))
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._counts = {}
+
+    def measure(self, stage):
+        if not self.active:
+            return _NULL_CONTEXT
+        return _StageContext(self, stage)
+
+    def record(self, stage, seconds):
+        if self._tracer is not None:
+            self._tracer.span(stage, seconds)
+        if self._stage_histogram is not None:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms.setdefault(stage, self._stage_histogram.labels(stage))
+            histogram.observe(seconds)
+        if not self.enabled:
+            return
+        samples = self._samples.get(stage)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(stage, [])
+        samples.append(seconds)
+
+    def count(self, name, n=1):
+        if self._event_counter is not None:
+            counter = self._counters.get(name)
+            if counter is None:
+                counter = self._counters.setdefault(name, self._event_counter.labels(name))
+            counter.inc(n)
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def summary(self):
+        """{단계: {count, total_ms, mean_ms, p50_ms, p90_ms, p99_ms, max_ms}}"""
+        result = {}
+        with self._lock:
+            stages = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        for stage, values in stages.items():
+            ms = [v * 1000.0 for v in values]
+            result[stage] = {
+                "count": len(ms),
+                "total_ms": round(sum(ms), 3),
+                "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+                "p50_ms": round(percentile(ms, 50), 3),
+                "p90_ms": round(percentile(ms, 90), 3),
+                "p99_ms": round(percentile(ms, 99), 3),
+                "max_ms": round(ms[-1], 3) if ms else 0.0,
+            }
+        return result
+
+
+class StartupTimeline:
+    """
+    프로그램 시작(origin) 기준으로 시작 단계별 시각과 소요 시간을 기록합니다.
+    phase(이름)은 구간 (모델 로딩, warm-up, Firebase 초기화 등), mark(이름)은 처음 한 번만 기록하는 시점 (첫 프레임, 첫 분석 등)
+    """
+
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases = {}  # 이름 -> (시작 시각, 소요 시간) (초, origin 기준)
+        self.marks = {}  # 이름 -> 시각 (초, origin 기준)
+        self._lock = threading.Lock()
+
+    def phase(self, name):
+        return _StartupPhase(self, name)
+
+    def mark(self, name):
+        """name 시점을 기록. 이미 기록되어 있으면 무시하고 False"""
+        now = time.perf_counter() - self.origin
+        with self._lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = now
+            return True
+
+    def summary(self):
+        """{"phases": {이름: {start_s, duration_s}}, "marks": {이름: 초}} (시작 순서대로)"""
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1][0])
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+        return {"phases": {name: {"start_s": round(start, 3), "duration_s": round(duration, 3)}
+                           for name, (start, duration) in phases},
+                "marks": {name: round(at, 3) for name, at in marks}}
+
+    def format(self):
+        summary = self.summary()
+        phases = ", ".join(f"{name} {info['duration_s']:.2f}s (@{info['start_s']:.2f}s)"
+                           for name, info in summary["phases"].items())
+        marks = ", ".join(f"{name} @{at:.2f}s" for name, at in summary["marks"].items())
+        return f"단계 [{phases}] / 시점 [{marks}]"
+
+
+class _StartupPhase:
+    __slots__ = ("timeline", "name", "start")
+
+    def __init__(self, timeline, name):
+        self.timeline = timeline
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timeline = self.timeline
+        with timeline._lock:
+            timeline.phases[self.name] = (self.start - timeline.origin, time.perf_counter() - self.start)
+        return False
+
+
+class AllocationProbe:
+    """
+    tracemalloc으로 반복 구간의 메모리 할당을 측정합니다. (numpy/OpenCV 배열 할당도 집계됨)
+    with probe: 안에서 프레임마다 with probe.frame(): 으로 감싸면,
+    max_peak_bytes는 한 프레임 동안 기준점 대비 가장 크게 늘었던 양(임시 할당 포함),
+    net_bytes는 전체 구간이 끝난 뒤 남은 순증가량입니다.
+    """
+
+    def __init__(self):
+        self.max_peak_bytes = 0
+        self.net_bytes = 0
+        self.frames = 0
+        self._start = 0
+        self._frame_start = 0
+
+    def __enter__(self):
+        import tracemalloc
+        self._tracemalloc = tracemalloc
+        self._was_tracing = tracemalloc.is_tracing()
+        if not self._was_tracing:
+            tracemalloc.start()
+        self._start = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        self.net_bytes = self._tracemalloc.get_traced_memory()[0] - self._start
+        if not self._was_tracing:
+            self._tracemalloc.stop()
+        return False
+
+    def frame(self):
+        return _AllocationFrame(self)
+
+
+class _AllocationFrame:
+    __slots__ = ("probe", "start")
+
+    def __init__(self, probe):
+        self.probe = probe
+
+    def __enter__(self):
+        tracemalloc = self.probe._tracemalloc
+        tracemalloc.reset_peak()
+        self.start = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        peak = self.probe._tracemalloc.get_traced_memory()[1] - self.start
+        self.probe.max_peak_bytes = max(self.probe.max_peak_bytes, peak)
+        self.probe.frames += 1
+        return False
@@ -0,0 +1,143 @@
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import inference
+
+# =====================================================================================
+# 추론 결과 캐시 (perceptual hash)
+# 바람에 흔들리는 나뭇가지나 가만히 앉아 있는 새는 거의 같은 프레임/crop을 계속 만들어 냅니다.
+# 엔진에 넣을 이미지마다 difference hash(dHash)를 계산해, 최근에 분석한 이미지와
+# 해밍 거리가 max_distance 이하이면 모델을 호출하지 않고 그때의 탐지 결과를 그대로 돌려줍니다.
+# - 크기(h, w)와 confidence threshold가 같은 이미지끼리만 비교합니다. (탐지 박스는 이미지 좌표)
+# - 항목 수가 max_entries를 넘으면 가장 오래 쓰이지 않은 항목부터, ttl_s가 지난 항목은 바로 지웁니다.
+#   전체 프레임 속 작은 새처럼 hash 차이가 작은 변화는 캐시에 가려질 수 있으므로, TTL로 그 시간을 제한합니다.
+# =====================================================================================
+
+
+def dhash(image, hash_size=16, margin=4):
+    """
+    difference hash. 이미지를 (hash_size + 1) x hash_size 흑백으로 줄이고
+    가로로 이웃한 픽셀이 margin보다 밝아지면 1인 hash_size * hash_size 비트 정수를 만듭니다.
+    margin이 없으면 하늘처럼 평평한 영역의 비트가 센서 노이즈만으로 뒤집혀 같은 장면도 다른 hash가 됩니다.
+    """
+    # 원본 해상도 전체를 INTER_AREA로 줄이면 느리므로 간격을 두고 뽑은 뒤 줄임 (hash 한 칸에 8x8 픽셀 정도 남김)
+    step = max(1, min(image.shape[0], image.shape[1]) // (hash_size * 8))
+    small = cv2.resize(image[::step, ::step], (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = (small[:, 1:].astype(np.int16) - small[:, :-1] > margin).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class ResultCache:
+    """(크기, conf) 별로 dHash -> 탐지 결과를 보관하는 LRU + TTL 캐시"""
+
+    def __init__(self, max_entries=256, ttl_s=10.0, max_distance=4, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_distance = max_distance
+        self.clock = clock
+        self._entries = OrderedDict()  # 키 번호 -> (group, hash, 저장 시각, 탐지 결과). 오래 안 쓴 항목이 앞쪽
+        self._next_key = 0
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0, "expired": 0}
+
+    def _expire(self, now):
+        for key in [k for k, (_, _, stored_at, _) in self._entries.items() if now - stored_at > self.ttl_s]:
+            del self._entries[key]
+            self.stats["expired"] += 1
+
+    def get(self, group, image_hash):
+        """해밍 거리가 가장 가까운 항목의 탐지 결과. 없으면 None"""
+        now = self.clock()
+        self._expire(now)
+        best_key, best_distance = None, self.max_distance + 1
+        for key, (entry_group, entry_hash, _, _) in self._entries.items():
+            if entry_group != group:
+                continue
+            distance = (entry_hash ^ image_hash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        if best_key is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key][3]
+
+    def put(self, group, image_hash, detections):
+        # TTL은 분석한 시각 기준 (적중해도 연장하지 않음, 오래된 결과를 계속 쓰지 않도록)
+        self._entries[self._next_key] = (group, image_hash, self.clock(), detections)
+        self._next_key += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedEngine(inference.InferenceEngine):
+    """다른 엔진 앞에 ResultCache를 두는 엔진. 캐시에 없는 이미지만 묶어서 한 번에 predict()"""
+
+    def __init__(self, engine, cache, hash_size=16, hash_margin=4):
+        super().__init__()
+        self.engine = engine
+        self.names = engine.names
+        self.backend = engine.backend
+        self.cache = cache
+        self.hash_size = hash_size
+        self.hash_margin = hash_margin
+
+    @property
+    def stats(self):
+        """감싼 엔진의 통계 (cascade 단계별 통계)"""
+        return getattr(self.engine, "stats", None)
+
+    @property
+    def cache_stats(self):
+        return dict(self.cache.stats)
+
+    def warmup(self, imgsz=320):
+        self.engine.warmup(imgsz)
+
+    def predict(self, images, conf):
+        results = [None] * len(images)
+        misses = []  # (이미지 번호, group, hash)
+        for i, image in enumerate(images):
+            group = (image.shape[:2], conf)
+            image_hash = dhash(image, self.hash_size, self.hash_margin)
+            cached = self.cache.get(group, image_hash)
+            if cached is None:
+                misses.append((i, group, image_hash))
+            else:
+                results[i] = list(cached)
+
+        if misses:
+            predicted = self.engine.predict([images[i] for i, _, _ in misses], conf)
+            for (i, group, image_hash), detections in zip(misses, predicted):
+                self.cache.put(group, image_hash, tuple(detections))
+                results[i] = detections
+        return results
+
+
+def merge_stats(stats_list):
+    """여러 프로세스의 캐시 통계를 합칩니다."""
+    merged = {"hits": 0, "misses": 0, "evicted": 0, "expired": 0}
+    for stats in stats_list:
+        for key, value in stats.items():
+            merged[key] += value
+    return merged
+
+
+def summarize_stats(stats):
+    lookups = stats["hits"] + stats["misses"]
+    return dict(stats, hit_rate=round(stats["hits"] / lookups, 4) if lookups else 0.0)
+
+
+def print_stats(stats):
+    s = summarize_stats(stats)
+    print(f"[INFO] 추론 결과 캐시: 적중 {s['hits']}회 / 실패 {s['misses']}회 (적중률 {s['hit_rate'] * 100:.1f}%, "
+          f"절약한 추론 {s['hits']}장)")
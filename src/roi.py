@@ -0,0 +1,90 @@
+# =====================================================================================
+# 움직임 영역(ROI) 계산
+# 저해상도 프레임에서 찾은 움직임 박스를 원본 해상도로 변환하고,
+# 여백을 더한 뒤 겹치는 박스를 합쳐 YOLO에 넣을 crop 영역을 만듭니다.
+# 박스는 모두 (x1, y1, x2, y2) 정수 좌표입니다.
+# =====================================================================================
+
+
+def scale_boxes(boxes, scale_x, scale_y):
+    """저해상도 (x, y, w, h) 박스를 원본 해상도 (x1, y1, x2, y2) 박스로 변환"""
+    return [
+        (int(x * scale_x), int(y * scale_y), int((x + w) * scale_x), int((y + h) * scale_y))
+        for x, y, w, h in boxes
+    ]
+
+
+def pad_box(box, padding, min_size, frame_w, frame_h):
+    """
+    박스 크기에 비례한 여백을 더하고, 한 변이 min_size보다 작으면 중심 기준으로 넓힙니다.
+    결과는 프레임 경계 안으로 맞춥니다.
+    """
+    x1, y1, x2, y2 = box
+    w, h = x2 - x1, y2 - y1
+    w = min(max(w + 2 * int(w * padding), min_size), frame_w)
+    h = min(max(h + 2 * int(h * padding), min_size), frame_h)
+    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+
+    # 경계에 닿으면 잘라내지 않고 안쪽으로 밀어서 크기를 유지
+    nx1 = min(max(cx - w // 2, 0), frame_w - w)
+    ny1 = min(max(cy - h // 2, 0), frame_h - h)
+    return (nx1, ny1, nx1 + w, ny1 + h)
+
+
+def boxes_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(ix2 - ix1, 0) * max(iy2 - iy1, 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def merge_boxes(boxes):
+    """겹치는 박스가 없어질 때까지 합집합 박스로 합칩니다."""
+    merged = list(boxes)
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        while merged:
+            current = merged.pop()
+            i = 0
+            while i < len(merged):
+                if boxes_overlap(current, merged[i]):
+                    other = merged.pop(i)
+                    current = (min(current[0], other[0]), min(current[1], other[1]),
+                               max(current[2], other[2]), max(current[3], other[3]))
+                    changed = True
+                    i = 0
+                else:
+                    i += 1
+            result.append(current)
+        merged = result
+    return sorted(merged)
+
+
+def box_area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def compute_regions(motion_boxes, scale_x, scale_y, frame_w, frame_h,
+                    padding=0.25, min_size=320, max_regions=4, max_area_ratio=0.5):
+    """
+    움직임 박스(저해상도 x, y, w, h)로 원본 프레임의 분석 영역 목록을 만듭니다.
+    영역이 너무 많거나 너무 넓으면 crop이 오히려 손해이므로 None(전체 프레임 분석)을 반환합니다.
+    """
+    if len(motion_boxes) == 0:
+        return None
+    boxes = scale_boxes(motion_boxes, scale_x, scale_y)
+    boxes = [pad_box(box, padding, min_size, frame_w, frame_h) for box in boxes]
+    regions = merge_boxes(boxes)
+
+    if len(regions) > max_regions:
+        return None
+    if sum(box_area(r) for r in regions) > frame_w * frame_h * max_area_ratio:
+        return None
+    return regions
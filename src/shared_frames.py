@@ -0,0 +1,77 @@
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# =====================================================================================
+# 공유 메모리 프레임 링 버퍼
+# 원본 해상도 프레임 슬롯을 미리 할당해 두고, 프로세스 사이에는 슬롯 번호만 주고받습니다.
+# 빈 슬롯 관리(acquire/release)는 링을 만든 메인 프로세스에서만 합니다.
+# =====================================================================================
+
+
+def _attach_untracked(name):
+    """
+    다른 프로세스가 만든 공유 메모리에 연결합니다. 메모리 해제(unlink)는 만든 쪽에서만 합니다.
+    Python 3.12 이하에서는 track 옵션이 없지만, spawn으로 만든 자식 프로세스는 부모의 resource_tracker를
+    같이 쓰므로 중복 등록되어도 부모의 unlink()로 한 번만 정리됩니다.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrameRing:
+    """multiprocessing.shared_memory 위에 고정 크기 프레임 슬롯 num_slots개를 둡니다."""
+
+    def __init__(self, num_slots, shape, dtype=np.uint8, name=None):
+        self.num_slots = num_slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = name is None
+
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * num_slots)
+            self._free = queue.Queue()
+            for i in range(num_slots):
+                self._free.put(i)
+        else:
+            self.shm = _attach_untracked(name)
+            self._free = None
+
+        self._array = np.ndarray((num_slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def attach(cls, name, num_slots, shape, dtype=np.uint8):
+        """다른 프로세스에서 이미 만들어진 링에 연결"""
+        return cls(num_slots, shape, dtype, name=name)
+
+    def view(self, slot):
+        """슬롯의 numpy 뷰 (복사 없음)"""
+        return self._array[slot]
+
+    def acquire(self, block=False, timeout=None):
+        """빈 슬롯 번호를 가져옵니다. 빈 슬롯이 없으면 None"""
+        try:
+            return self._free.get(block=block, timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def free_slots(self):
+        return self._free.qsize()
+
+    def close(self):
+        # numpy 뷰가 남아 있으면 close()가 실패하므로 먼저 해제
+        self._array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,127 @@
+import gc
+import itertools
+import json
+import os
+import threading
+import time
+
+# =====================================================================================
+# 프레임별 단계 trace (Chrome / Perfetto trace 형식으로 저장)
+# 단계 시간(StageTimer.record)이 기록될 때마다 (단계, 시작, 길이, 스레드, 프레임 ID)를
+# 미리 만들어 둔 고정 크기 링에 덮어쓰며 보관하고, 요청이 있을 때(SIGUSR1)나 종료할 때 JSON으로 저장합니다.
+# 저장한 파일은 chrome://tracing 또는 https://ui.perfetto.dev 에서 열면
+# 캡처 / 분석 / 인코딩 / 업로드 스레드가 한 타임라인에 보입니다. (GC 실행 구간도 "gc"로 표시)
+# - 프레임 ID는 (카메라 이름, 카메라별 프레임 번호). 스레드마다 지금 처리 중인 프레임을 set_frame()으로 알려 두면
+#   그 스레드에서 기록되는 단계에 붙습니다. 다른 스레드로 작업을 넘길 때는 current_frame()을 함께 넘깁니다.
+# - 링이 가득 차면 가장 오래된 구간부터 덮어씁니다.
+# =====================================================================================
+
+_local = threading.local()
+
+
+def set_frame(frame_id):
+    """이 스레드에서 지금 처리 중인 프레임 ID (배치 추론이면 ID 목록). trace를 쓰지 않아도 비용이 거의 없음"""
+    _local.frame = frame_id
+
+
+def current_frame():
+    return getattr(_local, "frame", None)
+
+
+def _frame_text(frame_id):
+    if frame_id is None:
+        return None
+    if isinstance(frame_id, list):
+        return [_frame_text(item) for item in frame_id]
+    camera, number = frame_id
+    return f"{camera}#{number}"
+
+
+class Tracer:
+    """span(이름, 길이)를 capacity개짜리 링에 기록하고 dump(path)로 Chrome trace JSON을 저장"""
+
+    def __init__(self, capacity=100000, trace_gc=True):
+        self.capacity = capacity
+        self.trace_gc = trace_gc
+        self._events = [None] * capacity  # 미리 할당한 링 (칸마다 이벤트 tuple 하나)
+        self._counter = itertools.count()  # next()는 GIL 아래에서 원자적이므로 기록할 때 lock을 잡지 않음
+        self._written = 0  # 기록한 구간 수 (가장 큰 index + 1)
+        self._written_lock = threading.Lock()
+        self._thread_names = {}
+        self._gc_start = {}
+        self._origin = time.perf_counter()  # trace 시각 0
+        self._dump_lock = threading.Lock()
+
+    def start(self):
+        if self.trace_gc:
+            gc.callbacks.append(self._on_gc)
+        print(f"[INFO] trace 기록 시작 (최근 {self.capacity}개 구간 보관)")
+        return self
+
+    def stop(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def span(self, name, seconds, frame_id=None, end=None):
+        """지금(end) 끝난 길이 seconds의 구간. frame_id를 주지 않으면 이 스레드의 현재 프레임"""
+        if end is None:
+            end = time.perf_counter()
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        if frame_id is None:
+            frame_id = getattr(_local, "frame", None)
+        index = next(self._counter)
+        self._events[index % self.capacity] = (name, end - seconds, seconds, tid, frame_id)
+        # 여러 스레드가 동시에 기록하면 index 순서와 이 줄의 실행 순서가 다를 수 있으므로 줄어들지 않게 갱신
+        with self._written_lock:
+            if index >= self._written:
+                self._written = index + 1
+
+    def _on_gc(self, phase, info):
+        tid = threading.get_ident()
+        if phase == "start":
+            self._gc_start[tid] = time.perf_counter()
+            return
+        start = self._gc_start.pop(tid, None)
+        if start is not None:
+            end = time.perf_counter()
+            self.span(f"gc (gen {info.get('generation')})", end - start, frame_id=None, end=end)
+
+    def events(self):
+        """링에 남아 있는 이벤트 (오래된 것부터)"""
+        written = self._written
+        if written <= self.capacity:
+            events = self._events[:written]
+        else:
+            split = written % self.capacity
+            events = self._events[split:] + self._events[:split]
+        return [event for event in events if event is not None]
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        trace_events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                         "args": {"name": "bird-detector"}}]
+        for tid, name in list(self._thread_names.items()):
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        for name, start, seconds, tid, frame_id in self.events():
+            event = {"name": name, "cat": "gc" if name.startswith("gc") else "stage", "ph": "X", "pid": pid,
+                     "tid": tid, "ts": round((start - self._origin) * 1e6, 3), "dur": round(seconds * 1e6, 3)}
+            if frame_id is not None:
+                event["args"] = {"frame": _frame_text(frame_id)}
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms",
+                "otherData": {"capacity": self.capacity, "recorded_spans": self._written}}
+
+    def dump(self, path):
+        """Chrome trace JSON 저장 (임시 파일에 쓴 뒤 교체). 저장한 구간 수를 반환"""
+        with self._dump_lock:
+            trace = self.to_chrome_trace()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(trace, f)
+            os.replace(tmp_path, path)
+        spans = sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+        print(f"[INFO] trace 저장: {path} ({spans}개 구간)")
+        return spans
@@ -0,0 +1,196 @@
+import threading
+
+from roi import iou
+
+# =====================================================================================
+# 새 추적기 (IoU / 중심점 거리 기반)
+# 움직임 박스와 YOLO 탐지 박스를 기존 track에 이어 붙여 찾아온 새마다 track ID를 부여합니다.
+# 이미 종류를 아는 track은 그 종류를 그대로 쓰고, YOLO 분석은 다음 경우에만 요청합니다.
+# - 한 번도 분석하지 않은 새 track
+# - 마지막 분석 때와 박스가 많이 달라진 track (IoU < change_iou)
+# - 마지막 분석 후 reanalyze_interval_s가 지난 track
+# - 업로드할 차례가 된 track (업로드할 프레임의 탐지 결과가 필요하므로)
+# 박스는 모두 원본 해상도 (x1, y1, x2, y2) 좌표입니다.
+# 움직임 감지(메인 스레드)와 결과 처리(분석/결과 스레드)에서 함께 쓰므로 lock으로 보호합니다.
+# =====================================================================================
+
+
+def _area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _inside_ratio(inner, outer):
+    """inner 박스 면적 중 outer 박스 안에 들어가는 비율"""
+    ix1, iy1 = max(inner[0], outer[0]), max(inner[1], outer[1])
+    ix2, iy2 = min(inner[2], outer[2]), min(inner[3], outer[3])
+    area = _area(inner)
+    return max(ix2 - ix1, 0) * max(iy2 - iy1, 0) / area if area > 0 else 0.0
+
+
+def _diagonal(box):
+    return ((box[2] - box[0]) ** 2 + (box[3] - box[1]) ** 2) ** 0.5
+
+
+def _center(box):
+    return (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+
+
+class Track:
+    """추적 중인 새 한 마리"""
+
+    def __init__(self, track_id, box, timestamp):
+        self.track_id = track_id
+        self.box = box
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.species = None  # YOLO가 알려준 종류 (아직 모르면 None)
+        self.confidence = 0.0
+        self.analyzed_at = None  # 마지막 분석 프레임 시각
+        self.analyzed_box = None  # 마지막 분석 때의 박스
+        self.pending_at = None  # 분석을 요청한 프레임 시각 (결과를 기다리는 중이면 not None)
+        self.pending_box = None  # 분석을 요청한 프레임에서의 박스 (결과가 오는 동안 새가 움직여도 이 박스로 매칭)
+
+    def __repr__(self):
+        return f"Track(#{self.track_id}, {self.species}, box={self.box})"
+
+
+class BirdTracker:
+    """움직임 박스 / 탐지 박스를 track에 연결하고 YOLO 분석이 필요한 track을 알려줍니다."""
+
+    def __init__(self, iou_threshold=0.3, center_distance_ratio=0.5, max_age_s=30.0,
+                 change_iou=0.5, reanalyze_interval_s=60.0):
+        """
+        iou_threshold: 이 값 이상 겹치면 같은 track
+        center_distance_ratio: 겹침이 적어도 중심점 거리가 (작은 쪽) 박스 대각선 길이 * 이 비율 이하면 같은 track
+        max_age_s: 이 시간 동안 움직임도 탐지도 없으면 track 삭제
+        """
+        self.iou_threshold = iou_threshold
+        self.center_distance_ratio = center_distance_ratio
+        self.max_age_s = max_age_s
+        self.change_iou = change_iou
+        self.reanalyze_interval_s = reanalyze_interval_s
+        self.tracks = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _score(self, track_box, box):
+        """같은 새일 가능성 점수 (0이면 매칭하지 않음). IoU 우선, 다음으로 중심점 거리"""
+        overlap = iou(track_box, box)
+        if overlap >= self.iou_threshold:
+            return 1.0 + overlap
+        (tx, ty), (bx, by) = _center(track_box), _center(box)
+        # 둘 중 작은 박스 기준 (화면 전체 같은 큰 움직임 박스가 모든 새를 흡수하지 않도록)
+        diagonal = min(_diagonal(track_box), _diagonal(box))
+        distance = ((tx - bx) ** 2 + (ty - by) ** 2) ** 0.5
+        limit = diagonal * self.center_distance_ratio
+        return 1.0 - distance / limit if limit > 0 and distance < limit else 0.0
+
+    def _match(self, tracks, boxes, pending=False):
+        """
+        점수가 높은 순으로 1:1 매칭. 반환: ({박스 index: track}, 매칭 안 된 박스 index 목록)
+        pending=True면 track의 현재 박스 대신 분석을 요청했을 때의 박스로 비교
+        """
+        pairs = sorted(((self._score(track.pending_box if pending else track.box, box), i, track.track_id)
+                        for i, box in enumerate(boxes) for track in tracks), reverse=True)
+        matched, used_tracks = {}, set()
+        for score, i, track_id in pairs:
+            if score <= 0:
+                break
+            if i in matched or track_id in used_tracks:
+                continue
+            matched[i] = self.tracks[track_id]
+            used_tracks.add(track_id)
+        return matched, [i for i in range(len(boxes)) if i not in matched]
+
+    def _new_track(self, box, timestamp):
+        track = Track(self._next_id, box, timestamp)
+        self.tracks[track.track_id] = track
+        self._next_id += 1
+        return track
+
+    def _is_pending(self, track, timestamp):
+        """분석 결과를 기다리는 중인지. 분석이 실패해 결과가 오지 않은 경우를 위해 reanalyze_interval_s가 지나면 무시"""
+        return track.pending_at is not None and timestamp - track.pending_at <= self.reanalyze_interval_s
+
+    def _expire(self, timestamp):
+        for track_id in [t.track_id for t in self.tracks.values()
+                         if timestamp - t.last_seen > self.max_age_s and not self._is_pending(t, timestamp)]:
+            del self.tracks[track_id]
+
+    def update_motion(self, boxes, timestamp):
+        """움직임 박스로 track을 갱신하고, 이번 움직임에 해당하는 track 목록을 반환"""
+        with self._lock:
+            self._expire(timestamp)
+            matched, unmatched = self._match(list(self.tracks.values()), boxes)
+            for i, track in matched.items():
+                # 앉아 있는 새는 움직임 박스가 새의 일부(날개, 머리)만 잡는 경우가 많으므로,
+                # 종류를 아는 track 안쪽의 작은 움직임이면 track 박스를 그대로 둠
+                if not (track.species is not None and _area(boxes[i]) < 0.5 * _area(track.box)
+                        and _inside_ratio(boxes[i], track.box) >= 0.5):
+                    track.box = boxes[i]
+                track.last_seen = timestamp
+            new_tracks = [self._new_track(boxes[i], timestamp) for i in unmatched]
+            return list(matched.values()) + new_tracks
+
+    def needs_analysis(self, track, timestamp, upload_due=False):
+        """(track 목록은 update_motion() 결과) 이 track을 YOLO로 다시 분석해야 하는지"""
+        with self._lock:
+            if self._is_pending(track, timestamp):
+                return False
+            if track.analyzed_at is None or upload_due:
+                return True
+            if iou(track.box, track.analyzed_box) < self.change_iou:
+                return True
+            return timestamp - track.analyzed_at > self.reanalyze_interval_s
+
+    def mark_pending(self, tracks, timestamp):
+        """분석을 요청한 track 표시 (결과가 올 때까지 같은 track을 다시 요청하지 않음). timestamp=None이면 표시 해제"""
+        with self._lock:
+            for track in tracks:
+                track.pending_at = timestamp
+                track.pending_box = track.box if timestamp is not None else None
+
+    def assign_detections(self, detections, timestamp, valid_species):
+        """
+        timestamp 프레임의 YOLO 탐지 결과(confidence 내림차순)를 track에 연결합니다.
+        반환: 유효한 새 종류 탐지마다 [(detection, track)] (confidence 내림차순)
+        """
+        with self._lock:
+            analyzed = [t for t in self.tracks.values() if t.pending_at == timestamp]
+            for track in analyzed:
+                track.pending_at = None
+                track.analyzed_at = timestamp
+                track.analyzed_box = track.pending_box
+
+            valid = [d for d in detections if d.class_name in valid_species]
+            # 이번에 분석한 track에 먼저 연결하고, 남은 탐지는 나머지 track / 새 track에 연결
+            boxes = [d.box for d in valid]
+            matched, rest = self._match(analyzed, boxes, pending=True)
+            others = [t for t in self.tracks.values() if not self._is_pending(t, timestamp) and t not in analyzed]
+            matched_others, new = self._match(others, [boxes[i] for i in rest])
+            for j, track in matched_others.items():
+                matched[rest[j]] = track
+            for j in new:
+                matched[rest[j]] = self._new_track(tuple(int(v) for v in boxes[rest[j]]), timestamp)
+
+            assigned = []
+            for i, detection in enumerate(valid):
+                track = matched[i]
+                box = tuple(int(v) for v in detection.box)
+                if track not in analyzed:
+                    track.box = box
+                    track.last_seen = max(track.last_seen, timestamp)
+                # 분석한 track은 결과를 기다리는 동안 움직임으로 갱신된 현재 박스를 유지
+                track.analyzed_at = timestamp
+                track.analyzed_box = box
+                # 더 확실한 탐지일 때만 종류를 바꿈 (한 프레임의 오분류로 흔들리지 않도록)
+                if track.species is None or track.species == detection.class_name or \
+                        detection.confidence > track.confidence:
+                    track.species = detection.class_name
+                    track.confidence = detection.confidence
+                assigned.append((detection, track))
+            return assigned
+
+    def active_tracks(self):
+        with self._lock:
+            return list(self.tracks.values())
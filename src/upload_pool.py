@@ -0,0 +1,144 @@
+import queue
+import random
+import threading
+import time
+
+import tracing
+
+# =====================================================================================
+# 업로드 풀
+# 분석 스레드/결과 스레드는 업로드 작업을 큐에 넣기만 하고 바로 돌아갑니다.
+# 업로드 스레드 몇 개가 큐를 처리하며, 실패하면 지수 백오프(+지터)로 재시도합니다.
+# 시도마다 timeout을 upload_fn에 넘겨 네트워크가 멈춰도 한 시도가 무한정 걸리지 않게 합니다.
+# 최종 결과(성공/실패)는 on_complete 콜백으로 알려줍니다.
+# =====================================================================================
+
+
+class UploadJob:
+    """업로드 작업 하나. args/kwargs는 upload_fn에 그대로 전달됨"""
+
+    def __init__(self, args, kwargs=None, on_complete=None, context=None):
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.on_complete = on_complete  # on_complete(job, result) - result는 실패 시 None
+        self.context = context  # 콜백에서 쓸 값 (예: 프레임 시각)
+        self.attempts = 0
+        self.frame_id = tracing.current_frame()  # trace에서 업로드 구간을 탐지한 프레임과 연결
+
+
+class UploadPool:
+    """
+    크기가 제한된 업로드 큐 + 업로드 스레드 풀.
+    upload_fn(*args, timeout=..., **kwargs)은 성공 시 결과(dict 등), 실패 시 None을 반환하거나 예외를 던집니다.
+    """
+
+    def __init__(self, upload_fn, num_workers=2, queue_size=16, max_retries=3,
+                 backoff_base_s=1.0, backoff_max_s=30.0, attempt_timeout_s=20.0, stage_timer=None):
+        self.upload_fn = upload_fn
+        self.num_workers = num_workers
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.attempt_timeout_s = attempt_timeout_s
+        self.stage_timer = stage_timer
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.threads = [threading.Thread(target=self._worker, name=f"upload-{i}", daemon=True)
+                        for i in range(num_workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        print(f"[INFO] 업로드 스레드 {self.num_workers}개 시작 (큐 크기 {self.queue.maxsize})")
+        return self
+
+    def submit(self, job):
+        """업로드 작업을 큐에 넣습니다. 큐가 가득 차 있으면 기다리지 않고 False"""
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def pending(self):
+        return self.queue.unfinished_tasks
+
+    def join(self):
+        """넣은 업로드 작업이 모두 끝날 때까지 대기"""
+        self.queue.join()
+
+    def _backoff(self, attempt):
+        """attempt번째 실패 후 대기 시간 (지수 증가, 최대 backoff_max_s, 0.5~1배 지터)"""
+        delay = min(self.backoff_max_s, self.backoff_base_s * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _attempt(self, job):
+        job.attempts += 1
+        start = time.perf_counter()
+        try:
+            return self.upload_fn(*job.args, timeout=self.attempt_timeout_s, **job.kwargs)
+        except Exception as e:
+            print(f"[WARN] 업로드 시도 {job.attempts}회차 실패: {e}")
+            return None
+        finally:
+            if self.stage_timer:
+                self.stage_timer.record("upload", time.perf_counter() - start)
+
+    def _run(self, job):
+        result = self._attempt(job)
+        while result is None and job.attempts <= self.max_retries:
+            delay = self._backoff(job.attempts)
+            print(f"[INFO] {delay:.1f}초 후 업로드 재시도 ({job.attempts}/{self.max_retries})")
+            if self._stop.wait(delay):  # 종료 중이면 재시도하지 않음
+                break
+            with self._lock:
+                self.retried += 1
+            result = self._attempt(job)
+
+        with self._lock:
+            if result is None:
+                self.failed += 1
+            else:
+                self.succeeded += 1
+        if job.on_complete:
+            try:
+                job.on_complete(job, result)
+            except Exception as e:
+                print(f"[ERROR] 업로드 완료 콜백에서 오류 발생: {e}")
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    break
+                tracing.set_frame(job.frame_id)
+                self._run(job)
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        with self._lock:
+            return {"succeeded": self.succeeded, "failed": self.failed,
+                    "retried": self.retried, "dropped": self.dropped}
+
+    def stop(self, timeout=10):
+        """남은 작업을 timeout초 동안 처리하도록 기다린 뒤 스레드를 종료합니다. (재시도 대기는 중단)"""
+        deadline = time.perf_counter() + timeout
+        while self.queue.unfinished_tasks and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+        for _ in self.threads:
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(timeout=max(deadline - time.perf_counter(), 0.1))
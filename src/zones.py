@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+# =====================================================================================
+# 감시 영역 (include / exclude 다각형)
+# 모이통 기둥, 바람에 흔들리는 나무, 하늘처럼 움직임이 많지만 새를 찾을 필요가 없는 곳을 설정으로 제외합니다.
+# 다각형 꼭짓점은 화면 크기에 대한 비율 [x, y] (0~1)이므로 해상도와 무관하게 같은 영역을 가리킵니다.
+# - include가 비어 있으면 화면 전체가 대상이고, 있으면 include 다각형 안쪽만 대상입니다.
+# - exclude 다각형은 include 안쪽이라도 제외합니다.
+# 해상도마다 uint8 마스크(대상 255, 제외 0)를 한 번만 그려 두고 재사용합니다.
+# - 움직임 감지: 전경 마스크와 AND (제외 영역의 움직임은 YOLO 분석을 만들지 않음)
+# - 분석 영역(crop): 대상 영역이 거의 없는 crop은 분석하지 않음
+# - 탐지 결과: 박스 중심이 제외 영역에 있는 탐지는 무시
+# =====================================================================================
+
+
+class ZoneMap:
+    """include / exclude 다각형과 해상도별 마스크 캐시"""
+
+    def __init__(self, include=None, exclude=None, crop_min_coverage=0.1):
+        self.crop_min_coverage = crop_min_coverage  # filter_regions()의 기본 기준 (카메라별 zones 설정)
+        self.include = [np.asarray(polygon, dtype=np.float64) for polygon in include or []]
+        self.exclude = [np.asarray(polygon, dtype=np.float64) for polygon in exclude or []]
+        for polygon in self.include + self.exclude:
+            if polygon.ndim != 2 or polygon.shape[0] < 3 or polygon.shape[1] != 2:
+                raise ValueError(f"다각형은 [x, y] 꼭짓점 3개 이상이어야 합니다: {polygon.tolist()}")
+        self._masks = {}
+
+    @staticmethod
+    def _to_pixels(polygon, width, height):
+        return np.round(polygon * (width - 1, height - 1)).astype(np.int32)
+
+    def mask(self, width, height):
+        """(height, width) uint8 마스크. 대상 영역 255, 제외 영역 0"""
+        key = (width, height)
+        if key not in self._masks:
+            if self.include:
+                mask = np.zeros((height, width), dtype=np.uint8)
+                cv2.fillPoly(mask, [self._to_pixels(p, width, height) for p in self.include], 255)
+            else:
+                mask = np.full((height, width), 255, dtype=np.uint8)
+            if self.exclude:
+                cv2.fillPoly(mask, [self._to_pixels(p, width, height) for p in self.exclude], 0)
+            self._masks[key] = mask
+        return self._masks[key]
+
+    def coverage(self, region, width, height):
+        """원본 해상도 영역 (x1, y1, x2, y2) 중 대상 영역의 비율"""
+        x1, y1, x2, y2 = region
+        area = (x2 - x1) * (y2 - y1)
+        if area <= 0:
+            return 0.0
+        return cv2.countNonZero(self.mask(width, height)[y1:y2, x1:x2]) / area
+
+    def filter_regions(self, regions, width, height, min_coverage=None):
+        """
+        대상 영역 비율이 min_coverage(생략하면 crop_min_coverage) 미만인 crop을 뺀 목록.
+        regions가 None(전체 프레임 분석)이면 None을 그대로 반환
+        """
+        if regions is None:
+            return None
+        if min_coverage is None:
+            min_coverage = self.crop_min_coverage
+        return [region for region in regions if self.coverage(region, width, height) >= min_coverage]
+
+    def contains(self, x, y, width, height):
+        """원본 해상도 좌표 (x, y)가 대상 영역 안인지"""
+        mask = self.mask(width, height)
+        xi = min(max(int(x), 0), width - 1)
+        yi = min(max(int(y), 0), height - 1)
+        return mask[yi, xi] > 0
+
+    def allowed_fraction(self, width, height):
+        return cv2.countNonZero(self.mask(width, height)) / float(width * height)